@@ -3,11 +3,13 @@ from __future__ import annotations
 import hashlib
 import logging
 import os
+from datetime import date, datetime
 from typing import AsyncGenerator, Optional, Dict, Any
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse, quote
 
 from dotenv import load_dotenv
-from sqlalchemy import String, JSON, Text, Index
+from sqlalchemy import Date, DateTime, String, JSON, Text, Index, Integer
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.engine import URL
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
@@ -27,6 +29,33 @@ class Config:
     """Centralized configuration management"""
     SCHEMA = os.getenv("DB_SCHEMA", "public")
     DATABASE_URL = os.getenv("DATABASE_URL") or os.getenv("DATABASE_URL_TEMPLATE")
+    RUN_MIGRATIONS = os.getenv("DB_RUN_MIGRATIONS", "1").lower() in ("1", "true", "yes")
+    # Events whose audience exceeds this are not copied into inboxes; readers pull them instead
+    FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", "1000"))
+    # Daily activity buckets older than this are moved into monthly ones every interval (0 = off).
+    # At least 30: dataset health and the default sparkline read 30 days of daily buckets.
+    ACTIVITY_RETENTION_DAYS = max(30, int(os.getenv("ACTIVITY_RETENTION_DAYS", "90")))
+    ACTIVITY_COMPACT_INTERVAL = int(os.getenv("ACTIVITY_COMPACT_INTERVAL", "3600"))
+    # Trending scores halve every this many hours; workers re-sync from events every interval (0 = startup only)
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+    TRENDING_REBUILD_INTERVAL = int(os.getenv("TRENDING_REBUILD_INTERVAL", "600"))
+    # Similar-dataset index is rebuilt from datasets/follows this often (0 = startup only)
+    SIMILAR_REBUILD_INTERVAL = int(os.getenv("SIMILAR_REBUILD_INTERVAL", "900"))
+    # Dataset search (BM25F) index is rebuilt from datasets this often (0 = startup only)
+    SEARCH_REBUILD_INTERVAL = int(os.getenv("SEARCH_REBUILD_INTERVAL", "900"))
+    # Semantic search: re-embed/retrain interval (0 = startup only) and where the vector file lives
+    SEMANTIC_REBUILD_INTERVAL = int(os.getenv("SEMANTIC_REBUILD_INTERVAL", "3600"))
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR") or None
+    # Dataset objects kept per worker in the read-through LRU, and how long an entry may be served
+    DATASET_CACHE_SIZE = int(os.getenv("DATASET_CACHE_SIZE", "10000"))
+    DATASET_CACHE_TTL = float(os.getenv("DATASET_CACHE_TTL", "300"))
+    # LISTEN/NOTIFY channel workers use to evict each other's cached datasets and names
+    CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "databooks_cache")
+    # DB-less mode: directory for the in-memory store's snapshot + write-ahead log (unset = not persisted),
+    # seconds between snapshots (0 = only at shutdown), and whether every log record is fsynced
+    MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH") or None
+    MEMORY_SNAPSHOT_INTERVAL = int(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "300"))
+    MEMORY_DB_FSYNC = os.getenv("MEMORY_DB_FSYNC", "0").lower() in ("1", "true", "yes")
     DBX_DB_INSTANCE_NAME = os.getenv("DBX_DB_INSTANCE_NAME")
     USE_DBX_DATABASE_TOKEN = os.getenv("USE_DBX_DATABASE_TOKEN", "0").lower() in ("1", "true", "yes")
     LOG_DB_TOKEN_DEBUG = os.getenv("LOG_DB_TOKEN_DEBUG", "0").lower() in ("1", "true", "yes")
@@ -243,27 +272,53 @@ class Base(DeclarativeBase):
 
 class DatasetModel(Base):
     __tablename__ = "datasets"
-    __table_args__ = {"schema": Config.SCHEMA}
+    __table_args__ = (
+        Index("ix_datasets_owner_id", "owner_id"),
+        Index("ix_datasets_org_id", "org_id"),
+        Index("ix_datasets_created_at_id", "created_at", "id"),
+        # jsonb_path_ops GIN indexes serve @> containment (see dataset_has_tag / dataset_source_matches)
+        Index("ix_datasets_tags_gin", "tags", postgresql_using="gin", postgresql_ops={"tags": "jsonb_path_ops"}),
+        Index(
+            "ix_datasets_source_metadata_gin",
+            "source_metadata_json",
+            postgresql_using="gin",
+            postgresql_ops={"source_metadata_json": "jsonb_path_ops"},
+        ),
+        {"schema": Config.SCHEMA},
+    )
     
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text)
-    tags: Mapped[Optional[list[str]]] = mapped_column(JSON)
+    tags: Mapped[Optional[list[str]]] = mapped_column(JSONB)
     owner_id: Mapped[str] = mapped_column(String, nullable=False)
     org_id: Mapped[str] = mapped_column(String, nullable=False)
     company: Mapped[Optional[str]] = mapped_column(String)
     #business_domain: Mapped[Optional[str]] = mapped_column(String)
     source_type: Mapped[str] = mapped_column(String, nullable=False)
-    source_metadata_json: Mapped[dict] = mapped_column(JSON, default=dict)
+    source_metadata_json: Mapped[dict] = mapped_column(JSONB, default=dict)
     visibility: Mapped[str] = mapped_column(String, nullable=False)
-    created_at: Mapped[str] = mapped_column(String, nullable=False)
-    updated_at: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+def dataset_has_tag(tag: str):
+    """Filter: datasets whose tags array contains `tag` exactly (GIN-indexed)."""
+    return DatasetModel.tags.contains([tag])
+
+
+def dataset_source_matches(**fields: Any):
+    """Filter: datasets whose source_metadata_json contains all given key/values (GIN-indexed)."""
+    return DatasetModel.source_metadata_json.contains(fields)
 
 
 class EventModel(Base):
     __tablename__ = "events"
     __table_args__ = (
         Index("ix_events_dataset_id_created_at", "dataset_id", "created_at"),
+        Index("ix_events_actor_id_created_at", "actor_id", "created_at"),
+        Index("ix_events_type_created_at", "type", "created_at"),
+        Index("ix_events_created_at_id", "created_at", "id"),
         {"schema": Config.SCHEMA},
     )
     
@@ -272,25 +327,170 @@ class EventModel(Base):
     payload_json: Mapped[dict] = mapped_column(JSON, default=dict)
     actor_id: Mapped[Optional[str]] = mapped_column(String)
     dataset_id: Mapped[Optional[str]] = mapped_column(String)
-    created_at: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class FeedItemModel(Base):
+    """Read model for the feed: one row per event, written in the same transaction.
+
+    Human text and display names are resolved at write time (see services.events)
+    so feed reads are a plain index scan.
+    """
+    __tablename__ = "feed_items"
+    __table_args__ = (
+        Index("ix_feed_items_created_at_id", "created_at", "id"),
+        Index("ix_feed_items_dataset_id_created_at_id", "dataset_id", "created_at", "id"),
+        Index("ix_feed_items_actor_id", "actor_id"),
+        {"schema": Config.SCHEMA},
+    )
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # same as events.id
+    type: Mapped[str] = mapped_column(String, nullable=False)
+    human_text: Mapped[Optional[str]] = mapped_column(String)
+    payload_json: Mapped[dict] = mapped_column(JSONB, default=dict)
+    actor_id: Mapped[Optional[str]] = mapped_column(String)
+    actor_name: Mapped[Optional[str]] = mapped_column(String)
+    dataset_id: Mapped[Optional[str]] = mapped_column(String)
+    dataset_name: Mapped[Optional[str]] = mapped_column(String)
+    org_id: Mapped[Optional[str]] = mapped_column(String)
+    visibility: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class UserFeedModel(Base):
+    """Per-user inbox of feed item ids, filled by fan-out on write (services.feed)."""
+    __tablename__ = "user_feed"
+    __table_args__ = (
+        Index("ix_user_feed_user_id_created_at_event_id", "user_id", "created_at", "event_id"),
+        {"schema": Config.SCHEMA},
+    )
+
+    user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    event_id: Mapped[str] = mapped_column(String, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class DatasetActivityModel(Base):
+    """Per-dataset event counts by UTC day and event type (services.activity).
+
+    Compaction moves days older than ACTIVITY_RETENTION_DAYS into dataset_activity_monthly.
+    """
+    __tablename__ = "dataset_activity_daily"
+    __table_args__ = {"schema": Config.SCHEMA}
+
+    dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    type: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class DatasetActivityMonthlyModel(Base):
+    """Compacted activity: per-dataset event counts by UTC month (first day) and event type."""
+    __tablename__ = "dataset_activity_monthly"
+    __table_args__ = {"schema": Config.SCHEMA}
+
+    dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    type: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class DatasetColumnModel(Base):
+    """Column names of every dataset's source table, filled by metadata crawls (services.columns)."""
+    __tablename__ = "dataset_columns"
+    __table_args__ = (
+        # name_lower uses the "C" collation so this index serves both LIKE 'prefix%' and the ordering
+        Index("ix_dataset_columns_name_lower", "name_lower", "dataset_id"),
+        {"schema": Config.SCHEMA},
+    )
+
+    dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
+    name_lower: Mapped[str] = mapped_column(String(collation="C"), primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    type: Mapped[Optional[str]] = mapped_column(String)
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
 
 class FollowModel(Base):
     __tablename__ = "follows"
-    __table_args__ = {"schema": Config.SCHEMA}
+    __table_args__ = (
+        # PK is (user_id, dataset_id); per-dataset counts need the reverse lookup
+        Index("ix_follows_dataset_id", "dataset_id"),
+        {"schema": Config.SCHEMA},
+    )
     
     user_id: Mapped[str] = mapped_column(String, primary_key=True)
     dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
 
 
+class TagFollowModel(Base):
+    __tablename__ = "tag_follows"
+    __table_args__ = (
+        Index("ix_tag_follows_tag_lower", "tag_lower"),
+        {"schema": Config.SCHEMA},
+    )
+
+    user_id: Mapped[str] = mapped_column(String, primary_key=True)
+    tag_lower: Mapped[str] = mapped_column(String, primary_key=True)
+    tag: Mapped[str] = mapped_column(String, nullable=False)
+
+
 class LikeModel(Base):
     __tablename__ = "likes"
-    __table_args__ = {"schema": Config.SCHEMA}
+    __table_args__ = (
+        # PK is (user_id, dataset_id); per-dataset counts need the reverse lookup
+        Index("ix_likes_dataset_id", "dataset_id"),
+        {"schema": Config.SCHEMA},
+    )
     
     user_id: Mapped[str] = mapped_column(String, primary_key=True)
     dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
 
 
+class DatasetStatsModel(Base):
+    """Per-dataset social counters, maintained by the follow/like toggles."""
+    __tablename__ = "dataset_stats"
+    __table_args__ = {"schema": Config.SCHEMA}
+
+    dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
+    followers: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    likes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class DatasetTagModel(Base):
+    """Normalized dataset tags; `datasets.tags` stays the source of truth for display order."""
+    __tablename__ = "dataset_tags"
+    __table_args__ = (
+        Index("ix_dataset_tags_tag_lower_dataset_id", "tag_lower", "dataset_id"),
+        {"schema": Config.SCHEMA},
+    )
+
+    dataset_id: Mapped[str] = mapped_column(String, primary_key=True)
+    tag_lower: Mapped[str] = mapped_column(String, primary_key=True)
+    tag: Mapped[str] = mapped_column(String, nullable=False)
+
+
+class TagCountModel(Base):
+    """Rollup of datasets per tag, maintained alongside dataset_tags."""
+    __tablename__ = "tag_counts"
+    __table_args__ = {"schema": Config.SCHEMA}
+
+    tag_lower: Mapped[str] = mapped_column(String, primary_key=True)
+    tag: Mapped[str] = mapped_column(String, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class CompanyStatsModel(Base):
+    """Per-company rollup for the companies directory, maintained on user/dataset writes."""
+    __tablename__ = "company_stats"
+    __table_args__ = {"schema": Config.SCHEMA}
+
+    company: Mapped[str] = mapped_column(String, primary_key=True)
+    user_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    dataset_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_activity_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
 class PlatformProfileModel(Base):
     __tablename__ = "platform_profiles"
     __table_args__ = {"schema": Config.SCHEMA}
@@ -303,7 +503,10 @@ class PlatformProfileModel(Base):
 
 class UserModel(Base):
     __tablename__ = "users"
-    __table_args__ = {"schema": Config.SCHEMA}
+    __table_args__ = (
+        Index("ix_users_name_id", "name", "id"),
+        {"schema": Config.SCHEMA},
+    )
     
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -316,7 +519,7 @@ class UserModel(Base):
     tools: Mapped[Optional[list[str]]] = mapped_column(JSON)
     org_id: Mapped[str] = mapped_column(String, nullable=False, default="org")
     role: Mapped[str] = mapped_column(String, nullable=False, default="consumer")
-    created_at: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
 
 # Session management
@@ -0,0 +1,47 @@
+"""Conditional GET helpers.
+
+Polled endpoints render their JSON as usual and hand it to `conditional_json`, which
+tags the response with a strong ETag (a hash of the exact body bytes) and a
+Cache-Control policy, and answers 304 Not Modified with no body when the client's
+If-None-Match already names that ETag. Hashing the body is always right, however
+the payload was assembled, and costs far less than the bytes it saves re-sending.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from backend.app.serialization import FastJSONResponse
+
+
+# Shared caches (a CDN) may keep a copy but must revalidate it on every use
+REVALIDATE = "no-cache"
+# Per-user or internal data: browsers only, revalidated on every use
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def conditional_json(request: Request, content: Any, cache_control: str = REVALIDATE) -> Response:
+    """JSON response for `content` with ETag and Cache-Control; 304 when If-None-Match matches."""
+    response = FastJSONResponse(jsonable_encoder(content))
+    etag = etag_for(response.body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,193 @@
+"""Compact append-only event log for the in-memory store.
+
+A list of pydantic Events costs well over a kilobyte per event (model instance,
+__dict__, payload dict, a datetime and several strings). EventLog stores the same
+events column by column in flat typed arrays:
+
+- ids as 16 raw UUID bytes;
+- created_at as int64 microseconds since the epoch;
+- type, actor_id and dataset_id as small integer codes into intern tables;
+- payloads as orjson bytes in one shared buffer, decoded only when an event is read.
+
+That comes to roughly 40 bytes plus the payload JSON per event. Indexing or iterating
+hands out ordinary Event objects, so callers see a read-only Sequence[Event].
+"""
+from __future__ import annotations
+
+import uuid
+from array import array
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, overload
+
+import numpy as np
+import orjson
+
+from backend.app.schemas import Event
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NONE = -1
+
+
+class _Interner:
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def value(self, code: int) -> Optional[str]:
+        return None if code == _NONE else self.values[code]
+
+
+def _micros(ts: datetime) -> int:
+    delta = ts - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+class EventLog(Sequence):
+    def __init__(self) -> None:
+        self._ids = bytearray()
+        self._odd_ids: Dict[int, str] = {}   # position -> id that is not a UUID
+        self._ids_sorted = True              # UUIDv7 ids minted in order keep this True
+        self._ts = array("q")
+        self._types = _Interner()
+        self._type = array("h")
+        self._refs = _Interner()             # actor and dataset ids share one table
+        self._actor = array("i")
+        self._dataset = array("i")
+        self._payloads = bytearray()
+        self._payload_end = array("Q")
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    # Snapshots copy the column buffers verbatim; typecodes fix the element widths
+    _COLUMNS = ("_ids", "_ts", "_type", "_actor", "_dataset", "_payloads", "_payload_end")
+
+    def state(self) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+        """(metadata, column bytes) describing the log, for persistence snapshots."""
+        meta = {
+            "types": self._types.values,
+            "refs": self._refs.values,
+            "odd_ids": {str(p): v for p, v in self._odd_ids.items()},
+            "ids_sorted": self._ids_sorted,
+        }
+        return meta, {name: bytes(getattr(self, name)) for name in self._COLUMNS}
+
+    @classmethod
+    def from_state(cls, meta: Dict[str, Any], columns: Dict[str, Any]) -> "EventLog":
+        """Rebuild a log from `state()` output; `columns` may be memoryviews into a mapped file."""
+        log = cls()
+        for name in cls._COLUMNS:
+            col = getattr(log, name)
+            if isinstance(col, bytearray):
+                col += columns[name]
+            else:
+                col.frombytes(columns[name])
+        for interner, values in ((log._types, meta["types"]), (log._refs, meta["refs"])):
+            interner.values = list(values)
+            interner.codes = {v: i for i, v in enumerate(interner.values)}
+        log._odd_ids = {int(p): v for p, v in meta["odd_ids"].items()}
+        log._ids_sorted = meta["ids_sorted"]
+        return log
+
+    def daily_counts(self) -> Dict[Tuple[str, date, str], int]:
+        """(dataset_id, UTC day, type) -> count over the whole log, the shape of activity_daily."""
+        if not self._ts:
+            return {}
+        dataset = np.frombuffer(self._dataset, dtype=np.int32).copy()
+        keep = dataset != _NONE
+        day = np.frombuffer(self._ts, dtype=np.int64)[keep] // 86_400_000_000
+        kind = np.frombuffer(self._type, dtype=np.int16)[keep]
+        # One int64 key per event (dataset code | day | type code) keeps np.unique one-dimensional
+        keys, counts = np.unique((dataset[keep].astype(np.int64) << 32) | (day << 12) | kind, return_counts=True)
+        return {
+            (self._refs.values[k >> 32], (_EPOCH + timedelta(days=(k >> 12) & 0xFFFFF)).date(), self._types.values[k & 0xFFF]): n
+            for k, n in zip(keys.tolist(), counts.tolist())
+        }
+
+    def append(self, ev: Event) -> int:
+        pos = len(self._ts)
+        try:
+            raw = uuid.UUID(ev.id).bytes
+        except ValueError:
+            raw = bytes(16)
+            self._odd_ids[pos] = ev.id
+            self._ids_sorted = False
+        if pos and self._ids_sorted and raw < bytes(self._ids[-16:]):
+            self._ids_sorted = False
+        self._ids += raw
+        self._ts.append(_micros(ev.created_at))
+        self._type.append(self._types.code(ev.type))
+        self._actor.append(self._refs.code(ev.actor_id))
+        self._dataset.append(self._refs.code(ev.dataset_id))
+        self._payloads += orjson.dumps(ev.payload_json or {})
+        self._payload_end.append(len(self._payloads))
+        return pos
+
+    def _event(self, pos: int) -> Event:
+        start = self._payload_end[pos - 1] if pos else 0
+        return Event.model_construct(
+            id=self._odd_ids.get(pos) or str(uuid.UUID(bytes=bytes(self._ids[pos * 16:pos * 16 + 16]))),
+            type=self._types.values[self._type[pos]],
+            payload_json=orjson.loads(self._payloads[start:self._payload_end[pos]]),
+            actor_id=self._refs.value(self._actor[pos]),
+            dataset_id=self._refs.value(self._dataset[pos]),
+            created_at=_EPOCH + timedelta(microseconds=self._ts[pos]),
+            actor=None,
+            dataset=None,
+        )
+
+    @overload
+    def __getitem__(self, index: int) -> Event: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[Event]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._event(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index out of range")
+        return self._event(index)
+
+    def __iter__(self) -> Iterator[Event]:
+        for i in range(len(self)):
+            yield self._event(i)
+
+    def position(self, event_id: str) -> Optional[int]:
+        """Position of an event by id (feed cursors), or None."""
+        try:
+            raw = uuid.UUID(event_id).bytes
+        except ValueError:
+            return next((p for p, v in self._odd_ids.items() if v == event_id), None)
+        if not self._ts:
+            return None
+        ids = np.frombuffer(self._ids, dtype="S16")
+        if self._ids_sorted:
+            i = int(np.searchsorted(ids, raw))
+        else:
+            hits = np.flatnonzero(ids == raw)
+            i = int(hits[0]) if hits.size else len(self)
+        del ids  # release the buffer export so the log can grow again
+        return i if i < len(self) and self._ids[i * 16:i * 16 + 16] == raw else None
+
+    def positions_for(self, dataset_ids: Iterable[str]) -> np.ndarray:
+        """Ascending positions of events on any of `dataset_ids`, found without decoding events."""
+        codes = [self._refs.codes[d] for d in dataset_ids if d in self._refs.codes]
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(np.frombuffer(self._dataset, dtype=np.int32).copy(), codes))
+
+    def for_datasets(self, dataset_ids: Set[str]) -> List[Event]:
+        return [self._event(int(p)) for p in self.positions_for(dataset_ids)]
@@ -0,0 +1,43 @@
+"""Time-ordered identifiers.
+
+New rows get UUIDv7 ids (RFC 9562): a 48-bit millisecond timestamp up front, then a
+12-bit sequence and random bits. They sort by creation time, so primary-key inserts
+land at the right edge of the B-tree, and ids minted in one process are strictly
+increasing. They stay in the canonical 36-char UUID text form and can sit next to
+older uuid4 ids in the same columns.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+
+
+_lock = threading.Lock()
+_last_ms = 0
+_seq = 0
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _seq
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Random start leaves room to count up within the same millisecond
+            _seq = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        else:
+            # Same millisecond or the clock stepped back: keep counting from the last value
+            _seq += 1
+            if _seq > 0xFFF:
+                _last_ms += 1
+                _seq = 0
+        ms, seq = _last_ms, _seq
+    rand = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | seq << 64 | 0b10 << 62 | rand
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    return str(uuid7())
@@ -1,12 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncEngine
+import asyncio
 import logging
 import os
 
 from backend.app.routers import datasets, connectors, feed, users, search, follows, databricks, dbtest, admin, tags
 from backend.app.routers import companies
-from backend.app.db import engine, Base, Config, get_connection_method
+from backend.app.db import engine, Config, SessionLocal, get_connection_method
+from backend.app.migrations import init_db
+from backend.app.persistence import start_persistence, stop_persistence
+from backend.app.serialization import FastJSONResponse
+from backend.app.services.activity import start_compaction
+from backend.app.services.invalidation import start_invalidation
+from backend.app.services.ranking import start_search
+from backend.app.services.semantic import start_semantic
+from backend.app.services.similarity import start_similarity
+from backend.app.services.trending import start_trending
 
 
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -15,7 +25,7 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
 )
 
-app = FastAPI(title="Databooks", version="0.1.0")
+app = FastAPI(title="Databooks", version="0.1.0", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,12 +56,39 @@ app.include_router(companies.router, prefix="/api/v1", tags=["Companies"])
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    # Create tables if engine configured
+    # Create tables and apply pending migrations if engine configured
     if engine is not None:
-        async with engine.begin() as conn:  # type: ignore[assignment]
-            # Ensure target schema exists, then create tables
-            await conn.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{Config.SCHEMA}"')
-            await conn.run_sync(Base.metadata.create_all)
-        logging.getLogger(__name__).info("Connected to database successfully using method='%s'", get_connection_method())
+        log = logging.getLogger(__name__)
+        try:
+            applied = await init_db(engine, migrate=Config.RUN_MIGRATIONS)
+        except Exception:
+            # Serving on a half-migrated schema fails in ways far harder to diagnose
+            log.exception("Database initialization failed; refusing to start")
+            raise
+        if applied:
+            log.info("Applied schema migrations: %s", applied)
+        log.info("Connected to database successfully using method='%s'", get_connection_method())
+        app.state.activity_compaction = start_compaction(SessionLocal)
+        app.state.cache_invalidation = start_invalidation()
+    else:
+        # Restore the in-memory store before the indexes below are built from it
+        app.state.memory_snapshots = start_persistence(Config.MEMORY_DB_PATH)
+    app.state.trending_rebuild = start_trending(SessionLocal)
+    app.state.similarity_rebuild = start_similarity(SessionLocal)
+    app.state.search_rebuild = start_search(SessionLocal)
+    app.state.semantic_rebuild = start_semantic(SessionLocal)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    tasks = []
+    for name in ("activity_compaction", "trending_rebuild", "similarity_rebuild", "search_rebuild", "semantic_rebuild", "memory_snapshots", "cache_invalidation", "column_crawl"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+            tasks.append(task)
+    # Let cancelled tasks unwind (the invalidation listener hands its connection back to the pool)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await stop_persistence()
 
 
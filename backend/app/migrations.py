@@ -0,0 +1,426 @@
+"""Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables; anything that changes
+existing tables (indexes, column types, backfills) is a numbered migration here.
+Applied versions are recorded in `schema_migrations`. Migrations run at startup
+(disable with DB_RUN_MIGRATIONS=0) or from the CLI:
+
+    python -m backend.app.migrations [upgrade|status]
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import sys
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from backend.app.db import Base, Config, engine as default_engine
+from backend.app.storage import utcnow
+
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant; serializes migration runs across workers/pods starting together
+ADVISORY_LOCK_ID = 7_318_004_211
+LOCK_POLL_INTERVAL = 0.5
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: tuple[str, ...]
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so concurrent
+    # migrations run statement by statement in autocommit mode.
+    concurrent: bool = False
+    # Optional Postgres extension the statements need. If it cannot be created (not
+    # installed, or no privilege) the migration is skipped and retried on the next run
+    # instead of blocking everything after it.
+    extension: Optional[str] = None
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "reverse and filter indexes for social and feed lookups",
+        (
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_follows_dataset_id ON "{schema}".follows (dataset_id)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_likes_dataset_id ON "{schema}".likes (dataset_id)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_datasets_owner_id ON "{schema}".datasets (owner_id)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_datasets_org_id ON "{schema}".datasets (org_id)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_actor_id_created_at ON "{schema}".events (actor_id, created_at)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_type_created_at ON "{schema}".events (type, created_at)',
+        ),
+        concurrent=True,
+    ),
+    Migration(
+        2,
+        "backfill dataset_tags and tag_counts from datasets.tags",
+        (
+            # Cast through jsonb so this works whether the column is json or jsonb
+            """
+            INSERT INTO "{schema}".dataset_tags (dataset_id, tag_lower, tag)
+            SELECT DISTINCT ON (d.id, lower(btrim(t.tag))) d.id, lower(btrim(t.tag)), btrim(t.tag)
+            FROM (
+                SELECT id, tags::jsonb AS tags FROM "{schema}".datasets
+                WHERE tags IS NOT NULL AND jsonb_typeof(tags::jsonb) = 'array'
+            ) d
+            CROSS JOIN LATERAL jsonb_array_elements_text(d.tags) WITH ORDINALITY AS t(tag, pos)
+            WHERE btrim(t.tag) <> ''
+            ORDER BY d.id, lower(btrim(t.tag)), t.pos
+            ON CONFLICT DO NOTHING
+            """,
+            """
+            INSERT INTO "{schema}".tag_counts (tag_lower, tag, count)
+            SELECT tag_lower, min(tag), count(*) FROM "{schema}".dataset_tags GROUP BY tag_lower
+            ON CONFLICT (tag_lower) DO UPDATE SET count = EXCLUDED.count
+            """,
+        ),
+    ),
+    Migration(
+        3,
+        "store datasets.tags and source_metadata_json as jsonb",
+        (
+            'ALTER TABLE "{schema}".datasets ALTER COLUMN tags TYPE jsonb USING tags::jsonb',
+            'ALTER TABLE "{schema}".datasets ALTER COLUMN source_metadata_json TYPE jsonb USING source_metadata_json::jsonb',
+        ),
+    ),
+    Migration(
+        4,
+        "GIN indexes for dataset tag and source metadata containment",
+        (
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_datasets_tags_gin ON "{schema}".datasets USING gin (tags jsonb_path_ops)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_datasets_source_metadata_gin ON "{schema}".datasets USING gin (source_metadata_json jsonb_path_ops)',
+        ),
+        concurrent=True,
+    ),
+    Migration(
+        5,
+        "backfill company_stats rollup",
+        (
+            # Baseline timestamps are still varchar here (converted by migration 10), and
+            # varchar has no assignment cast to timestamptz; going through text handles both
+            """
+            WITH u AS (
+                SELECT coalesce(nullif(btrim(company), ''), 'Unknown') AS company, count(*) AS n,
+                       max(nullif(btrim(created_at::text), '')::timestamptz) AS last
+                FROM "{schema}".users
+                GROUP BY 1
+            ), d AS (
+                SELECT coalesce(nullif(btrim(us.company), ''), 'Unknown') AS company, count(*) AS n,
+                       max(nullif(btrim(ds.updated_at::text), '')::timestamptz) AS last
+                FROM "{schema}".datasets ds
+                JOIN "{schema}".users us ON us.id = ds.owner_id
+                GROUP BY 1
+            )
+            INSERT INTO "{schema}".company_stats (company, user_count, dataset_count, last_activity_at)
+            SELECT coalesce(u.company, d.company), coalesce(u.n, 0), coalesce(d.n, 0), greatest(u.last, d.last)
+            FROM u FULL OUTER JOIN d ON d.company = u.company
+            ON CONFLICT (company) DO UPDATE SET
+                user_count = EXCLUDED.user_count,
+                dataset_count = EXCLUDED.dataset_count,
+                last_activity_at = EXCLUDED.last_activity_at
+            """,
+        ),
+    ),
+    Migration(
+        6,
+        "ordering index for the user directory",
+        ('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_id ON "{schema}".users (name, id)',),
+        concurrent=True,
+    ),
+    Migration(
+        7,
+        "trigram indexes for user name/email substring search",
+        (
+            # Not declared on UserModel: create_all would fail on databases without pg_trgm
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_name_trgm ON "{schema}".users USING gin (name gin_trgm_ops)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm ON "{schema}".users USING gin (email gin_trgm_ops)',
+        ),
+        concurrent=True,
+        extension="pg_trgm",
+    ),
+    Migration(
+        8,
+        "backfill feed_items read model from events",
+        (
+            # Human text mirrors services.events.human_text; created_at is cast as in migration 5
+            """
+            INSERT INTO "{schema}".feed_items
+                (id, type, human_text, payload_json, actor_id, actor_name, dataset_id, dataset_name, org_id, visibility, created_at)
+            SELECT e.id, e.type, h.text,
+                   CASE WHEN h.text IS NULL THEN e.p ELSE e.p || jsonb_build_object('human_text', h.text) END,
+                   e.actor_id, u.name, e.dataset_id, d.name, d.org_id, d.visibility,
+                   coalesce(nullif(btrim(e.created_at::text), '')::timestamptz, '1970-01-01T00:00:00Z')
+            FROM (
+                SELECT ev.*, CASE WHEN jsonb_typeof(ev.payload_json::jsonb) = 'object' THEN ev.payload_json::jsonb ELSE '{}'::jsonb END AS p
+                FROM "{schema}".events ev
+            ) e
+            CROSS JOIN LATERAL (
+                SELECT coalesce(nullif(e.p->>'human_text', ''), CASE e.type
+                    WHEN 'dataset.published' THEN coalesce(e.p->>'name', 'Dataset') || ' was added'
+                    WHEN 'dataset.connected' THEN 'Connected to ' || coalesce(e.p->>'platform', 'target')
+                    WHEN 'dataset.refreshed' THEN 'Refreshed ' || coalesce(e.p->>'delta_rows', '') || ' rows'
+                    WHEN 'dataset.schema.changed' THEN 'Schema updated'
+                    WHEN 'user.followed' THEN 'New follower'
+                    WHEN 'dataset.liked' THEN 'New like'
+                END) AS text
+            ) h
+            LEFT JOIN "{schema}".users u ON u.id = e.actor_id
+            LEFT JOIN "{schema}".datasets d ON d.id = e.dataset_id
+            ON CONFLICT (id) DO NOTHING
+            """,
+        ),
+    ),
+    Migration(
+        9,
+        "seed user_feed inboxes from existing follows",
+        (
+            # Same depth as services.feed.SEED_ON_FOLLOW
+            """
+            INSERT INTO "{schema}".user_feed (user_id, event_id, created_at)
+            SELECT f.user_id, fi.id, fi.created_at
+            FROM "{schema}".follows f
+            CROSS JOIN LATERAL (
+                SELECT id, created_at FROM "{schema}".feed_items
+                WHERE dataset_id = f.dataset_id
+                ORDER BY created_at DESC, id DESC
+                LIMIT 50
+            ) fi
+            ON CONFLICT DO NOTHING
+            """,
+        ),
+    ),
+    Migration(
+        10,
+        "store created_at/updated_at/last_activity_at as timestamptz",
+        (
+            # Only converts columns still stored as text, so databases created after this
+            # change (already timestamptz via create_all) are left alone.
+            """
+            DO $$
+            DECLARE
+                r record;
+                expr text;
+            BEGIN
+                FOR r IN
+                    SELECT c.table_name, c.column_name, c.is_nullable
+                    FROM information_schema.columns c
+                    WHERE c.table_schema = '{schema}'
+                      AND c.data_type IN ('character varying', 'text')
+                      AND (c.table_name, c.column_name) IN (
+                          ('users', 'created_at'),
+                          ('datasets', 'created_at'),
+                          ('datasets', 'updated_at'),
+                          ('events', 'created_at'),
+                          ('feed_items', 'created_at'),
+                          ('user_feed', 'created_at'),
+                          ('company_stats', 'last_activity_at')
+                      )
+                LOOP
+                    expr := format('nullif(btrim(%I), %L)', r.column_name, '');
+                    IF r.is_nullable = 'NO' THEN
+                        expr := format('coalesce(%s, %L)', expr, '1970-01-01T00:00:00Z');
+                    END IF;
+                    EXECUTE format(
+                        'ALTER TABLE %I.%I ALTER COLUMN %I TYPE timestamptz USING (%s)::timestamptz',
+                        '{schema}', r.table_name, r.column_name, expr
+                    );
+                END LOOP;
+            END
+            $$
+            """,
+        ),
+    ),
+    Migration(
+        11,
+        "created_at ordering indexes for datasets and events",
+        (
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_datasets_created_at_id ON "{schema}".datasets (created_at, id)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_created_at_id ON "{schema}".events (created_at, id)',
+        ),
+        concurrent=True,
+    ),
+    Migration(
+        12,
+        "backfill dataset_activity_daily from events",
+        (
+            """
+            INSERT INTO "{schema}".dataset_activity_daily (dataset_id, day, type, count)
+            SELECT dataset_id, (created_at AT TIME ZONE 'UTC')::date, type, count(*)
+            FROM "{schema}".events
+            WHERE dataset_id IS NOT NULL
+            GROUP BY 1, 2, 3
+            ON CONFLICT (dataset_id, day, type) DO UPDATE SET count = EXCLUDED.count
+            """,
+        ),
+    ),
+    Migration(
+        13,
+        "actor index for feed_items (user renames)",
+        ('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feed_items_actor_id ON "{schema}".feed_items (actor_id)',),
+        concurrent=True,
+    ),
+]
+
+
+_INDEX_NAME = re.compile(r"IF NOT EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+def _render(stmt: str) -> str:
+    return stmt.replace("{schema}", Config.SCHEMA)
+
+
+async def _ensure_table(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{Config.SCHEMA}".schema_migrations ('
+        'version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at VARCHAR NOT NULL)'
+    ))
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    res = await conn.execute(text(f'SELECT version FROM "{Config.SCHEMA}".schema_migrations'))
+    return {r[0] for r in res.fetchall()}
+
+
+async def _drop_invalid_index(conn: AsyncConnection, name: str) -> None:
+    # A failed CONCURRENTLY build leaves an INVALID index behind that IF NOT EXISTS would skip
+    res = await conn.execute(text(
+        """
+        SELECT 1 FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :name AND NOT i.indisvalid
+        """
+    ), {"schema": Config.SCHEMA, "name": name})
+    if res.first() is not None:
+        logger.warning("migrations: dropping invalid index %s before rebuilding", name)
+        await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{Config.SCHEMA}"."{name}"'))
+
+
+async def _ensure_extension(conn: AsyncConnection, name: str) -> bool:
+    try:
+        await conn.execute(text(f'CREATE EXTENSION IF NOT EXISTS "{name}"'))
+    except DBAPIError as exc:
+        logger.warning("migrations: extension %s unavailable (%s)", name, exc.orig)
+        return False
+    return True
+
+
+async def _apply(eng: AsyncEngine, lock_conn: AsyncConnection, m: Migration) -> bool:
+    if m.extension and not await _ensure_extension(lock_conn, m.extension):
+        logger.warning("migrations: skipping %04d until %s is available", m.version, m.extension)
+        return False
+    record = text(
+        f'INSERT INTO "{Config.SCHEMA}".schema_migrations (version, description, applied_at) '
+        'VALUES (:v, :d, :at)'
+    )
+    params = {"v": m.version, "d": m.description, "at": utcnow().isoformat()}
+    if m.concurrent:
+        for stmt in m.statements:
+            match = _INDEX_NAME.search(stmt)
+            if match and "CONCURRENTLY" in stmt.upper():
+                await _drop_invalid_index(lock_conn, match.group(1))
+            await lock_conn.execute(text(_render(stmt)))
+        await lock_conn.execute(record, params)
+        return True
+    async with eng.begin() as conn:
+        for stmt in m.statements:
+            await conn.execute(text(_render(stmt)))
+        await conn.execute(record, params)
+    return True
+
+
+async def _acquire_lock(conn: AsyncConnection) -> None:
+    # Poll instead of blocking in pg_advisory_lock: a statement waiting on the lock holds
+    # a snapshot, and the holder's CREATE INDEX CONCURRENTLY waits for every older
+    # snapshot to go away, so a blocked waiter would deadlock with it.
+    while True:
+        res = await conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+        if res.scalar():
+            return
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+
+@asynccontextmanager
+async def _migration_lock(eng: AsyncEngine) -> AsyncIterator[AsyncConnection]:
+    """Autocommit connection holding the migration advisory lock."""
+    async with eng.connect() as raw:
+        conn = await raw.execution_options(isolation_level="AUTOCOMMIT")
+        await _acquire_lock(conn)
+        try:
+            yield conn
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+
+
+async def _run_pending(eng: AsyncEngine, conn: AsyncConnection) -> list[int]:
+    applied_now: list[int] = []
+    await _ensure_table(conn)
+    done = await _applied_versions(conn)
+    for m in sorted(MIGRATIONS, key=lambda x: x.version):
+        if m.version in done:
+            continue
+        logger.info("migrations: applying %04d %s", m.version, m.description)
+        if await _apply(eng, conn, m):
+            applied_now.append(m.version)
+    return applied_now
+
+
+async def run_migrations(eng: Optional[AsyncEngine] = None) -> list[int]:
+    """Apply pending migrations in version order; returns the versions applied."""
+    eng = eng or default_engine
+    if eng is None:
+        raise RuntimeError("DATABASE_URL not configured")
+    async with _migration_lock(eng) as conn:
+        return await _run_pending(eng, conn)
+
+
+async def init_db(eng: Optional[AsyncEngine] = None, migrate: bool = True) -> list[int]:
+    """Create the schema and any missing tables, then apply pending migrations."""
+    eng = eng or default_engine
+    if eng is None:
+        raise RuntimeError("DATABASE_URL not configured")
+    # Under the lock too: workers starting together would race on CREATE SCHEMA/TABLE
+    async with _migration_lock(eng) as conn:
+        async with eng.begin() as ddl:
+            await ddl.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{Config.SCHEMA}"')
+            await ddl.run_sync(Base.metadata.create_all)
+        return await _run_pending(eng, conn) if migrate else []
+
+
+async def migration_status(eng: Optional[AsyncEngine] = None) -> list[dict]:
+    eng = eng or default_engine
+    if eng is None:
+        raise RuntimeError("DATABASE_URL not configured")
+    async with eng.connect() as raw:
+        conn = await raw.execution_options(isolation_level="AUTOCOMMIT")
+        await _ensure_table(conn)
+        done = await _applied_versions(conn)
+    return [{"version": m.version, "description": m.description, "applied": m.version in done} for m in MIGRATIONS]
+
+
+def main(argv: list[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    cmd = argv[0] if argv else "upgrade"
+    if cmd == "upgrade":
+        applied = asyncio.run(init_db())
+        print(f"applied: {applied or 'nothing to do'}")
+    elif cmd == "status":
+        for row in asyncio.run(migration_status()):
+            print(f"{row['version']:04d} {'applied' if row['applied'] else 'pending':8} {row['description']}")
+    else:
+        print("usage: python -m backend.app.migrations [upgrade|status]")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
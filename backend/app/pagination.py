@@ -0,0 +1,48 @@
+"""Opaque keyset cursors shared by paginated endpoints."""
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = orjson.dumps(list(values))
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], arity: int) -> Optional[List[Any]]:
+    """Decode a cursor produced by encode_cursor; 400 on anything malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = orjson.loads(raw)
+    except Exception:
+        raise HTTPException(400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != arity:
+        raise HTTPException(400, detail="Invalid cursor")
+    return values
+
+
+def cursor_time(value: Any) -> datetime:
+    """Timestamp component of a decoded cursor (encoded as ISO 8601 by orjson)."""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, detail="Invalid cursor")
+
+
+def page_rows(rows: List[Any], limit: int, key: Callable[[Any], Tuple[Any, ...]]) -> Tuple[List[Any], Optional[str]]:
+    """Trim a LIMIT n+1 result to n rows and derive the next cursor from the last one kept."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def clamp_limit(limit: int, maximum: int = 200) -> int:
+    return max(1, min(int(limit), maximum))
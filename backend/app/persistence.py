@@ -0,0 +1,316 @@
+"""Optional on-disk persistence for the in-memory store (DB-less mode).
+
+With MEMORY_DB_PATH set, every InMemoryDB mutation (datasets, users, events, follows,
+likes, tag follows and crawled columns) is appended to a binary write-ahead log, and the whole store is
+periodically written out as one compact snapshot. Both live in MEMORY_DB_PATH:
+
+- ``snapshot.bin``: magic, a JSON header, then raw sections. The event log's columns
+  are stored exactly as EventLog keeps them in memory, so restoring millions of events
+  is a handful of memcpys out of the memory-mapped file; everything else is one orjson
+  document.
+- ``wal-<generation>.log``: records of ``<u32 length><u32 crc32><u8 kind><orjson body>``.
+- ``lock``: flock'ed exclusively by the process using the directory; a second process
+  (another worker) fails to start instead of corrupting the logs.
+
+A snapshot starts a new log generation at the moment it captures the store and records
+that generation in its header. Startup loads the snapshot and replays every log from
+that generation on, so a crash between writing the snapshot and deleting old logs
+neither loses nor repeats writes. A torn record at the end of a log (a crash mid-write)
+is dropped. Records are written through to the OS on every mutation, so they survive
+a process crash; MEMORY_DB_FSYNC additionally fsyncs each one against power loss.
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from backend.app.db import Config
+from backend.app.eventlog import EventLog
+from backend.app.schemas import Dataset, Event, User
+from backend.app.storage import InMemoryDB, db
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"DBKSNAP1"
+SNAPSHOT_NAME = "snapshot.bin"
+LOCK_NAME = "lock"
+_RECORD = struct.Struct("<IIB")
+_U64 = struct.Struct("<Q")
+
+# Record kinds on disk; the names are the ones InMemoryDB passes to its journal
+KINDS = {"dataset": 1, "user": 2, "event": 3, "follows": 4, "likes": 5, "tag_follows": 6, "dataset_columns": 7}
+_KIND_NAMES = {code: name for name, code in KINDS.items()}
+_FLAG_TABLES = ("follows", "likes", "tag_follows")
+
+# A snapshot thread keeps running if its task is cancelled at shutdown; the final
+# snapshot must neither interleave with it nor be replaced by it afterwards.
+_write_lock = threading.Lock()
+_written_generation = -1
+
+# (directory, open lock file) held while this process owns a MEMORY_DB_PATH
+_dir_lock: Optional[Tuple[Path, Any]] = None
+
+
+def _encode(kind: str, value: Any) -> bytes:
+    if kind == "event":
+        return orjson.dumps(value.model_dump(mode="json", exclude={"actor", "dataset"}))
+    if kind in ("dataset", "user"):
+        return orjson.dumps(value.model_dump(mode="json"))
+    if kind == "dataset_columns":
+        return orjson.dumps(value)
+    (user_id, target), on = value
+    return orjson.dumps([user_id, target, on])
+
+
+def _apply(store: InMemoryDB, kind: str, body: bytes) -> None:
+    data = orjson.loads(body)
+    if kind == "dataset":
+        store.put_dataset(Dataset.model_validate(data))
+    elif kind == "user":
+        store.upsert_user(User.model_validate(data))
+    elif kind == "event":
+        store.add_event(Event.model_validate(data))
+    elif kind == "dataset_columns":
+        store.set_columns(data[0], [tuple(c) for c in data[1]])
+    else:
+        store.set_flag(kind, (data[0], data[1]), data[2])
+
+
+def _wal_path(directory: Path, generation: int) -> Path:
+    return directory / f"wal-{generation:08d}.log"
+
+
+def _wal_generations(directory: Path) -> List[int]:
+    return sorted(int(p.stem[4:]) for p in directory.glob("wal-*.log") if p.stem[4:].isdigit())
+
+
+class Journal:
+    """Append-only writer for the current log generation."""
+
+    def __init__(self, directory: Path, generation: int, fsync: bool = False):
+        self.directory = directory
+        self.generation = generation
+        self.fsync = fsync
+        self.records = 0
+        self._file = open(_wal_path(directory, generation), "ab", buffering=0)
+
+    def append(self, kind: str, value: Any) -> None:
+        code = KINDS[kind]
+        body = _encode(kind, value)
+        self._file.write(_RECORD.pack(len(body), zlib.crc32(bytes([code]) + body), code) + body)
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records += 1
+
+    def rotate(self) -> int:
+        """Close this generation and start the next; returns the new generation."""
+        self._file.close()
+        self.generation += 1
+        self.records = 0
+        self._file = open(_wal_path(self.directory, self.generation), "ab", buffering=0)
+        return self.generation
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def replay(store: InMemoryDB, path: Path) -> int:
+    """Apply every intact record of one log file; a torn tail is truncated away."""
+    applied = 0
+    with open(path, "r+b") as f:
+        data = f.read()
+        pos = 0
+        while pos + _RECORD.size <= len(data):
+            length, crc, code = _RECORD.unpack_from(data, pos)
+            end = pos + _RECORD.size + length
+            body = data[pos + _RECORD.size:end]
+            if end > len(data) or zlib.crc32(bytes([code]) + body) != crc or code not in _KIND_NAMES:
+                break
+            _apply(store, _KIND_NAMES[code], body)
+            applied += 1
+            pos = end
+        if pos < len(data):
+            logger.warning("persistence: dropping %d torn bytes at the end of %s", len(data) - pos, path.name)
+            f.truncate(pos)
+    return applied
+
+
+def capture(store: InMemoryDB) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """Serialize the store into (header, sections); must run without awaiting in between."""
+    events_meta, columns = store.events.state()
+    state = orjson.dumps({
+        "datasets": [ds.model_dump(mode="json") for ds in store.datasets.values()],
+        "users": [u.model_dump(mode="json") for u in store.users.values()],
+        **{table: [list(key) for key in getattr(store, table)] for table in _FLAG_TABLES},
+        "badges": store.badges,
+        "dataset_columns": store.dataset_columns,
+    })
+    sections = {**{f"events{name}": col for name, col in columns.items()}, "state": state}
+    header = {"byteorder": sys.byteorder, "events": events_meta, "sections": {}}
+    offset = 0
+    for name, blob in sections.items():
+        header["sections"][name] = [offset, len(blob)]
+        offset += len(blob)
+    return header, sections
+
+
+def write_snapshot(directory: Path, header: Dict[str, Any], sections: Dict[str, bytes]) -> None:
+    """Write snapshot.bin atomically (temp file, fsync, rename) unless a newer one was written."""
+    global _written_generation
+    meta = orjson.dumps(header)
+    tmp = directory / (SNAPSHOT_NAME + ".tmp")
+    with _write_lock:
+        if header["wal_generation"] <= _written_generation:
+            return
+        with open(tmp, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + _U64.pack(len(meta)) + meta)
+            for blob in sections.values():
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, directory / SNAPSHOT_NAME)
+        _written_generation = header["wal_generation"]
+
+
+def load_snapshot(store: InMemoryDB, path: Path) -> int:
+    """Restore `store` from a snapshot file; returns the first log generation to replay."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        (meta_len,) = _U64.unpack_from(mm, len(SNAPSHOT_MAGIC))
+        base = len(SNAPSHOT_MAGIC) + _U64.size + meta_len
+        header = orjson.loads(mm[base - meta_len:base])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        view = memoryview(mm)
+        try:
+            sec = {name: view[base + off:base + off + n] for name, (off, n) in header["sections"].items()}
+            store.events = EventLog.from_state(
+                header["events"], {name[len("events"):]: v for name, v in sec.items() if name.startswith("events")},
+            )
+            state = orjson.loads(sec["state"])
+            for v in sec.values():
+                v.release()
+        finally:
+            view.release()
+    for data in state["datasets"]:
+        store.put_dataset(Dataset.model_validate(data))
+    store.users = {u["id"]: User.model_validate(u) for u in state["users"]}
+    for table in _FLAG_TABLES:
+        setattr(store, table, {tuple(key): True for key in state[table]})
+    store.badges = state["badges"]
+    store.dataset_columns = {k: [tuple(c) for c in cols] for k, cols in state["dataset_columns"].items()}
+    store.activity_daily = store.events.daily_counts()
+    return header["wal_generation"]
+
+
+def restore(store: InMemoryDB, directory: Path) -> int:
+    """Load the snapshot (if any) and replay the logs after it; returns the generation to append to."""
+    t0 = time.monotonic()
+    snapshot = directory / SNAPSHOT_NAME
+    first = load_snapshot(store, snapshot) if snapshot.exists() else 0
+    generations = [g for g in _wal_generations(directory) if g >= first]
+    replayed = sum(replay(store, _wal_path(directory, g)) for g in generations)
+    logger.info(
+        "persistence: restored %d datasets, %d users, %d events (%d log records) in %.2fs",
+        len(store.datasets), len(store.users), len(store.events), replayed, time.monotonic() - t0,
+    )
+    return generations[-1] if generations else first
+
+
+async def snapshot(store: InMemoryDB, directory: Path) -> None:
+    """Capture the store, start a new log generation, and write the snapshot off the event loop."""
+    journal = store.journal
+    header, sections = capture(store)
+    header["wal_generation"] = journal.rotate()
+    await asyncio.to_thread(write_snapshot, directory, header, sections)
+    for g in _wal_generations(directory):
+        if g < header["wal_generation"]:
+            _wal_path(directory, g).unlink(missing_ok=True)
+
+
+def lock_directory(directory: Path) -> None:
+    """Take an exclusive lock on `directory` for this process, or raise if another process holds it.
+
+    Two processes appending to the same log would interleave records and delete each
+    other's generations, so a second worker pointed at the directory must not start.
+    """
+    global _dir_lock
+    directory = directory.resolve()
+    if _dir_lock is not None and _dir_lock[0] == directory:
+        return
+    f = open(directory / LOCK_NAME, "a+b")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise RuntimeError(f"{directory} is in use by another process; MEMORY_DB_PATH cannot be shared") from None
+    unlock_directory()
+    _dir_lock = (directory, f)
+
+
+def unlock_directory() -> None:
+    global _dir_lock
+    if _dir_lock is not None:
+        _dir_lock[1].close()
+        _dir_lock = None
+
+
+def open_store(path: str, store: InMemoryDB = db) -> None:
+    """Lock `path`, restore `store` from it and start journaling its writes there."""
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    lock_directory(directory)
+    journal_was, store.journal = store.journal, None  # replay must not log itself again
+    generation = restore(store, directory)
+    if journal_was is not None:
+        journal_was.close()
+    store.journal = Journal(directory, generation, fsync=Config.MEMORY_DB_FSYNC)
+
+
+async def snapshot_loop(store: InMemoryDB, directory: Path, interval: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        if not store.journal.records:
+            continue
+        try:
+            t0 = time.monotonic()
+            await snapshot(store, directory)
+            logger.info("persistence: snapshot written in %.2fs", time.monotonic() - t0)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("persistence: snapshot failed")
+
+
+def start_persistence(path: Optional[str]) -> asyncio.Task | None:
+    if not path:
+        return None
+    open_store(path)
+    if Config.MEMORY_SNAPSHOT_INTERVAL <= 0:
+        return None
+    return asyncio.create_task(snapshot_loop(db, Path(path), Config.MEMORY_SNAPSHOT_INTERVAL))
+
+
+async def stop_persistence() -> None:
+    """Write a final snapshot so the next start replays nothing."""
+    if db.journal is None:
+        return
+    if db.journal.records:
+        await snapshot(db, db.journal.directory)
+    db.journal.close()
+    db.journal = None
+    unlock_directory()
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 import random
-import uuid
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
 from sqlalchemy import update
 
 from backend.app.schemas import Event, User
-from backend.app.storage import db, now_iso
-from backend.app.db import get_session_optional, EventModel, FollowModel, LikeModel, DatasetModel, UserModel
+from backend.app.ids import new_id
+from backend.app.storage import db, utcnow
+from backend.app.db import get_session_optional, FollowModel, LikeModel, DatasetModel, SessionLocal, UserModel
+from backend.app.services.columns import crawl_status, start_crawl
+from backend.app.services.companies import bump_company, company_key
+from backend.app.services.events import record_event, rename_feed_refs
+from backend.app.services.datasets import dataset_cache
+from backend.app.services.hydration import RefLoader, dataset_names, user_names
+from backend.app.services.invalidation import bus
+from backend.app.services.social import apply_toggle, bump_stats
 
 
 router = APIRouter()
@@ -35,8 +42,11 @@ async def _get_user_columns(session: AsyncSession) -> set[str]:
         return {"id","name","email","org_id","role","created_at"}
 
 
-async def _insert_user_safe(session: AsyncSession, u: User) -> None:
-    """Insert a user row using only columns that exist in the DB schema."""
+async def _insert_user_safe(session: AsyncSession, u: User) -> bool:
+    """Insert a user row using only columns that exist in the DB schema.
+
+    Returns True if a new row was inserted (and counted in the company rollup).
+    """
     from sqlalchemy import text
     from backend.app.db import Config
     cols = await _get_user_columns(session)
@@ -63,11 +73,14 @@ async def _insert_user_safe(session: AsyncSession, u: User) -> None:
 
     col_list = ", ".join(f'"{c}"' for c in data.keys())
     val_list = ", ".join(f':{c}' for c in data.keys())
-    sql = text(f'INSERT INTO "{Config.SCHEMA}".users ({col_list}) VALUES ({val_list}) ON CONFLICT (id) DO NOTHING')
-    await session.execute(sql, data)
+    sql = text(f'INSERT INTO "{Config.SCHEMA}".users ({col_list}) VALUES ({val_list}) ON CONFLICT (id) DO NOTHING RETURNING id')
+    inserted = (await session.execute(sql, data)).first() is not None
     # Set JSON tools via ORM if the column exists
     if "tools" in cols and u.tools is not None:
         await session.execute(update(UserModel).where(UserModel.id == u.id).values(tools=u.tools))
+    if inserted:
+        await bump_company(session, u.company, users=1)
+    return inserted
 
 
 def _ensure_datasets(session: Optional[AsyncSession] = None) -> list[tuple[str, str]]:
@@ -117,7 +130,7 @@ async def admin_seed_users(body: SeedUsersRequest | None = None, session: AsyncS
         domain_slug_root = company.lower().replace(" ", "")
         for domain in domains:
             for _ in range(max(1, int(req.per_domain))):
-                uid = f"user-{uuid.uuid4()}"
+                uid = f"user-{new_id()}"
                 if use_faker and faker is not None:
                     name = faker.name()
                     local = (name.lower().replace(" ", ".").replace("'", ""))
@@ -139,7 +152,7 @@ async def admin_seed_users(body: SeedUsersRequest | None = None, session: AsyncS
                     platform_profile_id=None,
                     org_id="org",
                     role="consumer",
-                    created_at=now_iso(),
+                    created_at=utcnow(),
                     platform_profile=None,
                     avatar_url=avatar,
                     tools=tools,
@@ -169,7 +182,7 @@ async def seed_fake_users_and_activity(
 
     # Seed users (in-memory)
     for i in range(users):
-        user_id = f"user-{uuid.uuid4()}"
+        user_id = f"user-{new_id()}"
         user = User(
             id=user_id,
             name=f"User {i+1}",
@@ -177,7 +190,7 @@ async def seed_fake_users_and_activity(
             platform_profile_id=None,
             org_id="org",
             role="consumer",
-            created_at=now_iso(),
+            created_at=utcnow(),
             platform_profile=None,
             avatar_url=f"https://ui-avatars.com/api/?name=User+{i+1}",
             tools=[random.choice(["databricks","snowflake","bigquery","redshift"])],
@@ -203,6 +216,7 @@ async def seed_fake_users_and_activity(
 
     user_ids = list(db.users.keys())
     platforms = ["snowflake", "databricks", "bigquery", "redshift"]
+    loader = RefLoader(session)
 
     for _ in range(interactions):
         ds = random.choice(datasets)
@@ -213,15 +227,15 @@ async def seed_fake_users_and_activity(
             k=1,
         )[0]
         if etype == "dataset.liked":
-            db.likes[(actor, ds.id)] = True
+            db.set_flag("likes", (actor, ds.id), True)
             created_likes += 1
-            if session is not None:
-                session.add(LikeModel(user_id=actor, dataset_id=ds.id))
+            if session is not None and await apply_toggle(session, LikeModel, actor, ds.id, True):
+                await bump_stats(session, ds.id, likes=1)
         elif etype == "user.followed":
-            db.follows[(actor, ds.id)] = True
+            db.set_flag("follows", (actor, ds.id), True)
             created_follows += 1
-            if session is not None:
-                session.add(FollowModel(user_id=actor, dataset_id=ds.id))
+            if session is not None and await apply_toggle(session, FollowModel, actor, ds.id, True):
+                await bump_stats(session, ds.id, followers=1)
 
         payload = {}
         if etype == "dataset.connected":
@@ -230,16 +244,14 @@ async def seed_fake_users_and_activity(
             payload = {"delta_rows": random.randint(100, 10000)}
 
         ev = Event(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             type=etype,
             payload_json=payload,
             actor_id=actor,
             dataset_id=ds.id,
-            created_at=now_iso(),
+            created_at=utcnow(),
         )
-        db.add_event(ev)
-        if session is not None:
-            session.add(EventModel(id=ev.id, type=ev.type, payload_json=ev.payload_json, actor_id=ev.actor_id, dataset_id=ev.dataset_id, created_at=ev.created_at))
+        await record_event(session, ev, loader)
         created_events += 1
 
     if session is not None:
@@ -248,15 +260,34 @@ async def seed_fake_users_and_activity(
     return {"users": created_users, "events": created_events, "likes": created_likes, "follows": created_follows}
 
 
+@router.post("/admin/columns/crawl", status_code=202)
+async def admin_crawl_columns(request: Request) -> dict:
+    """Start re-crawling every dataset's column list into the column index (in the background)."""
+    request.app.state.column_crawl = start_crawl(SessionLocal)
+    return crawl_status
+
+
+@router.get("/admin/columns/crawl")
+def admin_crawl_status() -> dict:
+    """Progress of the latest column crawl started by this worker."""
+    return crawl_status
+
+
+@router.get("/admin/cache/stats")
+def admin_cache_stats() -> dict:
+    """Size and hit rate of this worker's process-local caches."""
+    return {"datasets": dataset_cache.stats(), "dataset_names": dataset_names.stats(), "user_names": user_names.stats()}
+
+
 @router.post("/admin/users")
 async def admin_create_user(payload: dict, session: AsyncSession | None = Depends(get_session_optional)) -> User:
     """Create a user (in-memory) for demo/admin purposes.
 
     Body supports: name, email, avatar_url, job_title, company, subsidiary, tools (list[str])
     """
-    user_id = payload.get("id") or f"user-{uuid.uuid4()}"
+    user_id = payload.get("id") or f"user-{new_id()}"
     name = payload.get("name") or "New User"
-    email = payload.get("email") or f"{user_id[:6]}@example.com"
+    email = payload.get("email") or f"{user_id[-6:]}@example.com"
     u = User(
         id=user_id,
         name=name,
@@ -264,7 +295,7 @@ async def admin_create_user(payload: dict, session: AsyncSession | None = Depend
         platform_profile_id=None,
         org_id=payload.get("org_id") or "org",
         role=payload.get("role") or "consumer",
-        created_at=now_iso(),
+        created_at=utcnow(),
         platform_profile=None,
         avatar_url=payload.get("avatar_url") or f"https://ui-avatars.com/api/?name={name.replace(' ', '+')}",
         tools=payload.get("tools") or ["databricks"],
@@ -288,6 +319,7 @@ async def admin_update_user(user_id: str, body: dict, session: AsyncSession | No
         return await admin_create_user({"id": user_id, **body})
     if "name" in body:
         existing.name = str(body["name"])[:128]
+        await bus.publish(session, [f"user_name:{user_id}"])
     if "email" in body:
         existing.email = str(body["email"])[:256]
     if "avatar_url" in body:
@@ -318,7 +350,11 @@ async def admin_update_user(user_id: str, body: dict, session: AsyncSession | No
                 created_at=existing.created_at,
             )
             session.add(row)
+            await bump_company(session, existing.company, users=1)
         else:
+            if company_key(row.company) != company_key(existing.company):
+                await bump_company(session, row.company, users=-1)
+                await bump_company(session, existing.company, users=1)
             row.name = existing.name
             row.email = existing.email
             row.avatar_url = existing.avatar_url
@@ -326,6 +362,8 @@ async def admin_update_user(user_id: str, body: dict, session: AsyncSession | No
             row.company = existing.company
             row.subsidiary = existing.subsidiary
             row.tools = existing.tools
+        if "name" in body:
+            await rename_feed_refs(session, user_id=user_id, name=existing.name)
         await session.commit()
     return existing
 
@@ -334,16 +372,16 @@ async def admin_update_user(user_id: str, body: dict, session: AsyncSession | No
 async def admin_bulk_users(count: int = 20, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
     created = 0
     for i in range(count):
-        user_id = f"user-{uuid.uuid4()}"
-        name = f"User {user_id[:6]}"
+        user_id = f"user-{new_id()}"
+        name = f"User {user_id[-6:]}"
         u = User(
             id=user_id,
             name=name,
-            email=f"{user_id[:6]}@example.com",
+            email=f"{user_id[-6:]}@example.com",
             platform_profile_id=None,
             org_id="org",
             role="consumer",
-            created_at=now_iso(),
+            created_at=utcnow(),
             platform_profile=None,
             avatar_url=f"https://ui-avatars.com/api/?name={name.replace(' ', '+')}",
             tools=[random.choice(["databricks","snowflake","bigquery","redshift"])],
@@ -366,6 +404,7 @@ async def admin_bulk_users(count: int = 20, session: AsyncSession | None = Depen
                 role=u.role,
                 created_at=u.created_at,
             ))
+            await bump_company(session, u.company, users=1)
         created += 1
     if session is not None:
         await session.commit()
@@ -13,6 +13,8 @@ from fastapi import Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 from backend.app.db import get_session_optional, DatasetModel as DM, engine
+from backend.app.services.columns import refresh_columns
+from backend.app.services.datasets import find_dataset_by_source, index_dataset, on_dataset_created
 from backend.app.schemas import DatasetCreate, Visibility, Dataset
 from backend.app.storage import db as memory_db
 from backend.app.databricks_client import list_schemas as dbx_list_schemas_sdk, list_tables as dbx_list_tables_sdk
@@ -259,7 +261,16 @@ class PostgresImportRequest(BaseModel):
 @router.post("/postgres/import")
 async def import_postgres(payload: PostgresImportRequest, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
     created: list[str] = []
+    existing: list[str] = []
+    imported: list[Dataset] = []
     for tbl in payload.tables:
+        # Skip tables already imported from the same schema
+        found = memory_db.find_dataset_by_source("postgres", schema=payload.schema, table=tbl)
+        if found is None and session is not None:
+            found = await find_dataset_by_source(session, "postgres", schema=payload.schema, table=tbl)
+        if found is not None:
+            existing.append(found.id)
+            continue
         ds = memory_db.create_dataset(DatasetCreate(
             name=tbl,
             description=f"Imported from Postgres {payload.schema}.{tbl}",
@@ -271,6 +282,7 @@ async def import_postgres(payload: PostgresImportRequest, session: AsyncSession
             visibility=Visibility.internal,
         ))
         created.append(ds.id)
+        imported.append(ds)
         if session is not None:
             row = DM(
                 id=ds.id,
@@ -281,14 +293,19 @@ async def import_postgres(payload: PostgresImportRequest, session: AsyncSession
                 org_id=ds.org_id,
                 source_type=ds.source_type,
                 source_metadata_json=ds.source_metadata_json,
-                visibility=str(ds.visibility),
+                visibility=ds.visibility.value,
                 created_at=ds.created_at,
                 updated_at=ds.updated_at,
             )
             session.add(row)
+            await on_dataset_created(session, ds)
+            # Same database, so the column crawl is one cheap catalog query
+            await refresh_columns(session, ds)
     if session is not None:
         await session.commit()
-    return {"created": created}
+    for ds in imported:
+        index_dataset(ds)
+    return {"created": created, "existing": existing}
 
 
 @router.get("/rfa/destinations")
@@ -8,6 +8,7 @@ from backend.app.databricks_client import list_schemas, list_tables, get_table_i
 from backend.app.schemas import Dataset, DatasetCreate, Visibility
 from backend.app.storage import db
 from backend.app.db import get_session_optional, DatasetModel as DM
+from backend.app.services.datasets import find_dataset_by_source, index_dataset, on_dataset_created
 
 
 logger = logging.getLogger(__name__)
@@ -53,6 +54,13 @@ async def dbx_import_table(payload: dict, session: AsyncSession | None = Depends
     if not (catalog and schema and table):
         raise HTTPException(422, detail="catalog, schema, table are required")
 
+    # Re-importing the same UC table returns the existing dataset instead of a duplicate
+    existing = db.find_dataset_by_source("databricks.uc", catalog=catalog, schema=schema, table=table)
+    if existing is None and session is not None:
+        existing = await find_dataset_by_source(session, "databricks.uc", catalog=catalog, schema=schema, table=table)
+    if existing is not None:
+        return existing
+
     # Create a dataset entry using UC identifiers as metadata
     ds = db.create_dataset(
         DatasetCreate(
@@ -88,7 +96,10 @@ async def dbx_import_table(payload: dict, session: AsyncSession | None = Depends
             updated_at=ds.updated_at,
         )
         session.add(model)
+        await on_dataset_created(session, ds)
         await session.commit()
+    # Only once committed: a failed insert must not leave a phantom dataset in the cache and indexes
+    index_dataset(ds)
     return ds
 
 
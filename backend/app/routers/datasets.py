@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import os
-import uuid
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import pystache
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import select
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy import func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from pydantic import BaseModel
@@ -24,31 +24,59 @@ from backend.app.schemas import (
     PlatformType,
     Visibility,
 )
-from backend.app.storage import db, now_iso
+from backend.app.etag import PRIVATE_REVALIDATE, REVALIDATE, conditional_json
+from backend.app.ids import new_id
+from backend.app.pagination import clamp_limit
+from backend.app.serialization import RowProjection, json_response
+from backend.app.storage import db, patched_dataset, utcnow
 import logging
 from backend.app.db import get_session_optional, DatasetModel, Config, engine
 from backend.app.databricks_client import get_table_info
+from backend.app.services.activity import SCHEMA_CHANGED, activity_series, activity_series_memory
+from backend.app.services.columns import refresh_columns
+from backend.app.services.datasets import (
+    dataset_from_row, dataset_health, index_dataset, load_dataset, load_datasets, on_dataset_created, refresh_indexes,
+)
+from backend.app.services.events import record_event, rename_feed_refs
+from backend.app.services.hydration import RefLoader
+from backend.app.services.invalidation import bus, dataset_keys
+from backend.app.services.ranking import search_index
+from backend.app.services.semantic import vectors
+from backend.app.services.similarity import similar
+from backend.app.services.social import social_counts
+from backend.app.services.tags import sync_dataset_tags
+from backend.app.services.trending import trending
 from backend.app.storage import db
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-def _dataset_from_row(row: DatasetModel) -> Dataset:
-    return Dataset(
-        id=row.id,
-        name=row.name,
-        description=row.description,
-        tags=row.tags or [],
-        owner_id=row.owner_id,
-        org_id=row.org_id,
-        #company=getattr(row, 'company', None),
-        business_domain=getattr(row, 'business_domain', None),
-        source_type=row.source_type,
-        source_metadata_json=row.source_metadata_json or {},
-        visibility=row.visibility,  # type: ignore[arg-type]
-        created_at=row.created_at,
-        updated_at=row.updated_at,
-    )
+
+MAX_MULTI_GET = 200
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    """Requested Dataset fields in model order, always with id; None when all are wanted."""
+    if not fields:
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - Dataset.model_fields.keys()
+    if unknown:
+        raise HTTPException(422, detail=f"Unknown dataset fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in Dataset.model_fields if f in wanted or f == "id")
+
+
+@lru_cache(maxsize=64)
+def _dataset_rows(fields: Optional[tuple[str, ...]]) -> RowProjection:
+    return RowProjection(Dataset, DatasetModel.__table__, fields)
+
+
+def _dataset_page(page: int, per_page: int, total: int, items: list[Dataset], fields: Optional[tuple[str, ...]]) -> PaginatedDatasets | Response:
+    if fields is None:
+        return PaginatedDatasets(page=page, per_page=per_page, total=total, data=items)
+    data = [ds.model_dump(mode="json", include=set(fields)) for ds in items]
+    return json_response({"page": page, "per_page": per_page, "total": total, "data": data})
+
 
 async def _detect_datasets_schemas(session: AsyncSession) -> list[str]:
     try:
@@ -196,7 +224,21 @@ async def _safe_fetch_all_datasets(session: AsyncSession) -> list[Dataset]:
         return []
 
 
-@router.get("/datasets")
+async def _datasets_by_ids(session: AsyncSession | None, ids: list[str]) -> list[Dataset]:
+    """Datasets for `ids` in the given order (one IN query), skipping ids that no longer resolve."""
+    found: dict[str, Dataset] = {}
+    if session is not None and ids:
+        try:
+            found = await load_datasets(session, ids)
+        except Exception as e:
+            logger.debug("_datasets_by_ids: ORM read failed (%s); using memory", e)
+    for i in ids:
+        if i not in found and i in db.datasets:
+            found[i] = db.datasets[i]
+    return [found[i] for i in ids if i in found]
+
+
+@router.get("/datasets", response_model=PaginatedDatasets)
 async def list_datasets(
     query: Optional[str] = None,
     owner_id: Optional[str] = None,
@@ -205,8 +247,73 @@ async def list_datasets(
     visibility: Optional[str] = None,
     page: int = 1,
     per_page: int = 20,
+    ids: Optional[str] = None,
+    fields: Optional[str] = None,
     session: AsyncSession | None = Depends(get_session_optional),
-) -> PaginatedDatasets:
+) -> PaginatedDatasets | Response:
+    """List, search or multi-get datasets.
+
+    `ids=a,b,c` returns those datasets in that order (one IN query; other filters are
+    ignored). `fields=name,tags` limits each item to those fields (plus id), and only
+    their columns are read.
+    """
+    selected = _parse_fields(fields)
+    if ids is not None:
+        wanted = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+        if len(wanted) > MAX_MULTI_GET:
+            raise HTTPException(422, detail=f"At most {MAX_MULTI_GET} ids per request")
+        if selected is None or session is None:
+            found = await _datasets_by_ids(session, wanted)
+            return _dataset_page(1, len(wanted), len(found), found, selected)
+        rows = _dataset_rows(selected)
+        by_id: dict[str, dict] = {}
+        if wanted:
+            try:
+                res = await session.execute(rows.select().where(DatasetModel.id.in_(wanted)))
+                by_id = {d["id"]: d for d in rows.dicts(res.all())}
+            except Exception as e:
+                logger.debug("list_datasets: multi-get failed (%s); using memory", e)
+        for i in wanted:
+            if i not in by_id and i in db.datasets:
+                by_id[i] = db.datasets[i].model_dump(mode="json", include=set(selected))
+        data = [by_id[i] for i in wanted if i in by_id]
+        return json_response({"page": 1, "per_page": len(wanted), "total": len(data), "data": data})
+    if query and len(search_index):
+        # Ranked search: the BM25F index picks and orders the page, then only those rows are read.
+        # It matches whole tokens (and a prefix of the last one); with no hits, fall back to
+        # the substring match below, which also covers inner fragments and punctuation.
+        total, hits = search_index.search(
+            query, max(0, (page - 1) * per_page), per_page,
+            owner_id=owner_id, org_id=org_id, visibility=visibility,
+        )
+        if total:
+            ranked = await _datasets_by_ids(session, [dataset_id for dataset_id, _ in hits])
+            return _dataset_page(page, per_page, total, ranked, selected)
+    if session is not None:
+        # Filter, count and page in SQL; rows go straight to JSON without pydantic
+        try:
+            t = DatasetModel
+            conds = []
+            if query:
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                conds.append(or_(t.name.ilike(pattern, escape="\\"), t.description.ilike(pattern, escape="\\")))
+            for col, value in ((t.owner_id, owner_id), (t.org_id, org_id), (t.visibility, visibility)):
+                if value:
+                    conds.append(col == value)
+            total = (await session.execute(select(func.count()).select_from(t).where(*conds))).scalar_one()
+            if total:
+                rows = _dataset_rows(selected)
+                res = await session.execute(
+                    rows.select().where(*conds)
+                    .order_by(t.created_at, t.id).limit(per_page).offset(max(0, (page - 1) * per_page))
+                )
+                return json_response({"page": page, "per_page": per_page, "total": total, "data": rows.dicts(res.all())})
+            if conds:
+                # A filter that matches nothing is the answer, not a reason to scan every schema
+                return json_response({"page": page, "per_page": per_page, "total": 0, "data": []})
+            # Empty table: fall through to the cross-schema and in-memory fallbacks
+        except Exception as e:
+            logger.debug("list_datasets: fast path failed (%s)", e)
     # If DB session available, read from DB
     items = list(db.datasets.values())
     if session is not None:
@@ -215,7 +322,7 @@ async def list_datasets(
             rows = res.scalars().all()
             if rows:
                 items = [
-                    _dataset_from_row(r)
+                    dataset_from_row(r)
                     for r in rows
                 ]
             else:
@@ -242,7 +349,7 @@ async def list_datasets(
     total = len(items)
     start = (page - 1) * per_page
     end = start + per_page
-    return PaginatedDatasets(page=page, per_page=per_page, total=total, data=items[start:end])
+    return _dataset_page(page, per_page, total, items[start:end], selected)
 
 
 @router.post("/datasets", status_code=201)
@@ -267,54 +374,63 @@ async def create_dataset(payload: DatasetCreate, session: AsyncSession | None =
             updated_at=ds.updated_at,
         )
         session.add(model)
+        await on_dataset_created(session, ds)
         await session.commit()
+    # Cache and index only what committed
+    index_dataset(ds)
     # emit dataset.published event (memory + DB)
     from backend.app.schemas import Event
     ev = Event(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         type="dataset.published",
         payload_json={"name": ds.name},
         actor_id="demo-user",
         dataset_id=ds.id,
         created_at=ds.created_at,
     )
-    db.add_event(ev)
+    await record_event(session, ev)
     if session is not None:
-        from backend.app.db import EventModel as EM
-        em = EM(
-            id=ev.id,
-            type=ev.type,
-            payload_json=ev.payload_json,
-            actor_id=ev.actor_id,
-            dataset_id=ev.dataset_id,
-            created_at=ev.created_at,
-        )
-        session.add(em)
         await session.commit()
     return ds
 
 
-@router.get("/datasets/{id}")
-async def get_dataset(id: str, session: AsyncSession | None = Depends(get_session_optional)) -> Dataset:
-    ds = db.datasets.get(id)
-    if session is not None:
-        row = None
+@router.get("/datasets/trending")
+async def trending_datasets(limit: int = 20, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+    """Top datasets by decayed engagement, served from the in-process trending index."""
+    top = trending.top(clamp_limit(limit, 100))
+    names = await RefLoader(session).datasets(dataset_id for dataset_id, _ in top)
+    return {
+        "half_life_hours": trending.half_life_hours,
+        "data": [{"id": dataset_id, "name": names.get(dataset_id), "score": round(score, 4)} for dataset_id, score in top],
+    }
+
+
+@router.get("/datasets/semantic")
+async def semantic_search(query: str, limit: int = 10, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+    """Datasets whose name, description, tags or column comments are closest to `query` in meaning."""
+    matches = vectors.search(query, clamp_limit(limit, 50))
+    found = {ds.id: ds for ds in await _datasets_by_ids(session, [dataset_id for dataset_id, _ in matches])}
+    return {
+        "query": query,
+        "data": [{"dataset": found[dataset_id], "score": round(score, 4)} for dataset_id, score in matches if dataset_id in found],
+    }
+
+
+@router.get("/datasets/{id}", response_model=Dataset)
+async def get_dataset(id: str, request: Request, session: AsyncSession | None = Depends(get_session_optional)) -> Response:
+    ds = None
+    try:
+        ds = await load_dataset(session, id)
+    except Exception as e:
+        logger.debug("get_dataset: ORM read failed (%s); attempting safe text query.", e)
+    if ds is None and session is not None:
+        # Try safe fetch across schemas when ORM returns nothing
         try:
-            res = await session.execute(select(DatasetModel).where(DatasetModel.id == id))
-            row = res.scalar_one_or_none()
-            
+            ds = await _safe_fetch_dataset_by_id(session, id)
         except Exception as e:
-            print("get_dataset: ORM read failed (%s); attempting safe text query.", e)
-            logger.debug("get_dataset: ORM read failed (%s); attempting safe text query.", e)
-        if row:
-            ds = _dataset_from_row(row)
-        else:
-            print("failed getting dataset")
-            # Try safe fetch across schemas when ORM returns nothing
-            try:
-                ds = await _safe_fetch_dataset_by_id(session, id)
-            except Exception as e:
-                logger.debug("get_dataset: safe fetch failed (%s)", e)
+            logger.debug("get_dataset: safe fetch failed (%s)", e)
+    if ds is None:
+        ds = db.datasets.get(id)
     if not ds:
         # Derive best-effort details from recent events
         derived_name = None
@@ -335,7 +451,7 @@ async def get_dataset(id: str, session: AsyncSession | None = Depends(get_sessio
             except Exception:
                 pass
         else:
-            evs = [e for e in db.events if e.dataset_id == id]
+            evs = db.events.for_datasets({id})
             if evs:
                 pub = [e for e in evs if e.type == "dataset.published"]
                 pick = pub[-1] if pub else evs[-1]
@@ -343,7 +459,7 @@ async def get_dataset(id: str, session: AsyncSession | None = Depends(get_sessio
                 created = pick.created_at
                 actor = pick.actor_id or actor
 
-        now = now_iso()
+        now = utcnow()
         ds = Dataset(
             id=id,
             name=derived_name or "Dataset",
@@ -370,27 +486,24 @@ async def get_dataset(id: str, session: AsyncSession | None = Depends(get_sessio
                 info = get_table_info(cat, sch, tbl)
                 comment = info.get("description") or info.get("comment")
                 if comment and not ds.description:
-                    ds.description = comment
+                    ds = ds.model_copy(update={"description": comment})  # ds may be the cached object
     except Exception:
         # best-effort enrichment; ignore failures
         pass
-    return ds
+    return conditional_json(request, ds, REVALIDATE if ds.visibility == Visibility.public else PRIVATE_REVALIDATE)
 
 
 @router.get("/datasets/{id}/preview")
 async def dataset_preview(id: str, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
     # Minimal preview: schema sample from UC metadata if present
-    ds = db.datasets.get(id)
-    if not ds and session is not None:
-        try:
-            res = await session.execute(select(DatasetModel).where(DatasetModel.id == id))
-            row = res.scalar_one_or_none()
-            if row:
-                ds = _dataset_from_row(row)
-            else:
-                ds = await _safe_fetch_dataset_by_id(session, id)
-        except Exception as e:
-            logger.debug("dataset_preview: ORM read failed (%s); using fallback", e)
+    ds = None
+    try:
+        ds = await load_dataset(session, id)
+        if ds is None and session is not None:
+            ds = await _safe_fetch_dataset_by_id(session, id)
+    except Exception as e:
+        logger.debug("dataset_preview: ORM read failed (%s); using fallback", e)
+    ds = ds or db.datasets.get(id)
     # If still missing, return a harmless placeholder preview instead of 404
     if not ds:
         return {
@@ -421,74 +534,111 @@ async def dataset_preview(id: str, session: AsyncSession | None = Depends(get_se
     }
 
 
+@router.get("/datasets/{id}/similar")
+async def similar_datasets(id: str, limit: int = 10, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+    """Related datasets by shared tags, columns and followers (MinHash estimate of Jaccard similarity)."""
+    matches = similar.similar(id, clamp_limit(limit, 50))
+    names = await RefLoader(session).datasets(dataset_id for dataset_id, _ in matches)
+    return {
+        "dataset_id": id,
+        "data": [{"id": dataset_id, "name": names.get(dataset_id), "similarity": round(score, 3)} for dataset_id, score in matches],
+    }
+
+
+@router.post("/datasets/{id}/columns/refresh")
+async def refresh_dataset_columns(id: str, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+    """Re-crawl this dataset's columns from its source into the catalog-wide column index."""
+    ds = await load_dataset(session, id) or db.datasets.get(id)
+    if ds is None and session is not None:
+        ds = await _safe_fetch_dataset_by_id(session, id)
+    if ds is None:
+        raise HTTPException(404, detail="Dataset not found")
+    try:
+        count = await refresh_columns(session, ds)
+    except Exception as e:
+        logger.warning("refresh_dataset_columns: crawl failed for %s: %s", id, e)
+        raise HTTPException(502, detail=f"Column crawl failed: {e}")
+    if count is None:
+        raise HTTPException(422, detail=f"No column crawler for source type {ds.source_type!r}")
+    if session is not None:
+        await session.commit()
+        await refresh_indexes([id])
+    return {"dataset_id": id, "columns": count}
+
+
 @router.get("/datasets/{id}/engagement")
 async def dataset_engagement(id: str, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
     # Reuse social summary and add recent actor stubs
-    from sqlalchemy import select
-    from backend.app.db import LikeModel, FollowModel
     followers = sum(1 for (uid, dsid), v in db.follows.items() if dsid == id and v)
     likes = sum(1 for (uid, dsid), v in db.likes.items() if dsid == id and v)
     recent_actors = []
     if session is not None:
-        fr = await session.execute(select(FollowModel).where(FollowModel.dataset_id==id))
-        lr = await session.execute(select(LikeModel).where(LikeModel.dataset_id==id))
-        followers = len(fr.scalars().all())
-        likes = len(lr.scalars().all())
+        counts = await social_counts(session, id)
+        followers = counts["followers"]
+        likes = counts["likes"]
     # Minimal avatars
     for i in range(min(followers, 3)):
         recent_actors.append({"id": f"u{i}", "name": f"User {i+1}", "avatar_url": f"https://ui-avatars.com/api/?name=U{i+1}"})
-    # Simple health signals: freshness (hours), schema changes in recent events
-    try:
-        from datetime import datetime, timezone
+    # Simple health signals: freshness (hours), schema changes over the last 30 days
+    if session is not None:
+        health = await dataset_health(session, id)
+    else:
         ds = db.datasets.get(id)
-        if ds:
-            dt = datetime.fromisoformat((ds.updated_at or ds.created_at).replace('Z','+00:00'))
-            freshness_hours = max(0, int((datetime.now(timezone.utc) - dt).total_seconds() // 3600))
-        else:
-            freshness_hours = None
-    except Exception:
-        freshness_hours = None
-    schema_changes = 0
-    for ev in db.events[-200:]:
-        if ev.dataset_id == id and ev.type == 'dataset.schema.changed':
-            schema_changes += 1
-    return {"counts": {"followers": followers, "likes": likes}, "recent_actors": recent_actors, "health": {"freshness_hours": freshness_hours, "schema_changes_30d": schema_changes}}
+        health = {
+            "freshness_hours": max(0, int((utcnow() - ds.updated_at).total_seconds() // 3600)) if ds else None,
+            "schema_changes_30d": sum(day["counts"].get(SCHEMA_CHANGED, 0) for day in activity_series_memory(id, 30)),
+        }
+    return {"counts": {"followers": followers, "likes": likes}, "recent_actors": recent_actors, "health": health}
+
+
+@router.get("/datasets/{id}/activity/daily")
+async def dataset_activity_daily(id: str, days: int = 30, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+    """Per-day event counts for sparklines: oldest first, zero-filled, today included.
+
+    Limited to the daily retention window; older activity only exists as month buckets.
+    """
+    days = max(1, min(days, 365, Config.ACTIVITY_RETENTION_DAYS))
+    if session is not None:
+        data = await activity_series(session, id, days)
+    else:
+        data = activity_series_memory(id, days)
+    return {"dataset_id": id, "days": days, "data": data}
 
 
 @router.patch("/datasets/{id}")
 async def patch_dataset(id: str, patch: DatasetUpdate, session: AsyncSession | None = Depends(get_session_optional)) -> Dataset:
-    ds = db.update_dataset(id, patch)
-    # If not found in memory, try DB
-    if not ds and session is not None:
-        res = await session.execute(select(DatasetModel).where(DatasetModel.id == id))
-        row = res.scalar_one_or_none()
-        if row:
-            existing = _dataset_from_row(row)
-            # apply patch
-            update_data = patch.model_dump(exclude_unset=True)
-            for k, v in update_data.items():
-                setattr(existing, k, v)
-            # persist back
-            row.name = existing.name
-            row.description = existing.description
-            row.tags = existing.tags
-            row.visibility = str(existing.visibility)
-            row.source_metadata_json = existing.source_metadata_json
-            await session.commit()
-            return existing
-    if not ds:
+    if session is None:
+        ds = db.update_dataset(id, patch)
+        if not ds:
+            raise HTTPException(404, detail="Dataset not found")
+        index_dataset(ds)
+        return ds
+    # The patch goes onto a copy: the in-memory Dataset is shared with dataset_cache, and
+    # readers must not see the edit until it commits (or ever, if the commit fails)
+    current = db.datasets.get(id)
+    res = await session.execute(select(DatasetModel).where(DatasetModel.id == id))
+    row = res.scalar_one_or_none()
+    if current is None and row is None:
         raise HTTPException(404, detail="Dataset not found")
-    # Also persist memory-updated dataset to DB if available
-    if session is not None:
-        res = await session.execute(select(DatasetModel).where(DatasetModel.id == id))
-        row = res.scalar_one_or_none()
-        if row:
-            row.name = ds.name
-            row.description = ds.description
-            row.tags = ds.tags
-            row.visibility = str(ds.visibility)
-            row.source_metadata_json = ds.source_metadata_json
-            await session.commit()
+    # The committed row is the base when there is one; the in-memory copy may be stale
+    ds = patched_dataset(dataset_from_row(row) if row is not None else current, patch)
+    if row is not None:
+        row.name = ds.name
+        row.description = ds.description
+        row.tags = ds.tags
+        row.visibility = ds.visibility.value
+        row.source_metadata_json = ds.source_metadata_json
+        row.updated_at = ds.updated_at
+        if patch.tags is not None:
+            await sync_dataset_tags(session, id, ds.tags)
+        if patch.name is not None:
+            await rename_feed_refs(session, dataset_id=id, name=ds.name)
+        # Other workers evict once the transaction commits
+        await bus.publish(session, dataset_keys(id))
+        await session.commit()
+    if current is not None:
+        db.save_dataset(ds)
+    index_dataset(ds)
     return ds
 
 
@@ -501,12 +651,7 @@ def _render_template(template_path: Path, context: dict) -> str:
 
 @router.post("/datasets/{id}/connect")
 async def connect_dataset(id: str, request: ConnectRequest, session: AsyncSession | None = Depends(get_session_optional)) -> ConnectResponse:
-    ds = db.datasets.get(id)
-    if not ds and session is not None:
-        res = await session.execute(select(DatasetModel).where(DatasetModel.id == id))
-        row = res.scalar_one_or_none()
-        if row:
-            ds = _dataset_from_row(row)
+    ds = await load_dataset(session, id) or db.datasets.get(id)
     if not ds:
         raise HTTPException(404, detail="Dataset not found")
 
@@ -554,25 +699,15 @@ async def connect_dataset(id: str, request: ConnectRequest, session: AsyncSessio
     # Emit dataset.connected event (in-memory)
     from backend.app.schemas import Event
     ev = Event(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         type="dataset.connected",
         payload_json={"platform": platform.value},
         actor_id="demo-user",
         dataset_id=ds.id,
-        created_at=now_iso(),
+        created_at=utcnow(),
     )
-    db.add_event(ev)
+    await record_event(session, ev)
     if session is not None:
-        from backend.app.db import EventModel as EM
-        em = EM(
-            id=ev.id,
-            type=ev.type,
-            payload_json=ev.payload_json,
-            actor_id=ev.actor_id,
-            dataset_id=ev.dataset_id,
-            created_at=ev.created_at,
-        )
-        session.add(em)
         await session.commit()
 
     payload = ConnectResponsePayload(snippet=snippet, artifacts=artifacts, connection_test={"ok": True})
@@ -581,7 +716,7 @@ async def connect_dataset(id: str, request: ConnectRequest, session: AsyncSessio
 
 @router.post("/datasets/{id}/refresh", status_code=202)
 def refresh_dataset(id: str) -> JobAccepted:
-    job_id = str(uuid.uuid4())
+    job_id = new_id()
     return JobAccepted(job_id=job_id, status="accepted")
 
 
@@ -595,25 +730,15 @@ class SchemaChangeRequest(BaseModel):
 async def add_schema_change_event(id: str, body: SchemaChangeRequest, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
     from backend.app.schemas import Event
     ev = Event(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         type="dataset.schema.changed",
         payload_json={"column": body.column, "change": body.change, "details": body.details or {}},
         actor_id="system",
         dataset_id=id,
-        created_at=now_iso(),
+        created_at=utcnow(),
     )
-    db.add_event(ev)
+    await record_event(session, ev)
     if session is not None:
-        from backend.app.db import EventModel as EM
-        em = EM(
-            id=ev.id,
-            type=ev.type,
-            payload_json=ev.payload_json,
-            actor_id=ev.actor_id,
-            dataset_id=ev.dataset_id,
-            created_at=ev.created_at,
-        )
-        session.add(em)
         await session.commit()
     return {"ok": True, "event_id": ev.id}
 
@@ -4,82 +4,63 @@ import asyncio
 import json
 from typing import Optional
 
-import uuid
-
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.responses import StreamingResponse
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.app.etag import PRIVATE_REVALIDATE, conditional_json
 from backend.app.schemas import PaginatedEvents, Event
-from backend.app.storage import db, now_iso
-from backend.app.db import get_session_optional, EventModel, DatasetModel
+from backend.app.ids import new_id
+from backend.app.storage import db, utcnow
+from backend.app.db import get_session_optional, EventModel, DatasetModel, FeedItemModel
+from backend.app.pagination import clamp_limit
+from backend.app.services.events import record_event
+from backend.app.services.feed import feed_item_event, global_feed, global_feed_memory, home_feed, home_feed_memory
+from backend.app.services.hydration import RefLoader, hydrate_events
 
 
 router = APIRouter()
 
 
-@router.get("/feed")
-async def get_feed(cursor: Optional[str] = None, limit: int = 50, session: AsyncSession | None = Depends(get_session_optional)) -> PaginatedEvents:
-    # naive: ignore cursor and return latest N
+@router.get("/feed", response_model=PaginatedEvents)
+async def get_feed(request: Request, cursor: Optional[str] = None, limit: int = 50, session: AsyncSession | None = Depends(get_session_optional)) -> Response:
+    # Latest N (oldest first); `cursor` is the id of the oldest event on the previous page
+    limit = clamp_limit(limit)
     if session is not None:
-        # Order by created_at to ensure latest items are shown first
-        res = await session.execute(select(EventModel))
-        rows = res.scalars().all()
-        rows = sorted(rows, key=lambda r: r.created_at)
-        data = []
-        for r in rows[-limit:]:
-            payload = r.payload_json or {}
-            # Add human_text hint (best-effort)
-            human = payload.get("human_text")
-            if not human:
-                if r.type == "dataset.published":
-                    human = f"{payload.get('name', 'Dataset')} was added"
-                elif r.type == "dataset.connected":
-                    human = f"Connected to {payload.get('platform','target')}"
-                elif r.type == "dataset.refreshed":
-                    human = f"Refreshed {payload.get('delta_rows','')} rows"
-                elif r.type == "dataset.schema.changed":
-                    human = "Schema updated"
-                elif r.type == "user.followed":
-                    human = "New follower"
-                elif r.type == "dataset.liked":
-                    human = "New like"
-                payload["human_text"] = human
-            data.append(Event(
-                id=r.id,
-                type=r.type,
-                payload_json=payload,
-                actor_id=r.actor_id,
-                dataset_id=r.dataset_id,
-                created_at=r.created_at,
-            ))
-        return PaginatedEvents(cursor=None, data=data)
-    data = db.events[-limit:]
-    return PaginatedEvents(cursor=None, data=data)
+        page = await global_feed(session, limit, cursor)
+        result = PaginatedEvents(cursor=page["cursor"], data=page["data"])
+    else:
+        page = global_feed_memory(limit, cursor)
+        result = PaginatedEvents(cursor=page["cursor"], data=await hydrate_events(None, page["data"]))
+    return conditional_json(request, result, PRIVATE_REVALIDATE)
+
+
+@router.get("/feed/home")
+async def get_home_feed(user_id: str = "demo-user", cursor: Optional[str] = None, limit: int = 50, session: AsyncSession | None = Depends(get_session_optional)) -> PaginatedEvents:
+    """Events on datasets the user follows, directly or via tags; newest first."""
+    limit = clamp_limit(limit)
+    if session is not None:
+        page = await home_feed(session, user_id, limit, cursor)
+        return PaginatedEvents(cursor=page["cursor"], data=page["data"])
+    page = home_feed_memory(user_id, limit, cursor)
+    return PaginatedEvents(cursor=page["cursor"], data=await hydrate_events(None, page["data"]))
 
 
 @router.get("/datasets/{dataset_id}/activity")
 async def get_dataset_activity(dataset_id: str, limit: int = 50, session: AsyncSession | None = Depends(get_session_optional)) -> PaginatedEvents:
     if session is not None:
-        res = await session.execute(select(EventModel).where(EventModel.dataset_id == dataset_id))
+        res = await session.execute(
+            select(FeedItemModel)
+            .where(FeedItemModel.dataset_id == dataset_id)
+            .order_by(FeedItemModel.created_at.desc(), FeedItemModel.id.desc())
+            .limit(limit)
+        )
         rows = res.scalars().all()
-        rows = sorted(rows, key=lambda r: r.created_at)
-        data = [
-            Event(
-                id=r.id,
-                type=r.type,
-                payload_json=r.payload_json or {},
-                actor_id=r.actor_id,
-                dataset_id=r.dataset_id,
-                created_at=r.created_at,
-            )
-            for r in rows[-limit:]
-        ]
-        return PaginatedEvents(cursor=None, data=data)
-    filtered = [ev for ev in db.events if ev.dataset_id == dataset_id]
-    return PaginatedEvents(cursor=None, data=filtered[-limit:])
+        return PaginatedEvents(cursor=None, data=[feed_item_event(r) for r in reversed(rows)])
+    filtered = db.events.for_datasets({dataset_id})
+    return PaginatedEvents(cursor=None, data=await hydrate_events(None, filtered[-limit:]))
 
 
 async def sse_event_generator():
@@ -89,8 +70,8 @@ async def sse_event_generator():
         new_events = db.events[last_index:]
         if new_events:
             last_index = len(db.events)
-            for ev in new_events:
-                payload = ev.model_dump()
+            for ev in await hydrate_events(None, new_events):
+                payload = ev.model_dump(mode="json")
                 yield f"event: {payload['type']}\n".encode("utf-8")
                 yield f"data: {json.dumps(payload)}\n\n".encode("utf-8")
 
@@ -109,6 +90,7 @@ async def backfill_datasets(session: AsyncSession | None = Depends(get_session_o
         dres = await session.execute(select(DatasetModel))
         rows = dres.scalars().all()
         total = len(rows)
+        loader = RefLoader(session)
         for r in rows:
             # Check if a published event exists
             eres = await session.execute(select(EventModel).where(EventModel.dataset_id == r.id, EventModel.type == "dataset.published"))
@@ -116,40 +98,31 @@ async def backfill_datasets(session: AsyncSession | None = Depends(get_session_o
             if exists:
                 continue
             ev = Event(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 type="dataset.published",
                 payload_json={"name": r.name},
                 actor_id="system-backfill",
                 dataset_id=r.id,
-                created_at=r.created_at or now_iso(),
-            )
-            db.add_event(ev)
-            em = EventModel(
-                id=ev.id,
-                type=ev.type,
-                payload_json=ev.payload_json,
-                actor_id=ev.actor_id,
-                dataset_id=ev.dataset_id,
-                created_at=ev.created_at,
+                created_at=r.created_at or utcnow(),
             )
-            session.add(em)
+            await record_event(session, ev, loader)
             created += 1
         await session.commit()
     else:
         items = list(db.datasets.values())
         total = len(items)
         for ds in items:
-            if any(e.type == "dataset.published" and e.dataset_id == ds.id for e in db.events):
+            if any(e.type == "dataset.published" for e in db.events.for_datasets({ds.id})):
                 continue
             ev = Event(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 type="dataset.published",
                 payload_json={"name": ds.name},
                 actor_id="system-backfill",
                 dataset_id=ds.id,
                 created_at=ds.created_at,
             )
-            db.add_event(ev)
+            await record_event(None, ev)
             created += 1
     return {"total_datasets": total, "events_created": created}
 
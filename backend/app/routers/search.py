@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from typing import Literal, Optional
 
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db import get_session_optional
+from backend.app.pagination import clamp_limit
 from backend.app.schemas import Suggestions
+from backend.app.services.columns import search_columns
+from backend.app.services.hydration import RefLoader
 from backend.app.storage import db
 
 
@@ -16,3 +23,19 @@ def suggestions(q: str) -> Suggestions:
     return Suggestions(suggestions=names[:10])
 
 
+@router.get("/search/columns")
+async def column_search(
+    q: str,
+    match: Literal["prefix", "exact"] = "prefix",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    session: AsyncSession | None = Depends(get_session_optional),
+) -> dict:
+    """Datasets that have a column named `q` (case-insensitive), from the crawled column index."""
+    if not q.strip():
+        raise HTTPException(422, detail="q must not be empty")
+    page = await search_columns(session, q, exact=match == "exact", limit=clamp_limit(limit), cursor=cursor)
+    names = await RefLoader(session).datasets(r["dataset_id"] for r in page["data"])
+    for r in page["data"]:
+        r["dataset_name"] = names.get(r["dataset_id"])
+    return page
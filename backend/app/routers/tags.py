@@ -1,78 +1,108 @@
 from __future__ import annotations
 
-from collections import Counter
 from typing import Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.app.etag import conditional_json
 from backend.app.storage import db
-from backend.app.db import get_session_optional, DatasetModel
+from backend.app.db import get_session_optional, DatasetModel, DatasetTagModel, TagCountModel, TagFollowModel, dataset_source_matches
+from backend.app.services.feed import prune_inbox, seed_inbox
 
 
 router = APIRouter()
 
+TAGS_CACHE_CONTROL = "public, max-age=30"
+
 
 @router.get("/tags")
-async def list_tags(session: AsyncSession | None = Depends(get_session_optional)) -> dict:
-  counts: Counter[str] = Counter()
+async def list_tags(request: Request, session: AsyncSession | None = Depends(get_session_optional)) -> Response:
   if session is not None:
-    res = await session.execute(select(DatasetModel))
-    for r in res.scalars().all():
-      for t in (r.tags or []):
-        counts[str(t)] += 1
+    res = await session.execute(
+      select(TagCountModel.tag, TagCountModel.count)
+      .where(TagCountModel.count > 0)
+      .order_by(TagCountModel.count.desc(), TagCountModel.tag)
+    )
+    data = [{"tag": tag, "count": count} for tag, count in res.all()]
   else:
-    for d in db.datasets.values():
-      for t in (d.tags or []):
-        counts[str(t)] += 1
-  top = sorted(counts.items(), key=lambda x: (-x[1], x[0]))
-  return {"data": [{"tag": k, "count": v} for k, v in top]}
+    counts = [(db.tag_labels.get(k, k), len(ids)) for k, ids in db.tag_index.items() if ids]
+    top = sorted(counts, key=lambda x: (-x[1], x[0]))
+    data = [{"tag": k, "count": v} for k, v in top]
+  # Tag counts are neither personal nor sensitive; half a minute of staleness is fine
+  return conditional_json(request, {"data": data}, TAGS_CACHE_CONTROL)
 
 
 @router.get("/tags/{tag}/datasets")
-async def datasets_by_tag(tag: str, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
-  tag_l = tag.lower()
+async def datasets_by_tag(tag: str, catalog: Optional[str] = None, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+  tag_l = tag.strip().lower()
   items = []
   if session is not None:
-    res = await session.execute(select(DatasetModel))
-    for r in res.scalars().all():
-      tags = [str(t).lower() for t in (r.tags or [])]
-      if tag_l in tags:
-        items.append({
-          "id": r.id,
-          "name": r.name,
-          "description": r.description,
-          "visibility": r.visibility,
-        })
+    stmt = (
+      select(DatasetModel.id, DatasetModel.name, DatasetModel.description, DatasetModel.visibility)
+      .join(DatasetTagModel, DatasetTagModel.dataset_id == DatasetModel.id)
+      .where(DatasetTagModel.tag_lower == tag_l)
+    )
+    if catalog:
+      stmt = stmt.where(dataset_source_matches(catalog=catalog))
+    res = await session.execute(stmt)
+    for r in res.mappings().all():
+      items.append({
+        "id": r["id"],
+        "name": r["name"],
+        "description": r["description"],
+        "visibility": r["visibility"],
+      })
   else:
-    for d in db.datasets.values():
-      tags = [str(t).lower() for t in (d.tags or [])]
-      if tag_l in tags:
-        items.append({
-          "id": d.id,
-          "name": d.name,
-          "description": d.description,
-          "visibility": str(d.visibility),
-        })
+    for dataset_id in db.tag_index.get(tag_l, ()):
+      d = db.datasets.get(dataset_id)
+      if d is None or (catalog and (d.source_metadata_json or {}).get("catalog") != catalog):
+        continue
+      items.append({
+        "id": d.id,
+        "name": d.name,
+        "description": d.description,
+        "visibility": d.visibility.value,
+      })
   return {"data": items}
 
 
 @router.post("/tags/{tag}/follow")
-def follow_tag(tag: str, follow: bool = True) -> dict:
-  user_id = "demo-user"
-  key = (user_id, tag)
-  if follow:
-    db.tag_follows[key] = True
-  else:
-    db.tag_follows.pop(key, None)
+async def follow_tag(tag: str, follow: bool = True, user_id: str = "demo-user", session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+  tag_l = tag.strip().lower()
+  key = (user_id, tag_l)
+  db.set_flag("tag_follows", key, follow)
+  if session is not None:
+    if follow:
+      res = await session.execute(
+        pg_insert(TagFollowModel).values(user_id=user_id, tag_lower=tag_l, tag=tag.strip()).on_conflict_do_nothing()
+      )
+      if res.rowcount:
+        await seed_inbox(session, user_id, tag_lower=tag_l)
+    else:
+      res = await session.execute(delete(TagFollowModel).where(TagFollowModel.user_id == user_id, TagFollowModel.tag_lower == tag_l))
+      if res.rowcount:
+        await prune_inbox(session, user_id, tag_lower=tag_l)
+    await session.commit()
   return {"tag": tag, "following": follow}
 
 
 @router.get("/tags/{tag}/followers")
-def tag_followers(tag: str) -> dict:
-  count = sum(1 for (uid, t), v in db.tag_follows.items() if t == tag and v)
-  me = db.tag_follows.get(("demo-user", tag), False)
+async def tag_followers(tag: str, user_id: str = "demo-user", session: AsyncSession | None = Depends(get_session_optional)) -> dict:
+  tag_l = tag.strip().lower()
+  if session is not None:
+    res = await session.execute(
+      select(
+        select(func.count()).select_from(TagFollowModel).where(TagFollowModel.tag_lower == tag_l).scalar_subquery(),
+        exists().where(TagFollowModel.tag_lower == tag_l, TagFollowModel.user_id == user_id),
+      )
+    )
+    count, me = res.one()
+    return {"followers": int(count), "following": bool(me)}
+  count = sum(1 for (uid, t), v in db.tag_follows.items() if t == tag_l and v)
+  me = db.tag_follows.get((user_id, tag_l), False)
   return {"followers": count, "following": bool(me)}
 
 
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import select, text
+from fastapi import APIRouter, HTTPException, Depends, Response
+from sqlalchemy import func, or_, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 from backend.app.schemas import User, PlatformProfile, PlatformProfileUpdate
+from backend.app.ids import new_id
 from backend.app.storage import db
 from backend.app.db import get_session_optional, PlatformProfileModel, FollowModel, LikeModel, UserModel, Config
+from backend.app.serialization import RowProjection, json_response
+from backend.app.services.hydration import RefLoader
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+USER_ROWS = RowProjection(User, UserModel.__table__)
+
 
 async def _safe_fetch_all_users(session: AsyncSession) -> list[User]:
     try:
@@ -22,7 +27,6 @@ async def _safe_fetch_all_users(session: AsyncSession) -> list[User]:
         res = await session.execute(sql)
         rows = res.mappings().all()
         logger.info("users._safe_fetch_all_users: fetched %d rows via text from schema=%s", len(rows), Config.SCHEMA)
-        print("users._safe_fetch_all_users schema count=", len(rows), "schema=", Config.SCHEMA)
         return [
             User(
                 id=r["id"],
@@ -44,7 +48,6 @@ async def _safe_fetch_all_users(session: AsyncSession) -> list[User]:
         ]
     except Exception as e:
         logger.info("users._safe_fetch_all_users: text select failed: %s", e)
-        print("users._safe_fetch_all_users schema error:", e)
     # Unqualified fallback using current search_path
     try:
         sql2 = text(
@@ -53,7 +56,6 @@ async def _safe_fetch_all_users(session: AsyncSession) -> list[User]:
         res2 = await session.execute(sql2)
         rows2 = res2.mappings().all()
         logger.info("users._safe_fetch_all_users: fetched %d rows via unqualified select (search_path)", len(rows2))
-        print("users._safe_fetch_all_users unqualified count=", len(rows2))
         return [
             User(
                 id=r["id"],
@@ -75,7 +77,6 @@ async def _safe_fetch_all_users(session: AsyncSession) -> list[User]:
         ]
     except Exception as e2:
         logger.info("users._safe_fetch_all_users: unqualified select failed: %s", e2)
-        print("users._safe_fetch_all_users unqualified error:", e2)
         return []
 
 
@@ -196,14 +197,14 @@ async def get_user(id: str, session: AsyncSession | None = Depends(get_session_o
     # Fallback synthetic profile
     return User(
         id=id,
-        name=f"User {id[:6]}",
-        email=f"{id[:6]}@example.com",
+        name=f"User {id[-6:]}",
+        email=f"{id[-6:]}@example.com",
         platform_profile_id=None,
         org_id="org",
         role="consumer",
         created_at="1970-01-01T00:00:00Z",
         platform_profile=None,
-        avatar_url=f"https://ui-avatars.com/api/?name=User+{id[:6]}",
+        avatar_url=f"https://ui-avatars.com/api/?name=User+{id[-6:]}",
         tools=["databricks","snowflake"],
         job_title="Data Analyst",
         company="ExampleCorp",
@@ -219,65 +220,56 @@ async def get_user_activity(id: str, session: AsyncSession | None = Depends(get_
         lr = await session.execute(select(LikeModel).where(LikeModel.user_id==id))
         following = [r.dataset_id for r in fr.scalars().all()]
         liked = [r.dataset_id for r in lr.scalars().all()]
-        return {"liked": liked, "following": following}
-    liked = [dsid for (uid, dsid), v in db.likes.items() if uid==id and v]
-    following = [dsid for (uid, dsid), v in db.follows.items() if uid==id and v]
-    return {"liked": liked, "following": following}
+    else:
+        liked = [dsid for (uid, dsid), v in db.likes.items() if uid==id and v]
+        following = [dsid for (uid, dsid), v in db.follows.items() if uid==id and v]
+    names = await RefLoader(session).datasets(liked + following)
+    datasets = [{"id": dsid, "name": names.get(dsid)} for dsid in dict.fromkeys(liked + following)]
+    return {"liked": liked, "following": following, "datasets": datasets}
+
 
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
 
-@router.get("/users")
-async def list_users(q: str | None = None, limit: int = 50, offset: int = 0, session: AsyncSession | None = Depends(get_session_optional)) -> dict:
-    logger.info("users.list_users: q=%s limit=%s offset=%s session_present=%s", q, limit, offset, session is not None)
-    print("users.list_users session_present=", session is not None, "DB_SCHEMA=", getattr(Config, 'SCHEMA', None))
-    users = list(db.users.values())
-    # If DB is available, prefer DB users to ensure seeded data appears
+
+@router.get("/users", response_model=dict)
+async def list_users(q: str | None = None, limit: int = 50, offset: int = 0, session: AsyncSession | None = Depends(get_session_optional)) -> dict | Response:
+    limit = max(1, min(limit, 200))
+    offset = max(0, offset)
     if session is not None:
         try:
-            res = await session.execute(select(UserModel))
-            rows = res.scalars().all()
-            if rows:
-                logger.info("users.list_users: ORM returned %d rows", len(rows))
-                print("users.list_users ORM count=", len(rows))
-                users = [
-                    User(
-                        id=r.id,
-                        name=r.name,
-                        email=r.email,
-                        platform_profile_id=None,
-                        org_id=getattr(r, 'org_id', 'org'),
-                        role=getattr(r, 'role', 'consumer'),
-                        created_at=getattr(r, 'created_at', '1970-01-01T00:00:00Z'),
-                        platform_profile=None,
-                        avatar_url=getattr(r, 'avatar_url', None),
-                        tools=getattr(r, 'tools', None),
-                        job_title=getattr(r, 'job_title', None),
-                        company=getattr(r, 'company', None),
-                        subsidiary=getattr(r, 'subsidiary', None),
-                       #domain=getattr(r, 'domain', None),
-                    )
-                    for r in rows
-                ]
-            else:
-                logger.info("users.list_users: ORM returned 0 rows; trying text fallback")
-                print("users.list_users ORM count=0; trying text fallback")
-                safe = await _safe_fetch_all_users(session)
-                if safe:
-                    logger.info("users.list_users: text fallback returned %d rows", len(safe))
-                    print("users.list_users text fallback count=", len(safe))
-                    users = safe
+            # ILIKE on name/email is served by the pg_trgm GIN indexes (migration 7)
+            cond = None
+            if q:
+                pattern = _like_pattern(q)
+                cond = or_(UserModel.name.ilike(pattern, escape="\\"), UserModel.email.ilike(pattern, escape="\\"))
+            count_stmt = select(func.count()).select_from(UserModel)
+            page_stmt = USER_ROWS.select().order_by(UserModel.name, UserModel.id).limit(limit).offset(offset)
+            if cond is not None:
+                count_stmt = count_stmt.where(cond)
+                page_stmt = page_stmt.where(cond)
+            total = (await session.execute(count_stmt)).scalar_one()
+            if total:
+                rows = (await session.execute(page_stmt)).all()
+                return json_response({"data": USER_ROWS.dicts(rows), "total": total})
+            if cond is not None and (await session.execute(select(UserModel.id).limit(1))).first() is not None:
+                return {"data": [], "total": 0}
+            # No users in the DB at all: fall through so in-memory demo users still show up
         except Exception as e:
-            # keep in-memory fallback
             logger.info("users.list_users: ORM select failed: %s", e)
-            print("users.list_users ORM select error:", e)
-            pass
+            await session.rollback()
+            safe = await _safe_fetch_all_users(session)
+            if safe:
+                return _filter_users(safe, q, limit, offset)
+    return _filter_users(list(db.users.values()), q, limit, offset)
+
+
+def _filter_users(users: list[User], q: str | None, limit: int, offset: int) -> dict:
     if q:
         ql = q.lower()
         users = [u for u in users if ql in u.name.lower() or ql in u.email.lower()]
-    total = len(users)
-    logger.info("users.list_users: returning total=%d", total)
-    print("users.list_users returning total=", total)
-    data = users[offset: offset + limit]
-    return {"data": data, "total": total}
+    return {"data": users[offset: offset + limit], "total": len(users)}
 
 
 @router.get("/users/me/profile")
@@ -302,9 +294,8 @@ async def put_my_platform_profile(body: PlatformProfileUpdate, session: AsyncSes
     # Upsert
     res = await session.execute(select(PlatformProfileModel).where(PlatformProfileModel.user_id == user.id))
     row = res.scalar_one_or_none()
-    import uuid
     if row is None:
-        row = PlatformProfileModel(id=str(uuid.uuid4()), user_id=user.id, platform_type=body.platform_type.value if hasattr(body.platform_type,'value') else str(body.platform_type), config_json=body.config_json)
+        row = PlatformProfileModel(id=new_id(), user_id=user.id, platform_type=body.platform_type.value if hasattr(body.platform_type,'value') else str(body.platform_type), config_json=body.config_json)
         session.add(row)
     else:
         row.platform_type = body.platform_type.value if hasattr(body.platform_type,'value') else str(body.platform_type)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
@@ -30,8 +31,8 @@ class DatasetBase(BaseModel):
     source_type: str
     source_metadata_json: Dict[str, Any] = Field(default_factory=dict)
     visibility: Visibility
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
 
 
 class Dataset(DatasetBase):
@@ -75,7 +76,7 @@ class User(BaseModel):
     platform_profile_id: Optional[str] = None
     org_id: str
     role: str
-    created_at: str
+    created_at: datetime
     platform_profile: Optional[Dict[str, Any]] = None
     avatar_url: Optional[str] = None
     tools: Optional[List[str]] = None
@@ -149,6 +150,11 @@ class JobAccepted(BaseModel):
     status: Literal["accepted"]
 
 
+class EntityRef(BaseModel):
+    id: str
+    name: Optional[str] = None
+
+
 class Event(BaseModel):
     id: str
     type: Literal[
@@ -163,7 +169,10 @@ class Event(BaseModel):
     payload_json: Dict[str, Any] = Field(default_factory=dict)
     actor_id: Optional[str] = None
     dataset_id: Optional[str] = None
-    created_at: str
+    created_at: datetime
+    # Display refs filled in at read time by services.hydration; not stored
+    actor: Optional[EntityRef] = None
+    dataset: Optional[EntityRef] = None
 
 
 class PaginatedEvents(BaseModel):
@@ -0,0 +1,114 @@
+"""Daily per-dataset activity buckets.
+
+record_event bumps (dataset_id, UTC day, event type) as each event is written, so
+health signals and sparklines read at most `days` rows per type instead of scanning
+events. A background task periodically moves days past ACTIVITY_RETENTION_DAYS into
+dataset_activity_monthly, one bucket per month, to keep the daily table small. Month
+buckets live in their own table so a daily read never mistakes one for a day.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import Date, delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.db import Config, DatasetActivityModel, DatasetActivityMonthlyModel
+from backend.app.storage import db, utcnow
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CHANGED = "dataset.schema.changed"
+
+
+def utc_day(ts: datetime) -> date:
+    return ts.astimezone(timezone.utc).date()
+
+
+async def bump_activity(session: AsyncSession, dataset_id: str, event_type: str, created_at: datetime) -> None:
+    """Count one event in its daily bucket (does not commit)."""
+    t = DatasetActivityModel.__table__
+    stmt = pg_insert(t).values(dataset_id=dataset_id, day=utc_day(created_at), type=event_type, count=1)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[t.c.dataset_id, t.c.day, t.c.type],
+        set_={"count": t.c.count + 1},
+    ))
+
+
+def _series(rows: Iterable[Tuple[date, str, int]], days: int) -> List[Dict[str, Any]]:
+    start = utcnow().date() - timedelta(days=days - 1)
+    out = [{"date": (start + timedelta(days=i)).isoformat(), "total": 0, "counts": {}} for i in range(days)]
+    for day, event_type, count in rows:
+        i = (day - start).days
+        if 0 <= i < days:
+            out[i]["counts"][event_type] = out[i]["counts"].get(event_type, 0) + count
+            out[i]["total"] += count
+    return out
+
+
+async def activity_series(session: AsyncSession, dataset_id: str, days: int = 30) -> List[Dict[str, Any]]:
+    """Zero-filled daily counts for the last `days` UTC days (today included), oldest first."""
+    start = utcnow().date() - timedelta(days=days - 1)
+    res = await session.execute(
+        select(DatasetActivityModel.day, DatasetActivityModel.type, DatasetActivityModel.count)
+        .where(DatasetActivityModel.dataset_id == dataset_id, DatasetActivityModel.day >= start)
+    )
+    return _series(res.all(), days)
+
+
+def activity_series_memory(dataset_id: str, days: int = 30) -> List[Dict[str, Any]]:
+    rows = [(day, t, n) for (d, day, t), n in db.activity_daily.items() if d == dataset_id]
+    return _series(rows, days)
+
+
+async def compact_activity(session: AsyncSession, retention_days: int) -> int:
+    """Move daily buckets older than the retention window into month buckets; returns month buckets written."""
+    t = DatasetActivityModel.__table__
+    m = DatasetActivityMonthlyModel.__table__
+    cutoff = utcnow().date() - timedelta(days=retention_days)
+    folded = (
+        delete(t)
+        .where(t.c.day < cutoff)
+        .returning(t.c.dataset_id, t.c.day, t.c.type, t.c.count)
+        .cte("folded")
+    )
+    bucket = func.date_trunc(literal_column("'month'"), folded.c.day).cast(Date)
+    stmt = pg_insert(m).from_select(
+        ["dataset_id", "month", "type", "count"],
+        select(folded.c.dataset_id, bucket, folded.c.type, func.sum(folded.c.count))
+        .group_by(folded.c.dataset_id, bucket, folded.c.type),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[m.c.dataset_id, m.c.month, m.c.type],
+        set_={"count": m.c.count + stmt.excluded.count},
+    ).add_cte(folded)
+    res = await session.execute(stmt)
+    return res.rowcount or 0
+
+
+async def compaction_loop(session_maker: async_sessionmaker, interval: int, retention_days: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_maker() as session:
+                n = await compact_activity(session, retention_days)
+                await session.commit()
+            if n:
+                logger.info("activity: compacted into %d monthly buckets", n)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("activity: compaction failed")
+
+
+def start_compaction(session_maker: async_sessionmaker | None) -> asyncio.Task | None:
+    if session_maker is None or Config.ACTIVITY_COMPACT_INTERVAL <= 0:
+        return None
+    return asyncio.create_task(
+        compaction_loop(session_maker, Config.ACTIVITY_COMPACT_INTERVAL, Config.ACTIVITY_RETENTION_DAYS)
+    )
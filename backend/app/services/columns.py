@@ -0,0 +1,298 @@
+"""Catalog-wide column index.
+
+Column lists used to be fetched live, per table, with get_table_info. Crawls now copy
+each dataset's columns from its source (Unity Catalog, the Postgres database this app
+connects to, or Snowflake) into `dataset_columns`. Finding every dataset with a
+`customer_id` column is then one indexed query on name_lower. Crawled names are also
+indexed for search, semantic search and similar datasets.
+
+A full crawl runs as a background task and commits in batches; remote catalogs are read
+while no transaction is open, through one Snowflake connection per crawl.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, literal, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.databricks_client import get_table_info
+from backend.app.db import DatasetColumnModel, DatasetModel
+from backend.app.pagination import decode_cursor, page_rows
+from backend.app.schemas import Dataset
+from backend.app.services.datasets import dataset_from_row, index_dataset, refresh_indexes
+from backend.app.services.invalidation import bus
+from backend.app.storage import db, utcnow
+
+
+logger = logging.getLogger(__name__)
+
+Column = Tuple[str, Optional[str]]  # (name, type)
+
+CRAWL_CONCURRENCY = 4
+CRAWL_BATCH = 100  # datasets stored per transaction
+
+
+def _uc_columns(src: Dict[str, Any]) -> List[Column]:
+    info = get_table_info(src["catalog"], src["schema"], src["table"])
+    return [(c["name"], c.get("type_text")) for c in info.get("columns") or [] if c.get("name")]
+
+
+async def _postgres_columns(session: AsyncSession, src: Dict[str, Any]) -> List[Column]:
+    res = await session.execute(
+        text(
+            """
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = :schema AND table_name = :table
+            ORDER BY ordinal_position
+            """
+        ),
+        {"schema": src["schema"], "table": src["table"]},
+    )
+    return [(r[0], r[1]) for r in res.fetchall()]
+
+
+def _default_database() -> Optional[str]:
+    return os.getenv("SNOW_DATABASE") or os.getenv("SNOWFLAKE_DATABASE")
+
+
+def _quote_snowflake(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SnowflakeCrawler:
+    """One Snowflake connection for a whole crawl, opened on first use.
+
+    Crawl threads share the connection (the connector allows that) and each query gets
+    its own cursor.
+    """
+
+    def __init__(self) -> None:
+        self._ctx: Any = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Any:
+        with self._lock:
+            if self._ctx is None:
+                import snowflake.connector  # type: ignore
+
+                self._ctx = snowflake.connector.connect(
+                    account=os.getenv("SNOW_ACCOUNT") or os.getenv("SNOWFLAKE_ACCOUNT"),
+                    user=os.getenv("SNOW_USERNAME") or os.getenv("SNOWFLAKE_USER"),
+                    password=os.getenv("SNOW_PWD") or os.getenv("SNOWFLAKE_PASSWORD"),
+                    warehouse=os.getenv("SNOW_WAREHOUSE") or os.getenv("SNOWFLAKE_WAREHOUSE") or None,
+                    database=_default_database() or None,
+                )
+            return self._ctx
+
+    def columns(self, src: Dict[str, Any]) -> List[Column]:
+        database = src.get("database") or _default_database()
+        if not database:
+            raise ValueError("no Snowflake database in the source metadata or environment")
+        cur = self._connection().cursor()
+        try:
+            # The database comes from dataset metadata: bind it as an identifier, never splice it in
+            cur.execute(
+                "SELECT column_name, data_type FROM IDENTIFIER(%s) "
+                "WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position",
+                (f"{_quote_snowflake(database)}.INFORMATION_SCHEMA.COLUMNS", str(src["schema"]).upper(), str(src["table"]).upper()),
+            )
+            return [(r[0], r[1]) for r in cur.fetchall() or []]
+        finally:
+            cur.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._ctx is not None:
+                self._ctx.close()
+                self._ctx = None
+
+
+def _snowflake_columns(src: Dict[str, Any]) -> List[Column]:
+    crawler = SnowflakeCrawler()
+    try:
+        return crawler.columns(src)
+    finally:
+        crawler.close()
+
+
+async def crawl_columns(
+    session: AsyncSession | None, ds: Dataset, snowflake: Optional[SnowflakeCrawler] = None,
+) -> Optional[List[Column]]:
+    """Read a dataset's column list from its source; None when the source has no crawler.
+
+    Pass `snowflake` to reuse one connection across many datasets.
+    """
+    src = ds.source_metadata_json or {}
+    if not (src.get("schema") and src.get("table")):
+        return None
+    if ds.source_type == "databricks.uc" and src.get("catalog"):
+        return await asyncio.to_thread(_uc_columns, src)
+    if ds.source_type == "postgres" and session is not None:
+        return await _postgres_columns(session, src)
+    if ds.source_type == "snowflake":
+        return await asyncio.to_thread(snowflake.columns if snowflake is not None else _snowflake_columns, src)
+    return None
+
+
+async def store_columns(session: AsyncSession | None, dataset_id: str, columns: List[Column]) -> None:
+    """Replace a dataset's indexed columns (does not commit).
+
+    Without a database the search, semantic and similarity indexes pick the new names
+    up right away. Otherwise other workers do once the session commits (through a
+    "dataset_index" key), and the caller refreshes this worker's after committing.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for pos, (name, col_type) in enumerate(columns):
+        rows.setdefault(name.lower(), {"dataset_id": dataset_id, "name_lower": name.lower(), "name": name, "type": col_type, "position": pos})
+    db.set_columns(dataset_id, [(r["name"], r["type"]) for r in rows.values()])
+    if session is None:
+        ds = db.datasets.get(dataset_id)
+        if ds is not None:
+            index_dataset(ds)
+        return
+    await session.execute(delete(DatasetColumnModel).where(DatasetColumnModel.dataset_id == dataset_id))
+    if rows:
+        await session.execute(DatasetColumnModel.__table__.insert(), list(rows.values()))
+    await bus.publish(session, [f"dataset_index:{dataset_id}"])
+
+
+async def refresh_columns(session: AsyncSession | None, ds: Dataset) -> Optional[int]:
+    """Crawl and store one dataset's columns (does not commit); returns the count, None if not crawlable."""
+    columns = await crawl_columns(session, ds)
+    if columns is None:
+        return None
+    await store_columns(session, ds.id, columns)
+    return len(columns)
+
+
+async def _crawl_batch(
+    session_maker: async_sessionmaker | None, datasets: List[Dataset], snowflake: SnowflakeCrawler, stats: Dict[str, Any],
+) -> None:
+    gate = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+    async def remote(ds: Dataset) -> Optional[List[Column]]:
+        async with gate:
+            return await crawl_columns(None, ds, snowflake)
+
+    # Remote sources are crawled before the batch's session opens, so no transaction
+    # waits on them; Postgres crawls go through the session, which runs one query at a time
+    local = [ds for ds in datasets if ds.source_type == "postgres"]
+    others = [ds for ds in datasets if ds.source_type != "postgres"]
+    results: List[Any] = list(await asyncio.gather(*(remote(ds) for ds in others), return_exceptions=True))
+    async with (session_maker() if session_maker is not None else nullcontext()) as session:
+        for ds in local:
+            try:
+                results.append(await crawl_columns(session, ds))
+            except Exception as e:
+                results.append(e)
+        stored: List[str] = []
+        for ds, result in zip(others + local, results):
+            if isinstance(result, Exception):
+                logger.warning("columns: crawl failed for %s (%s): %s", ds.id, ds.source_type, result)
+                stats["failed"] += 1
+            elif result is None:
+                stats["skipped"] += 1
+            else:
+                await store_columns(session, ds.id, result)
+                stored.append(ds.id)
+                stats["crawled"] += 1
+                stats["columns"] += len(result)
+        if session is not None:
+            await session.commit()
+    if session_maker is not None and stored:
+        await refresh_indexes(stored)
+
+
+async def crawl_all(session_maker: async_sessionmaker | None, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Refresh the column index for every dataset, committing every CRAWL_BATCH datasets.
+
+    Counts go into `stats` as the crawl progresses.
+    """
+    if session_maker is not None:
+        async with session_maker() as session:
+            res = await session.execute(select(DatasetModel))
+            datasets = [dataset_from_row(r) for r in res.scalars().all()]
+    else:
+        datasets = list(db.datasets.values())
+    stats = stats if stats is not None else {}
+    stats.update({"total": len(datasets), "crawled": 0, "skipped": 0, "failed": 0, "columns": 0})
+    snowflake = SnowflakeCrawler()
+    try:
+        for start in range(0, len(datasets), CRAWL_BATCH):
+            await _crawl_batch(session_maker, datasets[start:start + CRAWL_BATCH], snowflake, stats)
+    finally:
+        await asyncio.to_thread(snowflake.close)
+    return stats
+
+
+# The latest crawl started by this worker
+crawl_status: Dict[str, Any] = {"state": "idle"}
+_crawl_task: Optional[asyncio.Task] = None
+
+
+async def _run_crawl(session_maker: async_sessionmaker | None) -> None:
+    t0 = time.monotonic()
+    try:
+        await crawl_all(session_maker, crawl_status)
+    except asyncio.CancelledError:
+        crawl_status["state"] = "cancelled"
+        raise
+    except Exception as e:
+        logger.exception("columns: crawl failed")
+        crawl_status.update({"state": "failed", "error": str(e)})
+    else:
+        crawl_status["state"] = "done"
+        logger.info("columns: crawled %d of %d datasets in %.1fs", crawl_status["crawled"], crawl_status["total"], time.monotonic() - t0)
+    finally:
+        crawl_status["finished_at"] = utcnow()
+
+
+def start_crawl(session_maker: async_sessionmaker | None) -> asyncio.Task:
+    """Start a crawl of every dataset in the background, unless one is already running."""
+    global _crawl_task
+    if _crawl_task is None or _crawl_task.done():
+        crawl_status.clear()
+        crawl_status.update({"state": "running", "started_at": utcnow(), "finished_at": None})
+        _crawl_task = asyncio.create_task(_run_crawl(session_maker))
+    return _crawl_task
+
+
+async def search_columns(
+    session: AsyncSession | None, q: str, exact: bool = False, limit: int = 50, cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Datasets with a column named `q` (or starting with it), ordered by column name then dataset id."""
+    needle = q.strip().lower()
+    after = decode_cursor(cursor, 2)
+    if session is None:
+        hits = sorted(
+            (name.lower(), dataset_id, name, col_type)
+            for dataset_id, columns in db.dataset_columns.items()
+            for name, col_type in columns
+            if (name.lower() == needle if exact else name.lower().startswith(needle))
+        )
+        if after:
+            hits = [h for h in hits if (h[0], h[1]) > (after[0], after[1])]
+        rows, next_cursor = page_rows(hits[:limit + 1], limit, lambda h: (h[0], h[1]))
+        data = [{"dataset_id": d, "column": n, "type": t} for _, d, n, t in rows]
+        return {"cursor": next_cursor, "data": data}
+
+    c = DatasetColumnModel
+    stmt = select(c.name_lower, c.dataset_id, c.name, c.type)
+    if exact:
+        stmt = stmt.where(c.name_lower == needle)
+    else:
+        escaped = needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(c.name_lower.like(escaped + "%", escape="\\"))
+    if after:
+        stmt = stmt.where(tuple_(c.name_lower, c.dataset_id) > tuple_(literal(after[0]), literal(after[1])))
+    res = await session.execute(stmt.order_by(c.name_lower, c.dataset_id).limit(limit + 1))
+    rows, next_cursor = page_rows(res.all(), limit, lambda r: (r[0], r[1]))
+    return {"cursor": next_cursor, "data": [{"dataset_id": r[1], "column": r[2], "type": r[3]} for r in rows]}
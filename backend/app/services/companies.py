@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, literal, or_, select, tuple_, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db import CompanyStatsModel, DatasetModel, EventModel, UserModel, dataset_has_tag
+from backend.app.pagination import cursor_time, decode_cursor, page_rows
+from backend.app.services.hydration import RefLoader
+
+
+UNKNOWN = "Unknown"
+
+
+def company_key(name: Optional[str]) -> str:
+    return (name or "").strip() or UNKNOWN
+
+
+_COLUMNS = ["company", "user_count", "dataset_count", "last_activity_at"]
+
+
+def _add_on_conflict(stmt):
+    """Turn an insert into company_stats into an additive upsert."""
+    stats = CompanyStatsModel.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=[stats.c.company],
+        set_={
+            "user_count": func.greatest(stats.c.user_count + stmt.excluded.user_count, 0),
+            "dataset_count": func.greatest(stats.c.dataset_count + stmt.excluded.dataset_count, 0),
+            "last_activity_at": func.greatest(stats.c.last_activity_at, stmt.excluded.last_activity_at),
+        },
+    )
+
+
+async def bump_company(session: AsyncSession, company: Optional[str], users: int = 0, datasets: int = 0) -> None:
+    """Apply user/dataset deltas to a company's rollup row (does not commit)."""
+    stmt = pg_insert(CompanyStatsModel.__table__).values(
+        company=company_key(company), user_count=users, dataset_count=datasets, last_activity_at=func.now()
+    )
+    await session.execute(_add_on_conflict(stmt))
+
+
+async def bump_owner_company(session: AsyncSession, owner_id: str, datasets: int = 1) -> None:
+    """Count a dataset against its owner's company; no-op for owners without a user row."""
+    company = func.coalesce(func.nullif(func.btrim(UserModel.company), ""), UNKNOWN)
+    stmt = pg_insert(CompanyStatsModel.__table__).from_select(
+        _COLUMNS, select(company, literal(0), literal(datasets), func.now()).where(UserModel.id == owner_id)
+    )
+    await session.execute(_add_on_conflict(stmt))
+
+
+async def list_company_stats(session: AsyncSession) -> List[Dict[str, Any]]:
+    res = await session.execute(
+        select(CompanyStatsModel)
+        .where((CompanyStatsModel.user_count > 0) | (CompanyStatsModel.dataset_count > 0))
+        .order_by(func.lower(CompanyStatsModel.company))
+    )
+    return [
+        {"name": r.company, "count": r.user_count, "datasets": r.dataset_count, "last_activity_at": r.last_activity_at}
+        for r in res.scalars().all()
+    ]
+
+
+async def count_users_by_company(session: AsyncSession) -> List[Dict[str, Any]]:
+    """Uncached GROUP BY fallback for when the rollup has not been built yet."""
+    company = func.coalesce(func.nullif(func.btrim(UserModel.company), ""), UNKNOWN).label("company")
+    res = await session.execute(
+        select(company, func.count().label("n"), func.max(UserModel.created_at).label("last"))
+        .group_by(company)
+        .order_by(func.lower(company))
+    )
+    return [{"name": r.company, "count": r.n, "datasets": None, "last_activity_at": r.last} for r in res.all()]
+
+
+def _user_dict(r: Any) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "name": r.name,
+        "email": r.email,
+        "avatar_url": r.avatar_url,
+        "job_title": r.job_title,
+        "company": r.company,
+        "subsidiary": r.subsidiary,
+        "tools": r.tools,
+    }
+
+
+def _dataset_dict(r: Any) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "name": r.name,
+        "description": r.description,
+        "tags": r.tags or [],
+        "owner_id": r.owner_id,
+        "org_id": r.org_id,
+        "source_type": r.source_type,
+        "source_metadata_json": r.source_metadata_json or {},
+        "visibility": r.visibility,
+        "created_at": r.created_at,
+        "updated_at": r.updated_at,
+    }
+
+
+def _event_dict(r: Any) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "type": r.type,
+        "payload_json": r.payload_json or {},
+        "actor_id": r.actor_id,
+        "dataset_id": r.dataset_id,
+        "created_at": r.created_at,
+    }
+
+
+async def company_detail(
+    session: AsyncSession,
+    company: str,
+    limit: int = 50,
+    users_cursor: Optional[str] = None,
+    datasets_cursor: Optional[str] = None,
+    activity_cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Users, datasets and recent activity for a company; every section is one bounded keyset query.
+
+    Datasets belong to a company when they name it, are tagged with it, or are owned by one of
+    its users. Activity is events by those users or on those datasets, newest first.
+    """
+    member_ids = select(UserModel.id).where(UserModel.company == company)
+    dataset_filter = or_(
+        DatasetModel.company == company,
+        dataset_has_tag(company),
+        DatasetModel.owner_id.in_(member_ids),
+    )
+
+    # Users: alphabetical
+    stmt = select(UserModel).where(UserModel.company == company)
+    after = decode_cursor(users_cursor, 2)
+    if after:
+        stmt = stmt.where(tuple_(UserModel.name, UserModel.id) > tuple_(after[0], after[1]))
+    res = await session.execute(stmt.order_by(UserModel.name, UserModel.id).limit(limit + 1))
+    users, next_users = page_rows(list(res.scalars().all()), limit, lambda r: (r.name, r.id))
+
+    # Datasets: newest first
+    stmt = select(DatasetModel).where(dataset_filter)
+    after = decode_cursor(datasets_cursor, 2)
+    if after:
+        stmt = stmt.where(tuple_(DatasetModel.created_at, DatasetModel.id) < tuple_(cursor_time(after[0]), after[1]))
+    res = await session.execute(
+        stmt.order_by(DatasetModel.created_at.desc(), DatasetModel.id.desc()).limit(limit + 1)
+    )
+    datasets, next_datasets = page_rows(list(res.scalars().all()), limit, lambda r: (r.created_at, r.id))
+
+    # Activity: each branch walks its own (actor_id|dataset_id, created_at) index and stops at
+    # limit+1 rows; UNION de-duplicates events matching both branches before the final cut.
+    after = decode_cursor(activity_cursor, 2)
+    branches = []
+    for cond in (EventModel.actor_id.in_(member_ids), EventModel.dataset_id.in_(select(DatasetModel.id).where(dataset_filter))):
+        branch = select(EventModel.id, EventModel.created_at).where(cond)
+        if after:
+            branch = branch.where(tuple_(EventModel.created_at, EventModel.id) < tuple_(cursor_time(after[0]), after[1]))
+        branches.append(branch.order_by(EventModel.created_at.desc(), EventModel.id.desc()).limit(limit + 1))
+    merged = union(*branches).subquery()
+    res = await session.execute(
+        select(EventModel)
+        .join(merged, merged.c.id == EventModel.id)
+        .order_by(merged.c.created_at.desc(), merged.c.id.desc())
+        .limit(limit + 1)
+    )
+    activity, next_activity = page_rows(list(res.scalars().all()), limit, lambda r: (r.created_at, r.id))
+
+    return {
+        "company": company,
+        "users": [_user_dict(r) for r in users],
+        "datasets": [_dataset_dict(r) for r in datasets],
+        "activity": await RefLoader(session).event_dicts([_event_dict(r) for r in activity]),
+        "cursors": {"users": next_users, "datasets": next_datasets, "activity": next_activity},
+    }
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.cache import MISSING, TTLCache
+from backend.app.db import Config, DatasetActivityModel, DatasetModel, SessionLocal, dataset_source_matches
+from backend.app.schemas import Dataset
+from backend.app.services.activity import SCHEMA_CHANGED
+from backend.app.services import ranking, semantic, similarity
+from backend.app.services.companies import bump_owner_company
+from backend.app.services.invalidation import bus
+from backend.app.services.tags import sync_dataset_tags
+from backend.app.storage import db, utcnow
+
+
+logger = logging.getLogger(__name__)
+
+
+# id -> Dataset as last read from Postgres. Writes made by this worker refresh their
+# entry through index_dataset; the TTL bounds how long an edit made elsewhere is missed.
+dataset_cache: TTLCache[Dataset] = TTLCache(maxsize=Config.DATASET_CACHE_SIZE, ttl=Config.DATASET_CACHE_TTL)
+bus.register("dataset", dataset_cache)
+
+
+def dataset_from_row(row: DatasetModel) -> Dataset:
+    return Dataset(
+        id=row.id,
+        name=row.name,
+        description=row.description,
+        tags=row.tags or [],
+        owner_id=row.owner_id,
+        org_id=row.org_id,
+        #company=getattr(row, 'company', None),
+        business_domain=getattr(row, 'business_domain', None),
+        source_type=row.source_type,
+        source_metadata_json=row.source_metadata_json or {},
+        visibility=row.visibility,  # type: ignore[arg-type]
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
+
+
+async def load_dataset(session: AsyncSession | None, dataset_id: str) -> Optional[Dataset]:
+    """Dataset by id, from the LRU when cached; without a session, from the in-memory store.
+
+    The object is shared with the cache, so copy it before changing it.
+    """
+    if session is None:
+        return db.datasets.get(dataset_id)
+    ds = dataset_cache.get(dataset_id)
+    if ds is MISSING:
+        res = await session.execute(select(DatasetModel).where(DatasetModel.id == dataset_id))
+        row = res.scalar_one_or_none()
+        if row is None:
+            return None
+        ds = dataset_from_row(row)
+        dataset_cache.set(dataset_id, ds)
+    return ds
+
+
+async def load_datasets(session: AsyncSession, ids: Iterable[str]) -> Dict[str, Dataset]:
+    """id -> Dataset for the ids that exist; cache misses are read with one IN query."""
+    found: Dict[str, Dataset] = {}
+    missing = []
+    for i in dict.fromkeys(ids):
+        ds = dataset_cache.get(i)
+        if ds is MISSING:
+            missing.append(i)
+        else:
+            found[i] = ds
+    if missing:
+        res = await session.execute(select(DatasetModel).where(DatasetModel.id.in_(missing)))
+        for row in res.scalars().all():
+            found[row.id] = ds = dataset_from_row(row)
+            dataset_cache.set(row.id, ds)
+    return found
+
+
+async def find_dataset_by_source(session: AsyncSession, source_type: str, **fields: Any) -> Optional[Dataset]:
+    """Return an already-imported dataset for the same source object, if any."""
+    res = await session.execute(
+        select(DatasetModel)
+        .where(DatasetModel.source_type == source_type, dataset_source_matches(**fields))
+        .limit(1)
+    )
+    row = res.scalar_one_or_none()
+    return dataset_from_row(row) if row is not None else None
+
+
+async def on_dataset_created(session: AsyncSession, ds: Dataset) -> None:
+    """Maintain derived tables for a newly inserted dataset (same transaction, no commit)."""
+    await sync_dataset_tags(session, ds.id, ds.tags)
+    await bump_owner_company(session, ds.owner_id)
+    # Other workers may have cached "no such dataset" for this id's display name, and
+    # must add it to their search indexes
+    await bus.publish(session, [f"dataset_name:{ds.id}", f"dataset_index:{ds.id}"])
+
+
+def index_dataset(ds: Dataset) -> None:
+    """Refresh the dataset cache and the in-process search, semantic and similarity indexes once a create or edit has committed."""
+    dataset_cache.set(ds.id, ds)
+    ranking.index_dataset(ds)
+    semantic.index_dataset(ds)
+    similarity.index_dataset(ds)
+
+
+async def refresh_indexes(dataset_ids: List[str]) -> None:
+    """Re-read datasets (with their crawled columns) from the database into this worker's indexes."""
+    async with SessionLocal() as session:
+        res = await session.execute(
+            select(DatasetModel, similarity.crawled_names_column()).where(DatasetModel.id.in_(dataset_ids))
+        )
+        found = {row.id: (dataset_from_row(row), list(crawled or [])) for row, crawled in res.all()}
+    for dataset_id in dataset_ids:
+        if dataset_id in found:
+            ds, crawled = found[dataset_id]
+            ranking.index_dataset(ds, crawled)
+            semantic.index_dataset(ds, crawled)
+            similarity.index_dataset(ds, crawled)
+
+
+def _on_dataset_index(dataset_ids: List[str]) -> None:
+    # Called from the LISTEN callback; the read runs as its own task
+    task = asyncio.get_running_loop().create_task(refresh_indexes(dataset_ids))
+    _refreshes.add(task)
+    task.add_done_callback(_index_refreshed)
+
+
+def _index_refreshed(task: asyncio.Task) -> None:
+    _refreshes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("datasets: index refresh failed", exc_info=task.exception())
+
+
+_refreshes: Set[asyncio.Task] = set()
+if SessionLocal is not None:
+    bus.subscribe("dataset_index", _on_dataset_index)
+
+
+async def dataset_health(session: AsyncSession, dataset_id: str) -> dict:
+    """Freshness in hours and schema changes over the last 30 days, in one round trip.
+
+    The schema-change count sums at most 30 daily activity buckets.
+    """
+    since = utcnow().date() - timedelta(days=29)
+    schema_changes = (
+        select(func.coalesce(func.sum(DatasetActivityModel.count), 0))
+        .where(
+            DatasetActivityModel.dataset_id == dataset_id,
+            DatasetActivityModel.day >= since,
+            DatasetActivityModel.type == SCHEMA_CHANGED,
+        )
+        .scalar_subquery()
+    )
+    freshness = (
+        select(func.floor(func.extract("epoch", func.now() - DatasetModel.updated_at) / 3600))
+        .where(DatasetModel.id == dataset_id)
+        .scalar_subquery()
+    )
+    row = (await session.execute(select(freshness, schema_changes))).one()
+    return {
+        "freshness_hours": max(0, int(row[0])) if row[0] is not None else None,
+        "schema_changes_30d": int(row[1]),
+    }
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import event as sa_event, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.app.db import EventModel, FeedItemModel
+from backend.app.schemas import Event
+from backend.app.services.activity import bump_activity
+from backend.app.services.datasets import load_dataset
+from backend.app.services.feed import fan_out
+from backend.app.services.hydration import RefLoader
+from backend.app.services.trending import track_event
+from backend.app.storage import db
+
+
+# Keep in sync with the CASE in the feed_items backfill migration
+_HUMAN_TEXT: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "dataset.published": lambda p: f"{p.get('name', 'Dataset')} was added",
+    "dataset.connected": lambda p: f"Connected to {p.get('platform', 'target')}",
+    "dataset.refreshed": lambda p: f"Refreshed {p.get('delta_rows', '')} rows",
+    "dataset.schema.changed": lambda p: "Schema updated",
+    "user.followed": lambda p: "New follower",
+    "dataset.liked": lambda p: "New like",
+}
+
+
+def human_text(event_type: str, payload: Dict[str, Any]) -> Optional[str]:
+    """Feed display line for an event; an explicit payload["human_text"] wins."""
+    if payload.get("human_text"):
+        return payload["human_text"]
+    render = _HUMAN_TEXT.get(event_type)
+    return render(payload) if render else None
+
+
+# Session.info key: events written in the open transaction, applied in memory on commit
+_PENDING = "pending_events"
+
+
+def _apply_in_memory(ev: Event) -> None:
+    db.add_event(ev)
+    track_event(ev.type, ev.dataset_id, ev.payload_json, ev.created_at)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _on_commit(session: Session) -> None:
+    for ev in session.info.pop(_PENDING, ()):
+        _apply_in_memory(ev)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+async def record_event(session: AsyncSession | None, ev: Event, loader: RefLoader | None = None) -> Event:
+    """Write an event to `events` and `feed_items`, and to the in-memory log once committed.
+
+    Does not commit, so the event lands in the caller's transaction; the in-memory log
+    and the trending score only see it when that transaction commits (right away
+    without a session). The feed row carries the human text, actor/dataset names and
+    the dataset's org and visibility, and is fanned out to the inboxes of the dataset's
+    followers. Dataset events also bump the daily activity bucket. Callers recording
+    many events pass one `loader` so actor names are resolved once per id.
+
+    Returns the stored copy of `ev`, whose payload includes the human text; `ev` itself
+    is not modified.
+    """
+    raw = dict(ev.payload_json or {})
+    text = human_text(ev.type, raw)
+    feed_payload = {**raw, "human_text": text} if text else raw
+    stored = ev.model_copy(update={"payload_json": feed_payload})
+    if session is None:
+        _apply_in_memory(stored)
+        return stored
+
+    session.sync_session.info.setdefault(_PENDING, []).append(stored)
+    session.add(EventModel(id=ev.id, type=ev.type, payload_json=raw, actor_id=ev.actor_id, dataset_id=ev.dataset_id, created_at=ev.created_at))
+    loader = loader or RefLoader(session)
+    actor_name = (await loader.users([ev.actor_id])).get(ev.actor_id) if ev.actor_id else None
+    dataset_name = org_id = visibility = None
+    if ev.dataset_id:
+        ds = await load_dataset(session, ev.dataset_id) or db.datasets.get(ev.dataset_id)
+        if ds is not None:
+            dataset_name, org_id, visibility = ds.name, ds.org_id, ds.visibility.value
+    session.add(FeedItemModel(
+        id=ev.id,
+        type=ev.type,
+        human_text=text,
+        payload_json=feed_payload,
+        actor_id=ev.actor_id,
+        actor_name=actor_name,
+        dataset_id=ev.dataset_id,
+        dataset_name=dataset_name,
+        org_id=org_id,
+        visibility=visibility,
+        created_at=ev.created_at,
+    ))
+    if ev.dataset_id:
+        await bump_activity(session, ev.dataset_id, ev.type, ev.created_at)
+        await fan_out(session, ev.id, ev.dataset_id, ev.created_at)
+    return stored
+
+
+async def rename_feed_refs(session: AsyncSession, *, dataset_id: str | None = None, user_id: str | None = None, name: str) -> None:
+    """Propagate a dataset or user rename into the denormalized feed rows (does not commit)."""
+    if dataset_id is not None:
+        await session.execute(update(FeedItemModel).where(FeedItemModel.dataset_id == dataset_id).values(dataset_name=name))
+    if user_id is not None:
+        await session.execute(update(FeedItemModel).where(FeedItemModel.actor_id == user_id).values(actor_name=name))
+
@@ -0,0 +1,198 @@
+"""Personalized home feed.
+
+Events are fanned out on write into `user_feed`, the inbox of everyone following the
+event's dataset directly or through one of its tags. A dataset or tag with more than
+FEED_FANOUT_LIMIT followers is "hot": its events are not copied into inboxes, and
+home_feed pulls them from `feed_items` at read time instead.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, delete, func, literal, select, tuple_, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db import Config, DatasetTagModel, FeedItemModel, FollowModel, TagFollowModel, UserFeedModel
+from backend.app.schemas import EntityRef, Event
+from backend.app.storage import db
+
+
+SEED_ON_FOLLOW = 50
+
+
+def feed_item_event(r: FeedItemModel) -> Event:
+    return Event(
+        id=r.id,
+        type=r.type,
+        payload_json=r.payload_json or {},
+        actor_id=r.actor_id,
+        dataset_id=r.dataset_id,
+        created_at=r.created_at,
+        actor=EntityRef(id=r.actor_id, name=r.actor_name) if r.actor_id else None,
+        dataset=EntityRef(id=r.dataset_id, name=r.dataset_name) if r.dataset_id else None,
+    )
+
+
+def _older_than(created_at, id_col, cursor: str):
+    """Keyset predicate for rows after `cursor` in newest-first order.
+
+    Cursors are plain event ids. Ordering stays (created_at, id) because rows written
+    before time-ordered ids still carry uuid4 ids; the cursor's created_at is a PK probe.
+    """
+    anchor = select(FeedItemModel.created_at).where(FeedItemModel.id == cursor).scalar_subquery()
+    return tuple_(created_at, id_col) < tuple_(anchor, literal(cursor))
+
+
+def _next_cursor(rows: List[Any], limit: int) -> tuple[List[Any], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1].id
+
+
+async def global_feed(session: AsyncSession, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """The `limit` latest feed items before `cursor`, returned oldest first."""
+    stmt = select(FeedItemModel)
+    if cursor:
+        stmt = stmt.where(_older_than(FeedItemModel.created_at, FeedItemModel.id, cursor))
+    res = await session.execute(stmt.order_by(FeedItemModel.created_at.desc(), FeedItemModel.id.desc()).limit(limit + 1))
+    rows, next_cursor = _next_cursor(list(res.scalars().all()), limit)
+    return {"cursor": next_cursor, "data": [feed_item_event(r) for r in reversed(rows)]}
+
+
+def global_feed_memory(limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    end = len(db.events) if not cursor else (db.events.position(cursor) or 0)
+    start = max(0, end - limit)
+    return {"cursor": db.events[start].id if start > 0 else None, "data": db.events[start:end]}
+
+
+def _capped_count(stmt):
+    # Counting stops at limit+1 rows, so checking a hot dataset or tag stays cheap
+    return select(func.count()).select_from(stmt.limit(Config.FEED_FANOUT_LIMIT + 1).subquery()).scalar_subquery()
+
+
+def _dataset_followers(dataset_id):
+    return _capped_count(select(literal(1)).where(FollowModel.dataset_id == dataset_id))
+
+
+def _tag_followers(tag_lower):
+    return _capped_count(select(literal(1)).where(TagFollowModel.tag_lower == tag_lower))
+
+
+async def fan_out(session: AsyncSession, event_id: str, dataset_id: str, created_at: datetime) -> int:
+    """Copy an event into its followers' inboxes (does not commit); returns rows written.
+
+    Followers reached only through hot datasets or tags are skipped.
+    """
+    limit = Config.FEED_FANOUT_LIMIT
+    direct = select(FollowModel.user_id).where(
+        FollowModel.dataset_id == dataset_id,
+        _dataset_followers(dataset_id) <= limit,
+    )
+    cold_tags = select(DatasetTagModel.tag_lower).where(
+        DatasetTagModel.dataset_id == dataset_id,
+        _tag_followers(DatasetTagModel.tag_lower) <= limit,
+    )
+    via_tags = select(TagFollowModel.user_id).where(TagFollowModel.tag_lower.in_(cold_tags))
+    audience = union(direct, via_tags).subquery()
+    stmt = pg_insert(UserFeedModel).from_select(
+        ["user_id", "event_id", "created_at"],
+        select(audience.c.user_id, literal(event_id), literal(created_at, DateTime(timezone=True))),
+    ).on_conflict_do_nothing()
+    res = await session.execute(stmt)
+    return res.rowcount or 0
+
+
+async def seed_inbox(session: AsyncSession, user_id: str, *, dataset_id: str | None = None, tag_lower: str | None = None) -> None:
+    """Backfill a new follower's inbox with the most recent items they would have received (does not commit)."""
+    src = select(FeedItemModel.id, FeedItemModel.created_at)
+    if dataset_id is not None:
+        src = src.where(FeedItemModel.dataset_id == dataset_id)
+    else:
+        src = src.where(FeedItemModel.dataset_id.in_(select(DatasetTagModel.dataset_id).where(DatasetTagModel.tag_lower == tag_lower)))
+    recent = src.order_by(FeedItemModel.created_at.desc(), FeedItemModel.id.desc()).limit(SEED_ON_FOLLOW).subquery()
+    await session.execute(
+        pg_insert(UserFeedModel).from_select(
+            ["user_id", "event_id", "created_at"],
+            select(literal(user_id), recent.c.id, recent.c.created_at),
+        ).on_conflict_do_nothing()
+    )
+
+
+async def prune_inbox(session: AsyncSession, user_id: str, *, dataset_id: str | None = None, tag_lower: str | None = None) -> None:
+    """Drop an unfollowed dataset's or tag's items from the user's inbox (does not commit).
+
+    Run after the follow row is deleted. Items of datasets the user still follows,
+    directly or through another tag, stay.
+    """
+    if dataset_id is not None:
+        dropped = select(literal(dataset_id))
+    else:
+        dropped = select(DatasetTagModel.dataset_id).where(DatasetTagModel.tag_lower == tag_lower)
+    still_followed = union(
+        select(FollowModel.dataset_id).where(FollowModel.user_id == user_id),
+        select(DatasetTagModel.dataset_id).where(
+            DatasetTagModel.tag_lower.in_(select(TagFollowModel.tag_lower).where(TagFollowModel.user_id == user_id))
+        ),
+    )
+    items = select(FeedItemModel.id).where(
+        FeedItemModel.dataset_id.in_(dropped),
+        FeedItemModel.dataset_id.not_in(still_followed),
+    )
+    await session.execute(delete(UserFeedModel).where(UserFeedModel.user_id == user_id, UserFeedModel.event_id.in_(items)))
+
+
+async def home_feed(session: AsyncSession, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Newest-first page of the user's inbox merged with items from hot datasets/tags they follow."""
+    limit_hot = Config.FEED_FANOUT_LIMIT
+    hot_datasets = select(FollowModel.dataset_id).where(
+        FollowModel.user_id == user_id,
+        _dataset_followers(FollowModel.dataset_id) > limit_hot,
+    )
+    hot_tags = select(TagFollowModel.tag_lower).where(
+        TagFollowModel.user_id == user_id,
+        _tag_followers(TagFollowModel.tag_lower) > limit_hot,
+    )
+    hot_tag_datasets = select(DatasetTagModel.dataset_id).where(DatasetTagModel.tag_lower.in_(hot_tags))
+
+    inbox = select(UserFeedModel.event_id.label("id"), UserFeedModel.created_at).where(UserFeedModel.user_id == user_id)
+    if cursor:
+        inbox = inbox.where(_older_than(UserFeedModel.created_at, UserFeedModel.event_id, cursor))
+    branches = [inbox.order_by(UserFeedModel.created_at.desc(), UserFeedModel.event_id.desc()).limit(limit + 1)]
+    for ids in (hot_datasets, hot_tag_datasets):
+        branch = select(FeedItemModel.id, FeedItemModel.created_at).where(FeedItemModel.dataset_id.in_(ids))
+        if cursor:
+            branch = branch.where(_older_than(FeedItemModel.created_at, FeedItemModel.id, cursor))
+        branches.append(branch.order_by(FeedItemModel.created_at.desc(), FeedItemModel.id.desc()).limit(limit + 1))
+    merged = union(*branches).subquery()
+    res = await session.execute(
+        select(FeedItemModel)
+        .join(merged, merged.c.id == FeedItemModel.id)
+        .order_by(merged.c.created_at.desc(), merged.c.id.desc())
+        .limit(limit + 1)
+    )
+    rows, next_cursor = _next_cursor(list(res.scalars().all()), limit)
+    return {"cursor": next_cursor, "data": [feed_item_event(r) for r in rows]}
+
+
+def home_feed_memory(user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """In-memory fallback: filter the event log by the user's follows at read time."""
+    after = None
+    if cursor:
+        pos = db.events.position(cursor)
+        if pos is None:
+            return {"cursor": None, "data": []}
+        after = (db.events[pos].created_at, cursor)
+    datasets = {d for (u, d) in db.follows if u == user_id}
+    for (u, tag_lower) in db.tag_follows:
+        if u == user_id:
+            datasets |= db.tag_index.get(tag_lower, set())
+    out: List[Event] = [
+        ev for ev in db.events.for_datasets(datasets)
+        if not after or (ev.created_at, ev.id) < (after[0], after[1])
+    ]
+    out.sort(key=lambda e: (e.created_at, e.id), reverse=True)
+    rows, next_cursor = _next_cursor(out[:limit + 1], limit)
+    return {"cursor": next_cursor, "data": rows}
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.cache import MISSING, TTLCache
+from backend.app.db import DatasetModel, UserModel
+from backend.app.schemas import EntityRef, Event
+from backend.app.services.invalidation import bus
+from backend.app.storage import db
+
+
+logger = logging.getLogger(__name__)
+
+# id -> display name (None when the id does not resolve). Short TTL: renames call
+# invalidate(), and anything missed is stale for at most a few seconds.
+user_names: TTLCache[Optional[str]] = TTLCache(maxsize=10_000, ttl=30.0)
+dataset_names: TTLCache[Optional[str]] = TTLCache(maxsize=10_000, ttl=30.0)
+bus.register("user_name", user_names)
+bus.register("dataset_name", dataset_names)
+
+
+class RefLoader:
+    """Request-scoped batch loader for actor and dataset display names.
+
+    Collect every id a response needs, then resolve them with at most one
+    `WHERE id IN (...)` query per entity type; ids already in the TTL cache cost nothing.
+    """
+
+    def __init__(self, session: AsyncSession | None):
+        self.session = session
+        self._users: Dict[str, Optional[str]] = {}
+        self._datasets: Dict[str, Optional[str]] = {}
+
+    async def users(self, ids: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+        return await self._load(ids, self._users, user_names, UserModel, db.users)
+
+    async def datasets(self, ids: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+        return await self._load(ids, self._datasets, dataset_names, DatasetModel, db.datasets)
+
+    async def _load(self, ids, seen: Dict[str, Optional[str]], cache: TTLCache, model, memory: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        missing: List[str] = []
+        for i in {i for i in ids if i}:
+            if i in seen:
+                continue
+            hit = cache.get(i)
+            if hit is MISSING:
+                missing.append(i)
+            else:
+                seen[i] = hit
+        if missing:
+            found: Dict[str, str] = {}
+            if self.session is not None:
+                try:
+                    res = await self.session.execute(select(model.id, model.name).where(model.id.in_(missing)))
+                    found = {r[0]: r[1] for r in res.all()}
+                except Exception as e:
+                    logger.info("hydration: %s name lookup failed: %s", model.__tablename__, e)
+            for i in missing:
+                name = found.get(i)
+                if name is None and i in memory:
+                    name = memory[i].name
+                cache.set(i, name)
+                seen[i] = name
+        return seen
+
+    async def _prime(self, pairs: Sequence[tuple[Optional[str], Optional[str]]]) -> None:
+        await self.users(a for a, _ in pairs)
+        await self.datasets(d for _, d in pairs)
+
+    async def events(self, events: Sequence[Event]) -> List[Event]:
+        """Copies of `events` with `actor` and `dataset` refs filled in."""
+        await self._prime([(e.actor_id, e.dataset_id) for e in events])
+        return [
+            e.model_copy(update={
+                "actor": EntityRef(id=e.actor_id, name=self._users.get(e.actor_id)) if e.actor_id else None,
+                "dataset": EntityRef(id=e.dataset_id, name=self._datasets.get(e.dataset_id)) if e.dataset_id else None,
+            })
+            for e in events
+        ]
+
+    async def event_dicts(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Same as `events` for plain dict rows; updates them in place."""
+        await self._prime([(e.get("actor_id"), e.get("dataset_id")) for e in events])
+        for e in events:
+            a, d = e.get("actor_id"), e.get("dataset_id")
+            e["actor"] = {"id": a, "name": self._users.get(a)} if a else None
+            e["dataset"] = {"id": d, "name": self._datasets.get(d)} if d else None
+        return events
+
+
+async def hydrate_events(session: AsyncSession | None, events: Sequence[Event]) -> List[Event]:
+    return await RefLoader(session).events(events)
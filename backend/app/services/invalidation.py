@@ -0,0 +1,188 @@
+"""Cross-worker cache invalidation.
+
+Each worker keeps its own process-local caches (datasets, display names). A write
+publishes the keys it made stale, as "<cache>:<id>" strings, and every worker evicts
+them. With Postgres the keys go out through pg_notify on the writer's own session.
+Postgres delivers a notification only when its transaction commits and drops it on
+rollback, so the broadcast happens exactly on commit. Each worker holds one LISTEN
+connection and evicts whatever arrives, including its own notifications (a read between
+the local eviction and the commit may have re-cached the old value). "dataset_index"
+keys also make other workers re-read those datasets into their search indexes
+(services.datasets); the writer indexes its own writes after committing, so handlers
+skip notifications sent from this worker's connections. Without a database (or a
+session), the base InvalidationBus is the stand-in: publishing just evicts from this
+worker's caches.
+
+While the LISTEN connection is down, notifications are missed, so every registered
+cache is cleared whenever it (re)connects. A connection that dies without closing
+(a dropped NAT entry, a failed-over server) never reports it, so an idle connection
+is probed with SELECT 1 and replaced when the probe fails.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Set
+
+from sqlalchemy import event as sa_event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from backend.app.cache import TTLCache
+from backend.app.db import Config, engine
+
+
+logger = logging.getLogger(__name__)
+
+MAX_PAYLOAD = 7_900  # pg_notify payloads must stay under 8000 bytes
+RECONNECT_DELAY = 5.0
+KEEPALIVE_INTERVAL = 30.0   # idle seconds between SELECT 1 probes on the LISTEN connection
+KEEPALIVE_TIMEOUT = 10.0
+
+
+class InvalidationBus:
+    """Routes cache keys to the caches registered for their prefix (local only)."""
+
+    def __init__(self) -> None:
+        self._caches: Dict[str, TTLCache] = {}
+        self._handlers: Dict[str, Callable[[List[str]], None]] = {}
+
+    def register(self, name: str, cache: TTLCache) -> None:
+        self._caches[name] = cache
+
+    def subscribe(self, name: str, handler: Callable[[List[str]], None]) -> None:
+        """Call `handler` with the ids of `name` keys published by other workers.
+
+        Unlike cache eviction this only runs for keys that arrive over the channel, i.e.
+        after the writing transaction committed, and never for this worker's own writes.
+        """
+        self._handlers[name] = handler
+
+    def _dispatch(self, keys: Iterable[str]) -> None:
+        by_name: Dict[str, List[str]] = {}
+        for key in keys:
+            name, _, ident = key.partition(":")
+            if name in self._handlers:
+                by_name.setdefault(name, []).append(ident)
+        for name, idents in by_name.items():
+            try:
+                self._handlers[name](idents)
+            except Exception:
+                logger.exception("invalidation: %s handler failed", name)
+
+    def evict(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            name, _, ident = key.partition(":")
+            cache = self._caches.get(name)
+            if cache is not None:
+                cache.invalidate(ident)
+
+    def evict_all(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+
+    async def publish(self, session: AsyncSession | None, keys: Iterable[str]) -> None:
+        """Evict `keys` here and, where supported, in every other worker once `session` commits."""
+        self.evict(list(keys))
+
+
+def _payloads(keys: List[str]) -> List[str]:
+    out: List[str] = []
+    chunk: List[str] = []
+    size = 0
+    for key in keys:
+        n = len(key.encode("utf-8")) + 1
+        if chunk and size + n > MAX_PAYLOAD:
+            out.append("\n".join(chunk))
+            chunk, size = [], 0
+        chunk.append(key)
+        size += n
+    if chunk:
+        out.append("\n".join(chunk))
+    return out
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    def __init__(self, channel: str) -> None:
+        super().__init__()
+        self.channel = channel
+        # Backend pids of this worker's pooled connections: notifications they sent are our own
+        self._own_pids: Set[int] = set()
+
+    def track_pool(self, engine: AsyncEngine) -> None:
+        """Keep `_own_pids` in step with the connections `engine`'s pool opens and closes."""
+        pool = engine.sync_engine.pool
+
+        def opened(dbapi_connection, _record) -> None:
+            self._own_pids.add(dbapi_connection.driver_connection.get_server_pid())
+
+        def closed(dbapi_connection, *_args) -> None:
+            if dbapi_connection is not None:
+                self._own_pids.discard(dbapi_connection.driver_connection.get_server_pid())
+
+        sa_event.listen(pool, "connect", opened)
+        for name in ("close", "close_detached", "invalidate"):
+            sa_event.listen(pool, name, closed)
+
+    async def publish(self, session: AsyncSession | None, keys: Iterable[str]) -> None:
+        keys = list(dict.fromkeys(keys))
+        self.evict(keys)
+        if session is None or not keys:
+            return
+        for payload in _payloads(keys):
+            await session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        keys = payload.split("\n")
+        self.evict(keys)
+        if pid not in self._own_pids:
+            self._dispatch(keys)
+
+    async def _watch(self, raw, closed: asyncio.Event) -> None:
+        """Return when the connection closes; raise when it stops answering SELECT 1."""
+        while not closed.is_set():
+            try:
+                await asyncio.wait_for(closed.wait(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                await asyncio.wait_for(raw.fetchval("SELECT 1"), KEEPALIVE_TIMEOUT)
+
+    async def listen(self, engine: AsyncEngine) -> None:
+        """Hold a LISTEN connection and evict notified keys; reconnects until cancelled."""
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    closed = asyncio.Event()
+                    raw.add_termination_listener(lambda _c: closed.set())
+                    await raw.add_listener(self.channel, self._on_notify)
+                    self.evict_all()
+                    logger.info("invalidation: listening on %s", self.channel)
+                    try:
+                        await self._watch(raw, closed)
+                    except Exception as e:
+                        logger.warning("invalidation: listen connection unresponsive (%r); reconnecting", e)
+                        # Never hand a dead connection back to the pool
+                        await conn.invalidate()
+                    finally:
+                        if not raw.is_closed():
+                            await raw.remove_listener(self.channel, self._on_notify)
+                logger.warning("invalidation: listen connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("invalidation: listen failed")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+bus: InvalidationBus = PostgresInvalidationBus(Config.CACHE_INVALIDATION_CHANNEL) if engine is not None else InvalidationBus()
+if isinstance(bus, PostgresInvalidationBus):
+    bus.track_pool(engine)
+
+
+def dataset_keys(dataset_id: str) -> List[str]:
+    return [f"dataset:{dataset_id}", f"dataset_name:{dataset_id}", f"dataset_index:{dataset_id}"]
+
+
+def start_invalidation() -> asyncio.Task | None:
+    if engine is None or not isinstance(bus, PostgresInvalidationBus):
+        return None
+    return asyncio.create_task(bus.listen(engine))
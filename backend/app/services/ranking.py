@@ -0,0 +1,253 @@
+"""BM25F relevance ranking for dataset search.
+
+An in-process inverted index over four fields — name, tags, column names and
+description — each with its own boost and length normalization. Postings are
+growable typed arrays (document slot + per-field term frequencies); a query turns the
+postings of each of its terms into NumPy arrays and scores every matching document
+in one vectorized pass, then applies the owner/org/visibility filters as masks.
+
+Every query term must match (the last one also matches as a prefix, for
+search-as-you-type). A changed dataset gets a new slot and its old one is marked dead;
+dead slots are dropped by the next rebuild, which runs at startup and every
+SEARCH_REBUILD_INTERVAL seconds.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.db import Config, DatasetModel
+from backend.app.schemas import Dataset
+from backend.app.services.rebuild import RebuildableIndex, rebuild_index, start_rebuild
+from backend.app.services.similarity import column_names, crawled_names, crawled_names_column
+from backend.app.storage import db
+
+
+FIELDS = ("name", "tags", "columns", "description")
+BOOSTS = np.array([3.0, 2.0, 1.5, 1.0])
+B = np.array([0.5, 0.3, 0.5, 0.75])
+K1 = 1.2
+MAX_PREFIX_TERMS = 50
+_F = len(FIELDS)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def dataset_fields(
+    name: str, tags: Optional[Iterable[object]], source_metadata: Optional[Dict[str, Any]], description: Optional[str],
+    crawled: Optional[Iterable[str]] = None,
+) -> Tuple[List[str], ...]:
+    return (
+        tokenize(name),
+        [t for tag in tags or [] for t in tokenize(str(tag))],
+        [t for c in column_names(source_metadata, crawled) for t in tokenize(c)],
+        tokenize(description),
+    )
+
+
+class Bm25Index(RebuildableIndex):
+    def __init__(self) -> None:
+        self._terms: Dict[str, int] = {}
+        self._sorted_terms: List[str] = []
+        self._post_slots: List[array] = []   # term id -> slots
+        self._post_tf: List[array] = []      # term id -> _F frequencies per posting
+        self._ids: List[str] = []            # slot -> dataset id
+        self._slot: Dict[str, int] = {}      # dataset id -> live slot
+        self._lens = array("f")              # _F field lengths per slot
+        self._alive = bytearray()
+        self._len_sums = np.zeros(_F)
+        self._attrs: Dict[str, Dict[str, int]] = {"owner_id": {}, "org_id": {}, "visibility": {}}
+        self._attr_codes: Dict[str, array] = {k: array("i") for k in self._attrs}
+        self._cache: Optional[Dict[str, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    def _code(self, attr: str, value: Optional[str]) -> int:
+        codes = self._attrs[attr]
+        return codes.setdefault(value or "", len(codes))
+
+    def remove(self, dataset_id: str) -> None:
+        self._record("remove", dataset_id)
+        self._drop(dataset_id)
+
+    def _drop(self, dataset_id: str) -> None:
+        slot = self._slot.pop(dataset_id, None)
+        if slot is None:
+            return
+        self._alive[slot] = 0
+        self._len_sums -= np.asarray(self._lens[slot * _F:(slot + 1) * _F])
+        self._cache = None
+
+    def upsert(self, dataset_id: str, fields: Sequence[List[str]], owner_id: Optional[str], org_id: Optional[str], visibility: Optional[str]) -> None:
+        self._record("upsert", dataset_id, fields, owner_id, org_id, visibility)
+        self._insert(dataset_id, fields, owner_id, org_id, visibility, keep_sorted=True)
+
+    def _insert(self, dataset_id: str, fields: Sequence[List[str]], owner_id: Optional[str], org_id: Optional[str], visibility: Optional[str], keep_sorted: bool) -> None:
+        self._drop(dataset_id)
+        slot = len(self._ids)
+        self._ids.append(dataset_id)
+        self._slot[dataset_id] = slot
+        self._alive.append(1)
+        lens = [float(len(f)) for f in fields]
+        self._lens.extend(lens)
+        self._len_sums += lens
+        for attr, value in (("owner_id", owner_id), ("org_id", org_id), ("visibility", visibility)):
+            self._attr_codes[attr].append(self._code(attr, value))
+        per_term: Dict[str, List[float]] = {}
+        for i, tokens in enumerate(fields):
+            for term, n in Counter(tokens).items():
+                per_term.setdefault(term, [0.0] * _F)[i] = float(n)
+        for term, tfs in per_term.items():
+            tid = self._terms.get(term)
+            if tid is None:
+                tid = self._terms[term] = len(self._post_slots)
+                self._post_slots.append(array("i"))
+                self._post_tf.append(array("f"))
+                if keep_sorted:
+                    bisect.insort(self._sorted_terms, term)
+            self._post_slots[tid].append(slot)
+            self._post_tf[tid].extend(tfs)
+        self._cache = None
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        if self._cache is None:
+            self._cache = {
+                "lens": np.frombuffer(self._lens, dtype=np.float32).reshape(-1, _F).astype(np.float64),
+                "alive": np.frombuffer(self._alive, dtype=np.uint8).astype(bool),
+                **{k: np.frombuffer(v, dtype=np.int32).copy() for k, v in self._attr_codes.items()},
+            }
+        return self._cache
+
+    def _expand(self, token: str, prefix: bool) -> List[int]:
+        if not prefix or len(token) < 2:
+            tid = self._terms.get(token)
+            return [tid] if tid is not None else []
+        i = bisect.bisect_left(self._sorted_terms, token)
+        out = []
+        while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(token) and len(out) < MAX_PREFIX_TERMS:
+            out.append(self._terms[self._sorted_terms[i]])
+            i += 1
+        return out
+
+    def search(self, query: str, offset: int = 0, limit: int = 20, **filters: Optional[str]) -> Tuple[int, List[Tuple[str, float]]]:
+        """(total matches, page of (dataset_id, score)) for `query`, best first.
+
+        `filters` are exact matches on owner_id, org_id and visibility.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        n_live = len(self._slot)
+        if not tokens or not n_live:
+            return 0, []
+        arr = self._arrays()
+        avg = np.maximum(self._len_sums / n_live, 1e-9)
+        hits: Optional[np.ndarray] = None
+        scores = np.zeros(0)
+        for pos, token in enumerate(tokens):
+            group_slots, group_scores = [], []
+            for tid in self._expand(token, prefix=pos == len(tokens) - 1):
+                slots = np.frombuffer(self._post_slots[tid], dtype=np.int32).copy()
+                tf = np.frombuffer(self._post_tf[tid], dtype=np.float32).reshape(-1, _F).astype(np.float64)
+                live = arr["alive"][slots]
+                df = int(live.sum())
+                if not df:
+                    continue
+                slots, tf = slots[live], tf[live]
+                norm = 1.0 - B + B * arr["lens"][slots] / avg
+                weighted = (tf / norm * BOOSTS).sum(axis=1)
+                idf = math.log(1.0 + (n_live - df + 0.5) / (df + 0.5))
+                group_slots.append(slots)
+                group_scores.append(idf * weighted * (K1 + 1.0) / (weighted + K1))
+            if not group_slots:
+                return 0, []
+            # A prefix can hit one document through several terms: sum per slot
+            slots, inverse = np.unique(np.concatenate(group_slots), return_inverse=True)
+            contrib = np.bincount(inverse, weights=np.concatenate(group_scores))
+            if hits is None:
+                hits, scores = slots, contrib
+            else:
+                hits, i, j = np.intersect1d(hits, slots, assume_unique=True, return_indices=True)
+                scores = scores[i] + contrib[j]
+        for attr, value in filters.items():
+            if value is not None:
+                code = self._attrs[attr].get(value)
+                if code is None:
+                    return 0, []
+                keep = arr[attr][hits] == code
+                hits, scores = hits[keep], scores[keep]
+        if hits is None or not hits.size:
+            return 0, []
+        top = np.argsort(-scores, kind="stable")[offset:offset + limit]
+        order = hits[top]
+        scores = scores[top]
+        return int(hits.size), [(self._ids[s], float(sc)) for s, sc in zip(order, scores)]
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, Sequence[List[str]], Optional[str], Optional[str], Optional[str]]]) -> "Bm25Index":
+        fresh = cls()
+        for doc in docs:
+            fresh._insert(*doc, keep_sorted=False)
+        # One sort instead of an insort per new term, which is quadratic in the vocabulary
+        fresh._sorted_terms = sorted(fresh._terms)
+        return fresh
+
+
+search_index = Bm25Index()
+
+
+def _visibility(value: Any) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def index_dataset(ds: Dataset, crawled: Optional[List[str]] = None) -> None:
+    crawled = crawled_names(ds.id) if crawled is None else crawled
+    search_index.upsert(
+        ds.id,
+        dataset_fields(ds.name, ds.tags, ds.source_metadata_json, ds.description, crawled),
+        ds.owner_id, ds.org_id, _visibility(ds.visibility),
+    )
+
+
+def _build(rows: Sequence[Tuple[Any, ...]]) -> Bm25Index:
+    return Bm25Index.build(
+        (r[0], dataset_fields(r[1], r[2], r[3], r[4], r[8]), r[5], r[6], _visibility(r[7])) for r in rows
+    )
+
+
+async def _read(session: AsyncSession) -> Sequence[Tuple[Any, ...]]:
+    res = await session.execute(select(
+        DatasetModel.id, DatasetModel.name, DatasetModel.tags, DatasetModel.source_metadata_json,
+        DatasetModel.description, DatasetModel.owner_id, DatasetModel.org_id, DatasetModel.visibility,
+        crawled_names_column(),
+    ))
+    return res.all()
+
+
+async def rebuild_search(session: AsyncSession) -> int:
+    """Rebuild from the `datasets` table; returns datasets indexed."""
+    await rebuild_index(search_index, _read(session), _build)
+    return len(search_index)
+
+
+def rebuild_search_memory() -> int:
+    search_index.swap(_build([
+        (ds.id, ds.name, ds.tags, ds.source_metadata_json, ds.description, ds.owner_id, ds.org_id, ds.visibility, crawled_names(ds.id))
+        for ds in db.datasets.values()
+    ]))
+    return len(search_index)
+
+
+def start_search(session_maker: async_sessionmaker | None) -> asyncio.Task | None:
+    return start_rebuild("search", session_maker, Config.SEARCH_REBUILD_INTERVAL, rebuild_search, rebuild_search_memory)
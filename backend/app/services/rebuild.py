@@ -0,0 +1,109 @@
+"""Background rebuilds for the in-process indexes (trending, similarity, search, semantic).
+
+Each index is patched in place as writes happen and periodically rebuilt from the
+database to pick up writes made by other workers. A rebuild reads its rows on the event
+loop, then builds a fresh index from them in a worker thread, so the CPU-heavy part
+(hashing, tokenizing, k-means) never stalls requests. Writes the live index sees in the
+meantime are recorded and replayed onto the fresh index before it is swapped in.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+logger = logging.getLogger(__name__)
+
+DUE_CHECK_INTERVAL = 30.0
+
+R = TypeVar("R")
+I = TypeVar("I", bound="RebuildableIndex")
+
+
+class RebuildableIndex:
+    """Base for indexes swapped out wholesale by a rebuild.
+
+    Public write methods call `_record` first; while a rebuild is running, the call is
+    kept and replayed onto the fresh index, so replayed writes must be safe to repeat.
+    """
+
+    _pending: Optional[List[Tuple[str, tuple]]] = None
+
+    def _record(self, method: str, *args: Any) -> None:
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    def begin_rebuild(self) -> None:
+        self._pending = []
+
+    def end_rebuild(self) -> None:
+        self._pending = None
+
+    def swap(self, fresh: "RebuildableIndex") -> None:
+        """Replay writes recorded since begin_rebuild onto `fresh`, then become it."""
+        for method, args in self._pending or []:
+            getattr(fresh, method)(*args)
+        self.__dict__.update(fresh.__dict__)
+
+
+async def rebuild_index(index: I, read: Awaitable[R], build: Callable[[R], I]) -> I:
+    """Await `read`, run `build` on its result in a worker thread, and swap the result into `index`."""
+    index.begin_rebuild()
+    try:
+        rows = await read
+        fresh = await asyncio.to_thread(build, rows)
+        index.swap(fresh)
+    finally:
+        index.end_rebuild()
+    return index
+
+
+async def rebuild_loop(
+    name: str,
+    session_maker: async_sessionmaker,
+    interval: int,
+    rebuild: Callable[[AsyncSession], Awaitable[int]],
+    due: Optional[Callable[[], bool]] = None,
+) -> None:
+    while True:
+        try:
+            t0 = time.monotonic()
+            async with session_maker() as session:
+                n = await rebuild(session)
+            logger.info("%s: rebuilt from %d rows in %.2fs", name, n, time.monotonic() - t0)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("%s: rebuild failed", name)
+        if due is None:
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+            continue
+        # Wake up early when `due` says the index needs a rebuild before the interval is up
+        # (checked after a sleep, so a failing rebuild cannot spin)
+        deadline = time.monotonic() + interval if interval > 0 else math.inf
+        while True:
+            await asyncio.sleep(min(DUE_CHECK_INTERVAL, max(0.0, deadline - time.monotonic())))
+            if time.monotonic() >= deadline or due():
+                break
+
+
+def start_rebuild(
+    name: str,
+    session_maker: async_sessionmaker | None,
+    interval: int,
+    rebuild: Callable[[AsyncSession], Awaitable[int]],
+    rebuild_memory: Callable[[], Any],
+    due: Optional[Callable[[], bool]] = None,
+) -> asyncio.Task | None:
+    """Rebuild from the in-memory store now (no database), or start the periodic rebuild task."""
+    if session_maker is None:
+        rebuild_memory()
+        return None
+    return asyncio.create_task(rebuild_loop(name, session_maker, interval, rebuild, due))
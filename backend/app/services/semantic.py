@@ -0,0 +1,228 @@
+"""Offline semantic search over dataset names, descriptions, tags, columns and column comments.
+
+Text is embedded with a feature-hashing embedder: words and character trigrams are
+hashed into DIM signed buckets and the vector is L2-normalized, so phrasings that share
+stems ("customers", "customer_id", "churned") land close together without any model or
+network call. Vectors live in a memory-mapped float32 matrix (in VECTOR_INDEX_DIR, the
+system temp dir by default) and are searched through an IVF index: spherical k-means
+centroids, one inverted list per centroid, and queries probe the NPROBE closest lists.
+Small catalogs are searched exhaustively.
+
+Dataset writes upsert vectors in place, each new row joining its nearest existing list;
+training never happens on a write. The background task rebuilds and retrains off the
+event loop at startup, every SEMANTIC_REBUILD_INTERVAL seconds, and as soon as the
+catalog has grown 4x since the last training.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import tempfile
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.db import Config, DatasetModel
+from backend.app.schemas import Dataset
+from backend.app.services.ranking import tokenize
+from backend.app.services.rebuild import RebuildableIndex, rebuild_index, start_rebuild
+from backend.app.services.similarity import column_names, crawled_names, crawled_names_column
+from backend.app.storage import db
+
+
+DIM = 256
+NPROBE = 8
+BRUTE_FORCE_LIMIT = 2_000   # below this many vectors, skip the IVF lists
+TRAIN_SAMPLE = 20_000
+KMEANS_ITERS = 10
+MIN_SCORE = 0.1             # cosine below this is hash-collision noise
+
+
+def _bucket(feature: str) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % DIM, 1.0 if h & 0x80000000 else -1.0
+
+
+def embed(text: str) -> np.ndarray:
+    """Unit-length DIM vector for `text` (all zeros when it has no tokens)."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    for word in tokenize(text):
+        padded = f"<{word}>"
+        features = [(f"w:{word}", 1.0)] + [(f"g:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+        for feature, weight in features:
+            i, sign = _bucket(feature)
+            vec[i] += sign * weight
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+def dataset_text(
+    name: str, description: Optional[str], tags: Optional[Iterable[object]], source_metadata: Optional[Dict[str, Any]],
+    crawled: Optional[Iterable[str]] = None,
+) -> str:
+    parts = [name, name, description or "", " ".join(str(t) for t in tags or [])]
+    for c in (source_metadata or {}).get("columns") or []:
+        if isinstance(c, dict):
+            parts += [str(c.get("name") or ""), str(c.get("comment") or "")]
+        elif c:
+            parts.append(str(c))
+    # Crawled columns carry no comments; only names the metadata did not list add anything
+    listed = set(column_names(source_metadata))
+    parts += [str(c) for c in crawled or () if c and str(c).lower() not in listed]
+    return " ".join(parts)
+
+
+class VectorIndex(RebuildableIndex):
+    def __init__(self, capacity: int = 1024):
+        # Allocated on first insert, so importing this module never touches VECTOR_INDEX_DIR
+        self._capacity = capacity
+        self._vectors: Optional[np.memmap] = None
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._alive = bytearray()
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[array] = []
+        self._trained_on = 0
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    @staticmethod
+    def _allocate(capacity: int) -> np.memmap:
+        backing = tempfile.TemporaryFile(prefix="databooks-vectors-", dir=Config.VECTOR_INDEX_DIR)
+        return np.memmap(backing, dtype=np.float32, mode="w+", shape=(capacity, DIM))
+
+    def _append_row(self, vec: np.ndarray) -> int:
+        row = len(self._ids)
+        if self._vectors is None:
+            self._vectors = self._allocate(self._capacity)
+        if row == self._vectors.shape[0]:
+            grown = self._allocate(row * 2)
+            grown[:row] = self._vectors[:row]
+            self._vectors = grown
+        self._vectors[row] = vec
+        return row
+
+    def remove(self, dataset_id: str) -> None:
+        self._record("remove", dataset_id)
+        row = self._row.pop(dataset_id, None)
+        if row is not None:
+            self._alive[row] = 0
+
+    def upsert(self, dataset_id: str, text: str) -> None:
+        self._record("upsert", dataset_id, text)
+        self._add(dataset_id, text)
+
+    def needs_training(self) -> bool:
+        """True once the catalog has outgrown its IVF lists (or needs them for the first time)."""
+        return len(self._row) >= BRUTE_FORCE_LIMIT and len(self._row) > 4 * self._trained_on
+
+    def _add(self, dataset_id: str, text: str) -> None:
+        old = self._row.pop(dataset_id, None)
+        if old is not None:
+            self._alive[old] = 0
+        vec = embed(text)
+        row = self._append_row(vec)
+        self._ids.append(dataset_id)
+        self._row[dataset_id] = row
+        self._alive.append(1)
+        if self._centroids is not None:
+            self._lists[int(np.argmax(self._centroids @ vec))].append(row)
+
+    def train(self) -> None:
+        """Fit IVF centroids with spherical k-means on a sample and reassign every live row."""
+        rows = np.flatnonzero(np.frombuffer(self._alive, dtype=np.uint8).copy())
+        self._trained_on = rows.size
+        if rows.size < BRUTE_FORCE_LIMIT:
+            self._centroids, self._lists = None, []
+            return
+        nlist = min(4096, int(math.sqrt(rows.size)))
+        rng = np.random.default_rng(0)
+        sample = self._vectors[np.sort(rng.choice(rows, size=min(TRAIN_SAMPLE, rows.size), replace=False))]
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0  # an empty cluster keeps its previous centroid
+            centroids[filled] = sums[filled] / norms[filled, None]
+        lists = [array("i") for _ in range(nlist)]
+        for start in range(0, rows.size, 65_536):
+            chunk = rows[start:start + 65_536]
+            for row, k in zip(chunk.tolist(), np.argmax(self._vectors[chunk] @ centroids.T, axis=1).tolist()):
+                lists[k].append(row)
+        self._centroids, self._lists = centroids, lists
+
+    def search(self, text: str, k: int) -> List[Tuple[str, float]]:
+        """Up to k (dataset_id, cosine similarity) pairs, best first."""
+        q = embed(text)
+        if not self._row or not q.any():
+            return []
+        if self._centroids is None:
+            rows = np.arange(len(self._ids))
+        else:
+            probe = np.argsort(-(self._centroids @ q))[:NPROBE]
+            rows = np.concatenate([np.frombuffer(self._lists[p], dtype=np.int32).copy() for p in probe])
+        rows = rows[np.frombuffer(self._alive, dtype=np.uint8)[rows].astype(bool)]
+        if not rows.size:
+            return []
+        sims = self._vectors[rows] @ q
+        top = np.argpartition(-sims, min(k, sims.size) - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self._ids[rows[i]], float(sims[i])) for i in top if sims[i] >= MIN_SCORE]
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]]) -> "VectorIndex":
+        """A freshly embedded and trained index."""
+        fresh = cls()
+        for dataset_id, text in docs:
+            fresh._add(dataset_id, text)
+        fresh.train()
+        return fresh
+
+
+vectors = VectorIndex()
+
+
+def index_dataset(ds: Dataset, crawled: Optional[List[str]] = None) -> None:
+    crawled = crawled_names(ds.id) if crawled is None else crawled
+    vectors.upsert(ds.id, dataset_text(ds.name, ds.description, ds.tags, ds.source_metadata_json, crawled))
+
+
+def _build(rows: Sequence[Tuple[Any, ...]]) -> VectorIndex:
+    return VectorIndex.build((r[0], dataset_text(r[1], r[2], r[3], r[4], r[5])) for r in rows)
+
+
+async def _read(session: AsyncSession) -> Sequence[Tuple[Any, ...]]:
+    res = await session.execute(select(
+        DatasetModel.id, DatasetModel.name, DatasetModel.description, DatasetModel.tags, DatasetModel.source_metadata_json,
+        crawled_names_column(),
+    ))
+    return res.all()
+
+
+async def rebuild_semantic(session: AsyncSession) -> int:
+    """Re-embed every row of `datasets` and retrain the IVF lists; returns datasets indexed."""
+    await rebuild_index(vectors, _read(session), _build)
+    return len(vectors)
+
+
+def rebuild_semantic_memory() -> int:
+    vectors.swap(_build([
+        (ds.id, ds.name, ds.description, ds.tags, ds.source_metadata_json, crawled_names(ds.id)) for ds in db.datasets.values()
+    ]))
+    return len(vectors)
+
+
+def start_semantic(session_maker: async_sessionmaker | None) -> asyncio.Task | None:
+    # Writes only assign new rows to the nearest existing list; retraining is a rebuild,
+    # brought forward when the catalog has grown 4x since the last one
+    return start_rebuild(
+        "semantic", session_maker, Config.SEMANTIC_REBUILD_INTERVAL, rebuild_semantic, rebuild_semantic_memory,
+        due=vectors.needs_training,
+    )
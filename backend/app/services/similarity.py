@@ -0,0 +1,213 @@
+"""Related-dataset recommendations with MinHash signatures and LSH banding.
+
+Each dataset is a set of tokens: its tags, its column names (from its source metadata
+and the column crawls), and the ids of the users following it. A MinHash signature of NUM_HASHES
+values estimates the Jaccard similarity of two such sets; splitting it into BANDS
+bands of ROWS values and bucketing on each band means only datasets sharing at least
+one band (roughly, Jaccard above ~0.5) are ever compared. A lookup reads a handful of
+buckets and scores the candidates in one vectorized comparison.
+
+Dataset writes and follow toggles update the index in place (a new follower only
+lowers the signature; an unfollow recomputes it); the background task rebuilds it from
+the database at startup and every SIMILAR_REBUILD_INTERVAL seconds.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.db import Config, DatasetColumnModel, DatasetModel, FollowModel
+from backend.app.schemas import Dataset
+from backend.app.services.rebuild import RebuildableIndex, rebuild_index, start_rebuild
+from backend.app.services.tags import normalize_tags
+from backend.app.storage import db
+
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+_PRIME = (1 << 61) - 1
+_CHUNK = 4096
+
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def minhash(tokens: Iterable[str]) -> Optional[np.ndarray]:
+    """NUM_HASHES-value signature of a token set (None when empty)."""
+    x = np.fromiter((_token_hash(t) for t in tokens), dtype=np.uint64)
+    if x.size == 0:
+        return None
+    sig = np.full(NUM_HASHES, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # a, b < 2**31 and x < 2**32, so a * x + b stays below 2**63
+    for i in range(0, x.size, _CHUNK):
+        h = (_A[:, None] * x[None, i:i + _CHUNK] + _B[:, None]) % _PRIME
+        np.minimum(sig, h.min(axis=1), out=sig)
+    return sig
+
+
+def column_names(source_metadata: Optional[Dict[str, Any]], crawled: Optional[Iterable[str]] = None) -> List[str]:
+    """Lower-cased column names from the source metadata plus crawled ones (services.columns)."""
+    out = []
+    for c in (source_metadata or {}).get("columns") or []:
+        name = c.get("name") if isinstance(c, dict) else c
+        if name:
+            out.append(str(name).lower())
+    out += [str(name).lower() for name in crawled or () if name]
+    return list(dict.fromkeys(out))
+
+
+def crawled_names(dataset_id: str) -> List[str]:
+    """Crawled column names this worker holds for a dataset."""
+    return [name for name, _ in db.dataset_columns.get(dataset_id, ())]
+
+
+def crawled_names_column():
+    """Correlated subquery for rebuild reads: the dataset's crawled column names (NULL if never crawled)."""
+    return (
+        select(func.array_agg(DatasetColumnModel.name))
+        .where(DatasetColumnModel.dataset_id == DatasetModel.id)
+        .scalar_subquery()
+    )
+
+
+def content_tokens(tags: Optional[Iterable[object]], source_metadata: Optional[Dict[str, Any]], crawled: Optional[Iterable[str]] = None) -> Set[str]:
+    return {f"t:{t}" for t in normalize_tags(tags)} | {f"c:{c}" for c in column_names(source_metadata, crawled)}
+
+
+class SimilarityIndex(RebuildableIndex):
+    def __init__(self) -> None:
+        self._content: Dict[str, Set[str]] = {}
+        self._fans: Dict[str, Set[str]] = {}
+        self._sigs: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    @staticmethod
+    def _bands(sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(b, sig[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+
+    def _set_sig(self, dataset_id: str, sig: Optional[np.ndarray]) -> None:
+        """Store `sig`, moving the dataset only between the buckets of bands that changed."""
+        old = self._sigs.pop(dataset_id, None)
+        old_bands = set(self._bands(old)) if old is not None else set()
+        new_bands = set(self._bands(sig)) if sig is not None else set()
+        for key in old_bands - new_bands:
+            ids = self._buckets.get(key)
+            if ids is not None:
+                ids.discard(dataset_id)
+                if not ids:
+                    del self._buckets[key]
+        if sig is None:
+            return
+        self._sigs[dataset_id] = sig
+        for key in new_bands - old_bands:
+            self._buckets.setdefault(key, set()).add(dataset_id)
+
+    def _reindex(self, dataset_id: str) -> None:
+        tokens = self._content.get(dataset_id, set()) | {f"u:{u}" for u in self._fans.get(dataset_id, ())}
+        self._set_sig(dataset_id, minhash(tokens))
+
+    def set_content(self, dataset_id: str, tokens: Set[str]) -> None:
+        self._record("set_content", dataset_id, tokens)
+        if self._content.get(dataset_id) == tokens and dataset_id in self._sigs:
+            return
+        self._content[dataset_id] = tokens
+        self._reindex(dataset_id)
+
+    def set_follow(self, user_id: str, dataset_id: str, following: bool) -> None:
+        self._record("set_follow", user_id, dataset_id, following)
+        fans = self._fans.setdefault(dataset_id, set())
+        if (user_id in fans) == following:
+            return
+        if following:
+            fans.add(user_id)
+            # MinHash of a union is the elementwise min, so a new follower costs one hash
+            sig = minhash([f"u:{user_id}"])
+            old = self._sigs.get(dataset_id)
+            self._set_sig(dataset_id, sig if old is None else np.minimum(old, sig))
+        else:
+            fans.discard(user_id)
+            self._reindex(dataset_id)
+
+    @classmethod
+    def build(cls, content: Dict[str, Set[str]], fans: Dict[str, Set[str]]) -> "SimilarityIndex":
+        fresh = cls()
+        fresh._content, fresh._fans = content, fans
+        for dataset_id in content.keys() | fans.keys():
+            fresh._reindex(dataset_id)
+        return fresh
+
+    def similar(self, dataset_id: str, k: int) -> List[Tuple[str, float]]:
+        """Up to k (dataset_id, estimated Jaccard) pairs, most similar first."""
+        sig = self._sigs.get(dataset_id)
+        if sig is None:
+            return []
+        candidates: Set[str] = set()
+        for key in self._bands(sig):
+            candidates |= self._buckets.get(key, set())
+        candidates.discard(dataset_id)
+        if not candidates:
+            return []
+        ids = sorted(candidates)
+        scores = (np.stack([self._sigs[i] for i in ids]) == sig).mean(axis=1)
+        order = np.lexsort((np.arange(len(ids)), -scores))[:k]
+        return [(ids[i], float(scores[i])) for i in order]
+
+
+similar = SimilarityIndex()
+
+
+def index_dataset(ds: Dataset, crawled: Optional[List[str]] = None) -> None:
+    crawled = crawled_names(ds.id) if crawled is None else crawled
+    similar.set_content(ds.id, content_tokens(ds.tags, ds.source_metadata_json, crawled))
+
+
+def track_follow(user_id: str, dataset_id: str, following: bool) -> None:
+    similar.set_follow(user_id, dataset_id, following)
+
+
+def _build(rows: Tuple[List[Tuple[str, Any, Any, Any]], List[Tuple[str, str]]]) -> SimilarityIndex:
+    datasets, follows = rows
+    content = {dataset_id: content_tokens(tags, meta, crawled) for dataset_id, tags, meta, crawled in datasets}
+    fans: Dict[str, Set[str]] = {}
+    for user_id, dataset_id in follows:
+        fans.setdefault(dataset_id, set()).add(user_id)
+    return SimilarityIndex.build(content, fans)
+
+
+async def _read(session: AsyncSession) -> Tuple[List[Tuple[str, Any, Any, Any]], List[Tuple[str, str]]]:
+    datasets = (await session.execute(select(
+        DatasetModel.id, DatasetModel.tags, DatasetModel.source_metadata_json, crawled_names_column(),
+    ))).all()
+    follows = (await session.execute(select(FollowModel.user_id, FollowModel.dataset_id))).all()
+    return datasets, follows
+
+
+async def rebuild_similarity(session: AsyncSession) -> int:
+    """Rebuild from `datasets` and `follows`; returns datasets indexed."""
+    await rebuild_index(similar, _read(session), _build)
+    return len(similar)
+
+
+def rebuild_similarity_memory() -> int:
+    datasets = [(ds.id, ds.tags, ds.source_metadata_json, crawled_names(ds.id)) for ds in db.datasets.values()]
+    follows = [key for key, on in db.follows.items() if on]
+    similar.swap(_build((datasets, follows)))
+    return len(similar)
+
+
+def start_similarity(session_maker: async_sessionmaker | None) -> asyncio.Task | None:
+    return start_rebuild("similarity", session_maker, Config.SIMILAR_REBUILD_INTERVAL, rebuild_similarity, rebuild_similarity_memory)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db import DatasetStatsModel, FollowModel, LikeModel
+
+
+async def apply_toggle(session: AsyncSession, model: type[FollowModel] | type[LikeModel], user_id: str, dataset_id: str, on: bool) -> bool:
+    """Insert or delete a follow/like row; returns True only if the row actually changed.
+
+    Does not commit, so callers can write the event and counters in the same transaction.
+    """
+    if on:
+        stmt = pg_insert(model).values(user_id=user_id, dataset_id=dataset_id).on_conflict_do_nothing()
+    else:
+        stmt = delete(model).where(model.user_id == user_id, model.dataset_id == dataset_id)
+    res = await session.execute(stmt)
+    return bool(res.rowcount)
+
+
+async def bump_stats(session: AsyncSession, dataset_id: str, followers: int = 0, likes: int = 0) -> None:
+    """Apply counter deltas to dataset_stats (does not commit).
+
+    The first touch of a dataset seeds its row from the follows/likes tables, so
+    datasets that predate the counters start from their real totals.
+    """
+    stats = DatasetStatsModel.__table__
+    stmt = pg_insert(stats).values(
+        dataset_id=dataset_id,
+        followers=select(func.count()).select_from(FollowModel).where(FollowModel.dataset_id == dataset_id).scalar_subquery(),
+        likes=select(func.count()).select_from(LikeModel).where(LikeModel.dataset_id == dataset_id).scalar_subquery(),
+    ).on_conflict_do_update(
+        index_elements=[stats.c.dataset_id],
+        set_={
+            "followers": func.greatest(stats.c.followers + followers, 0),
+            "likes": func.greatest(stats.c.likes + likes, 0),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def social_counts(session: AsyncSession, dataset_id: str, user_id: str | None = None) -> dict:
+    """Followers/likes for a dataset plus the given user's state, in a single round trip.
+
+    Counts come from dataset_stats; datasets never toggled since the counters were
+    introduced fall back to COUNT(*) on the relation tables.
+    """
+    stats = DatasetStatsModel.__table__
+    followers = func.coalesce(
+        select(stats.c.followers).where(stats.c.dataset_id == dataset_id).scalar_subquery(),
+        select(func.count()).select_from(FollowModel).where(FollowModel.dataset_id == dataset_id).scalar_subquery(),
+    )
+    likes = func.coalesce(
+        select(stats.c.likes).where(stats.c.dataset_id == dataset_id).scalar_subquery(),
+        select(func.count()).select_from(LikeModel).where(LikeModel.dataset_id == dataset_id).scalar_subquery(),
+    )
+    following = exists().where(FollowModel.user_id == user_id, FollowModel.dataset_id == dataset_id)
+    liked = exists().where(LikeModel.user_id == user_id, LikeModel.dataset_id == dataset_id)
+    row = (await session.execute(select(followers, likes, following, liked))).one()
+    return {"followers": int(row[0] or 0), "likes": int(row[1] or 0), "following": bool(row[2]), "liked": bool(row[3])}
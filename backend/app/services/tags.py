@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db import DatasetTagModel, TagCountModel
+
+
+def normalize_tags(tags: Optional[Iterable[object]]) -> Dict[str, str]:
+    """Map lower-cased tag -> display tag (first spelling wins), dropping blanks."""
+    out: Dict[str, str] = {}
+    for t in tags or []:
+        label = str(t).strip()
+        if label and label.lower() not in out:
+            out[label.lower()] = label
+    return out
+
+
+async def sync_dataset_tags(session: AsyncSession, dataset_id: str, tags: Optional[Iterable[object]]) -> None:
+    """Bring dataset_tags and tag_counts in line with a dataset's tag list (does not commit).
+
+    Counts only move for rows this call actually inserted or deleted, so concurrent
+    saves of the same dataset cannot double count.
+    """
+    wanted = normalize_tags(tags)
+    res = await session.execute(select(DatasetTagModel.tag_lower).where(DatasetTagModel.dataset_id == dataset_id))
+    existing = {r[0] for r in res.fetchall()}
+
+    removed: list[str] = []
+    stale = existing - wanted.keys()
+    if stale:
+        res = await session.execute(
+            delete(DatasetTagModel)
+            .where(DatasetTagModel.dataset_id == dataset_id, DatasetTagModel.tag_lower.in_(stale))
+            .returning(DatasetTagModel.tag_lower)
+        )
+        removed = [r[0] for r in res.fetchall()]
+
+    added: list[str] = []
+    new = [k for k in wanted if k not in existing]
+    if new:
+        res = await session.execute(
+            pg_insert(DatasetTagModel)
+            .values([{"dataset_id": dataset_id, "tag_lower": k, "tag": wanted[k]} for k in new])
+            .on_conflict_do_nothing()
+            .returning(DatasetTagModel.tag_lower)
+        )
+        added = [r[0] for r in res.fetchall()]
+
+    counts = TagCountModel.__table__
+    for tag_lower, delta in [(k, 1) for k in added] + [(k, -1) for k in removed]:
+        await session.execute(
+            pg_insert(counts)
+            .values(tag_lower=tag_lower, tag=wanted.get(tag_lower, tag_lower), count=max(delta, 0))
+            .on_conflict_do_update(index_elements=[counts.c.tag_lower], set_={"count": counts.c.count + delta})
+        )
+    if removed:
+        await session.execute(delete(TagCountModel).where(TagCountModel.tag_lower.in_(removed), TagCountModel.count <= 0))
@@ -0,0 +1,162 @@
+"""Trending datasets from exponentially decayed engagement scores.
+
+Scores use forward decay: an event at time t adds weight * exp((t - landmark) / tau)
+to its dataset, so nothing has to be rescaled as time passes and late or out-of-order
+events are counted exactly. A score divided by exp((now - landmark) / tau) is the
+classic decayed sum with half-life TRENDING_HALF_LIFE_HOURS; ranking never changes
+with `now`, so the top of a sorted list is always the current top-k.
+
+record_event feeds every event in as it is written. rebuild() recomputes all scores
+from an event window in one vectorized pass; the background task uses it (off the event
+loop, see services.rebuild) to backfill on startup and to converge with events recorded
+by other workers. An event added while a rebuild reads the window is replayed onto the
+result, so one committed just before the read can count twice until the next rebuild.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.db import Config, EventModel
+from backend.app.services.rebuild import RebuildableIndex, rebuild_index, start_rebuild
+from backend.app.storage import db, utcnow
+
+
+EVENT_WEIGHTS: Dict[str, float] = {
+    "user.followed": 4.0,
+    "dataset.liked": 3.0,
+    "dataset.published": 2.0,
+    "dataset.connected": 2.0,
+    "dataset.refreshed": 1.0,
+    "dataset.schema.changed": 0.5,
+}
+# Toggle events whose payload flag is False (unfollow/unlike) count for nothing
+_TOGGLE_KEYS = {"user.followed": "follow", "dataset.liked": "like"}
+
+# Rebase the landmark before exp() gets anywhere near float64 overflow (~709)
+_MAX_EXPONENT = 500.0
+# A rebuild reads events this many half-lives back; older ones weigh < 2**-10
+_WINDOW_HALF_LIVES = 10
+
+
+def event_weight(event_type: str, payload: Optional[Dict[str, Any]]) -> float:
+    key = _TOGGLE_KEYS.get(event_type)
+    if key is not None and (payload or {}).get(key) is False:
+        return 0.0
+    return EVENT_WEIGHTS.get(event_type, 0.0)
+
+
+class TrendingIndex(RebuildableIndex):
+    """Per-dataset forward-decayed scores kept in a list sorted by (-score, id)."""
+
+    def __init__(self, half_life_hours: float, landmark: Optional[datetime] = None):
+        self.half_life_hours = half_life_hours
+        self.tau = half_life_hours * 3600.0 / math.log(2)
+        self.landmark = (landmark or utcnow()).timestamp()
+        self._scores: Dict[str, float] = {}
+        self._ranked: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _rebase(self, landmark: float) -> None:
+        # Dividing every score by the same factor keeps their order, so the list stays sorted
+        factor = math.exp((self.landmark - landmark) / self.tau)
+        self.landmark = landmark
+        self._scores = {k: v * factor for k, v in self._scores.items()}
+        self._ranked = [(s * factor, k) for s, k in self._ranked]
+
+    def add(self, dataset_id: str, weight: float, at: datetime) -> None:
+        if weight <= 0:
+            return
+        self._record("add", dataset_id, weight, at)
+        exponent = (at.timestamp() - self.landmark) / self.tau
+        if exponent > _MAX_EXPONENT:
+            self._rebase(at.timestamp())
+            exponent = 0.0
+        old = self._scores.get(dataset_id)
+        new = (old or 0.0) + weight * math.exp(exponent)
+        if old is not None:
+            i = bisect.bisect_left(self._ranked, (-old, dataset_id))
+            del self._ranked[i]
+        bisect.insort(self._ranked, (-new, dataset_id))
+        self._scores[dataset_id] = new
+
+    def top(self, k: int, now: Optional[datetime] = None) -> List[Tuple[str, float]]:
+        """The k highest (dataset_id, score) pairs, scores decayed to `now`."""
+        scale = math.exp(-((now or utcnow()).timestamp() - self.landmark) / self.tau)
+        return [(dataset_id, -neg * scale) for neg, dataset_id in self._ranked[:k]]
+
+    def rebuild(self, dataset_ids: Sequence[str], weights: Sequence[float], timestamps: Sequence[float]) -> None:
+        """Replace all scores with those of the given events (epoch-second timestamps)."""
+        ts = np.asarray(timestamps, dtype=np.float64)
+        w = np.asarray(weights, dtype=np.float64)
+        if ts.size == 0:
+            self._scores, self._ranked = {}, []
+            return
+        landmark = float(ts.max())
+        keys, codes = np.unique(np.asarray(dataset_ids, dtype=object), return_inverse=True)
+        totals = np.bincount(codes, weights=w * np.exp((ts - landmark) / self.tau), minlength=len(keys))
+        keep = totals > 0
+        scores = dict(zip(keys[keep].tolist(), totals[keep].tolist()))
+        self.landmark = landmark
+        self._scores = scores
+        self._ranked = sorted((-s, k) for k, s in scores.items())
+
+
+trending = TrendingIndex(Config.TRENDING_HALF_LIFE_HOURS)
+
+
+def track_event(event_type: str, dataset_id: Optional[str], payload: Optional[Dict[str, Any]], created_at: datetime) -> None:
+    if dataset_id:
+        trending.add(dataset_id, event_weight(event_type, payload), created_at)
+
+
+def _window_start() -> datetime:
+    return utcnow() - timedelta(hours=trending.half_life_hours * _WINDOW_HALF_LIVES)
+
+
+def _build(rows: Sequence[Tuple[Optional[str], str, Optional[Dict[str, Any]], datetime]]) -> TrendingIndex:
+    ids: List[str] = []
+    weights: List[float] = []
+    ts: List[float] = []
+    for dataset_id, event_type, payload, created_at in rows:
+        w = event_weight(event_type, payload)
+        if dataset_id and w > 0:
+            ids.append(dataset_id)
+            weights.append(w)
+            ts.append(created_at.timestamp())
+    fresh = TrendingIndex(trending.half_life_hours)
+    fresh.rebuild(ids, weights, ts)
+    return fresh
+
+
+async def _read(session: AsyncSession) -> Sequence[Tuple[Optional[str], str, Optional[Dict[str, Any]], datetime]]:
+    res = await session.execute(
+        select(EventModel.dataset_id, EventModel.type, EventModel.payload_json, EventModel.created_at)
+        .where(EventModel.dataset_id.is_not(None), EventModel.created_at >= _window_start())
+    )
+    return res.all()
+
+
+async def rebuild_trending(session: AsyncSession) -> int:
+    """Recompute scores from the `events` window; returns datasets scored."""
+    await rebuild_index(trending, _read(session), _build)
+    return len(trending)
+
+
+def rebuild_trending_memory() -> int:
+    since = _window_start()
+    trending.swap(_build([(e.dataset_id, e.type, e.payload_json, e.created_at) for e in db.events if e.created_at >= since]))
+    return len(trending)
+
+
+def start_trending(session_maker: async_sessionmaker | None) -> asyncio.Task | None:
+    return start_rebuild("trending", session_maker, Config.TRENDING_REBUILD_INTERVAL, rebuild_trending, rebuild_trending_memory)
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
 import asyncio
-import time
-import uuid
-from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from backend.app.eventlog import EventLog
+from backend.app.ids import new_id
 from backend.app.schemas import Dataset, DatasetCreate, DatasetUpdate, User, Connector, Event
+from backend.app.services.tags import normalize_tags
 
 
-ISO = "%Y-%m-%dT%H:%M:%SZ"
+def utcnow() -> datetime:
+    """Current time as an aware UTC datetime (microsecond precision)."""
+    return datetime.now(timezone.utc)
 
 
-def now_iso() -> str:
-    return time.strftime(ISO, time.gmtime())
+def patched_dataset(ds: Dataset, patch: DatasetUpdate) -> Dataset:
+    """A copy of `ds` with the patch applied and updated_at bumped; `ds` itself is left untouched."""
+    return ds.model_copy(update={**patch.model_dump(exclude_unset=True), "updated_at": utcnow()})
 
 
 class InMemoryDB:
@@ -20,16 +25,43 @@ class InMemoryDB:
         self.datasets: Dict[str, Dataset] = {}
         self.users: Dict[str, User] = {}
         self.connectors: List[Connector] = []
-        self.events: List[Event] = []
+        self.events = EventLog()
+        # (dataset_id, UTC day, event type) -> count; mirrors dataset_activity_daily
+        self.activity_daily: Dict[Tuple[str, date, str], int] = {}
+        # dataset id -> crawled (column name, type); mirrors dataset_columns
+        self.dataset_columns: Dict[str, List[Tuple[str, Optional[str]]]] = {}
         self.follows: Dict[Tuple[str, str], bool] = {}
         self.likes: Dict[Tuple[str, str], bool] = {}
         self.tag_follows: Dict[Tuple[str, str], bool] = {}
         self.badges: Dict[str, List[str]] = {}
+        # tag_lower -> dataset ids, and tag_lower -> display label (mirrors dataset_tags/tag_counts)
+        self.tag_index: Dict[str, Set[str]] = {}
+        self.tag_labels: Dict[str, str] = {}
+        # Write-ahead log that records mutations when MEMORY_DB_PATH is set (see persistence.py)
+        self.journal: Any = None
+
+    def _log(self, kind: str, value: Any) -> None:
+        if self.journal is not None:
+            self.journal.append(kind, value)
+
+    def _reindex_tags(self, dataset_id: str, old: Optional[List[str]], new: Optional[List[str]]) -> None:
+        before = normalize_tags(old)
+        after = normalize_tags(new)
+        for key in before.keys() - after.keys():
+            ids = self.tag_index.get(key)
+            if ids is not None:
+                ids.discard(dataset_id)
+                if not ids:
+                    self.tag_index.pop(key, None)
+                    self.tag_labels.pop(key, None)
+        for key, label in after.items():
+            self.tag_index.setdefault(key, set()).add(dataset_id)
+            self.tag_labels.setdefault(key, label)
 
     # Dataset operations
     def create_dataset(self, payload: DatasetCreate) -> Dataset:
-        dataset_id = str(uuid.uuid4())
-        now = now_iso()
+        dataset_id = new_id()
+        now = utcnow()
         ds = Dataset(
             id=dataset_id,
             name=payload.name,
@@ -44,43 +76,79 @@ class InMemoryDB:
             updated_at=now,
         )
         self.datasets[dataset_id] = ds
+        self._reindex_tags(dataset_id, None, ds.tags)
+        self._log("dataset", ds)
         return ds
 
     def update_dataset(self, dataset_id: str, patch: DatasetUpdate) -> Optional[Dataset]:
         ds = self.datasets.get(dataset_id)
         if not ds:
             return None
-        update_data = patch.model_dump(exclude_unset=True)
-        for k, v in update_data.items():
-            setattr(ds, k, v)
-        ds.updated_at = now_iso()
-        self.datasets[dataset_id] = ds
-        return ds
+        updated = patched_dataset(ds, patch)
+        self.save_dataset(updated)
+        return updated
+
+    def save_dataset(self, ds: Dataset) -> None:
+        """Replace a dataset with an edited copy (the old object may still be held by readers)."""
+        self.put_dataset(ds)
+        self._log("dataset", ds)
+
+    def put_dataset(self, ds: Dataset) -> None:
+        """Insert or replace a dataset as-is (snapshot restore and log replay)."""
+        old = self.datasets.get(ds.id)
+        self.datasets[ds.id] = ds
+        self._reindex_tags(ds.id, old.tags if old else None, ds.tags)
+
+    def find_dataset_by_source(self, source_type: str, **fields: Any) -> Optional[Dataset]:
+        for ds in self.datasets.values():
+            src = ds.source_metadata_json or {}
+            if ds.source_type == source_type and all(src.get(k) == v for k, v in fields.items()):
+                return ds
+        return None
 
     # Users
     def upsert_user(self, user: User) -> User:
         self.users[user.id] = user
+        self._log("user", user)
         return user
 
     def get_user(self, user_id: str) -> Optional[User]:
         return self.users.get(user_id)
 
+    # Social edges: follows and likes are keyed (user_id, dataset_id), tag_follows (user_id, tag_lower)
+    def set_flag(self, table: str, key: Tuple[str, str], on: bool) -> None:
+        flags: Dict[Tuple[str, str], bool] = getattr(self, table)
+        if on:
+            flags[key] = True
+        else:
+            flags.pop(key, None)
+        self._log(table, (key, on))
+
+    # Crawled columns
+    def set_columns(self, dataset_id: str, columns: List[Tuple[str, Optional[str]]]) -> None:
+        self.dataset_columns[dataset_id] = columns
+        self._log("dataset_columns", (dataset_id, columns))
+
     # Connectors
     def list_connectors(self) -> List[Connector]:
         return self.connectors
 
     def init_connectors(self) -> None:
         self.connectors = [
-            Connector(id=str(uuid.uuid4()), type="snowflake", capability_flags=["render", "test"], config_schema={}),
-            Connector(id=str(uuid.uuid4()), type="databricks", capability_flags=["render"], config_schema={}),
-            Connector(id=str(uuid.uuid4()), type="bigquery", capability_flags=["render"], config_schema={}),
-            Connector(id=str(uuid.uuid4()), type="redshift", capability_flags=["render"], config_schema={}),
-            Connector(id=str(uuid.uuid4()), type="postgres", capability_flags=["render", "test"], config_schema={}),
+            Connector(id=new_id(), type="snowflake", capability_flags=["render", "test"], config_schema={}),
+            Connector(id=new_id(), type="databricks", capability_flags=["render"], config_schema={}),
+            Connector(id=new_id(), type="bigquery", capability_flags=["render"], config_schema={}),
+            Connector(id=new_id(), type="redshift", capability_flags=["render"], config_schema={}),
+            Connector(id=new_id(), type="postgres", capability_flags=["render", "test"], config_schema={}),
         ]
 
     # Events
     def add_event(self, ev: Event) -> None:
         self.events.append(ev)
+        self._log("event", ev)
+        if ev.dataset_id:
+            key = (ev.dataset_id, ev.created_at.astimezone(timezone.utc).date(), ev.type)
+            self.activity_daily[key] = self.activity_daily.get(key, 0) + 1
 
 
 db = InMemoryDB()
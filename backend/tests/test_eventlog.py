@@ -0,0 +1,105 @@
+"""Round trips for the columnar EventLog (eventlog.py) and its persistence snapshot section."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.app import persistence
+from backend.app.eventlog import EventLog
+from backend.app.ids import new_id
+from backend.app.schemas import Event
+from backend.app.storage import InMemoryDB
+
+
+T0 = datetime(2026, 3, 1, 23, 59, 59, 999_999, tzinfo=timezone.utc)
+
+
+def _events():
+    return [
+        Event(id=new_id(), type="dataset.published", payload_json={"rows": 10, "nested": {"a": [1, 2]}},
+              actor_id="u1", dataset_id="d1", created_at=T0),
+        Event(id=new_id(), type="dataset.liked", actor_id="u2", dataset_id="d1", created_at=T0 + timedelta(microseconds=1)),
+        Event(id="legacy-event-1", type="user.followed", actor_id="u1", dataset_id=None, created_at=T0 + timedelta(days=1)),
+        Event(id=new_id(), type="contract.signed", payload_json={"text": "naïve ✓"}, actor_id=None, dataset_id="d2",
+              created_at=T0 - timedelta(days=400)),
+    ]
+
+
+def _dumps(events):
+    return [e.model_dump(exclude={"actor", "dataset"}) for e in events]
+
+
+def _fill(events) -> EventLog:
+    log = EventLog()
+    for ev in events:
+        log.append(ev)
+    return log
+
+
+def test_append_and_read_back():
+    events = _events()
+    log = _fill(events)
+    assert len(log) == len(events)
+    assert _dumps(log) == _dumps(events)
+    assert _dumps(log[1:3]) == _dumps(events[1:3])
+    assert log[-1].id == events[-1].id
+    assert log.position("legacy-event-1") == 2
+    assert log.position(events[0].id) == 0
+    with pytest.raises(IndexError):
+        log[len(events)]
+
+
+def test_state_round_trip():
+    events = _events()
+    log = _fill(events)
+    meta, columns = log.state()
+    restored = EventLog.from_state(meta, {name: memoryview(blob) for name, blob in columns.items()})
+    assert _dumps(restored) == _dumps(events)
+    assert restored.daily_counts() == log.daily_counts()
+    assert restored.position("legacy-event-1") == 2
+
+    # The restored log keeps appending where the original left off
+    more = Event(id=new_id(), type="dataset.refreshed", actor_id="u3", dataset_id="d3", created_at=T0)
+    restored.append(more)
+    assert _dumps(restored) == _dumps(events + [more])
+
+
+def test_daily_counts_buckets_by_utc_day():
+    counts = _fill(_events()).daily_counts()
+    assert counts == {
+        ("d1", T0.date(), "dataset.published"): 1,
+        ("d1", (T0 + timedelta(days=1)).date(), "dataset.liked"): 1,
+        ("d2", (T0 - timedelta(days=400)).date(), "contract.signed"): 1,
+    }
+
+
+def test_snapshot_section_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "_written_generation", -1)
+    store = InMemoryDB()
+    events = _events()
+    for ev in events:
+        store.add_event(ev)
+    header, sections = persistence.capture(store)
+    header["wal_generation"] = 1
+    persistence.write_snapshot(tmp_path, header, sections)
+
+    restored = InMemoryDB()
+    assert persistence.load_snapshot(restored, tmp_path / persistence.SNAPSHOT_NAME) == 1
+    assert _dumps(restored.events) == _dumps(events)
+    assert restored.activity_daily == store.activity_daily
+
+
+def test_truncated_snapshot_section_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "_written_generation", -1)
+    store = InMemoryDB()
+    for ev in _events():
+        store.add_event(ev)
+    header, sections = persistence.capture(store)
+    header["wal_generation"] = 1
+    persistence.write_snapshot(tmp_path, header, sections)
+    path = tmp_path / persistence.SNAPSHOT_NAME
+    path.write_bytes(path.read_bytes()[:-7])
+
+    with pytest.raises(Exception):
+        persistence.load_snapshot(InMemoryDB(), path)
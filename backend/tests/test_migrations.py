@@ -0,0 +1,116 @@
+"""Upgrading a database created by the original (pre-migrations) schema.
+
+Needs a scratch Postgres: set TEST_DATABASE_URL and DB_SCHEMA to a schema this test may
+drop and recreate, e.g.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/postgres DB_SCHEMA=migration_test python -m pytest backend/tests
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.app.db import Config, DatabaseURLProcessor
+from backend.app.migrations import MIGRATIONS, init_db
+
+
+URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not URL or Config.SCHEMA == "public",
+    reason="needs TEST_DATABASE_URL and a scratch DB_SCHEMA (not public)",
+)
+
+# The tables as the first release created them: timestamps as varchar, JSON as json
+BASELINE = (
+    """CREATE TABLE "{schema}".datasets (
+        id varchar PRIMARY KEY, name varchar NOT NULL, description text, tags json,
+        owner_id varchar NOT NULL, org_id varchar NOT NULL, company varchar,
+        source_type varchar NOT NULL, source_metadata_json json, visibility varchar NOT NULL,
+        created_at varchar NOT NULL, updated_at varchar NOT NULL)""",
+    """CREATE TABLE "{schema}".events (
+        id varchar PRIMARY KEY, type varchar NOT NULL, payload_json json,
+        actor_id varchar, dataset_id varchar, created_at varchar NOT NULL)""",
+    'CREATE INDEX ix_events_dataset_id_created_at ON "{schema}".events (dataset_id, created_at)',
+    'CREATE TABLE "{schema}".follows (user_id varchar, dataset_id varchar, PRIMARY KEY (user_id, dataset_id))',
+    'CREATE TABLE "{schema}".likes (user_id varchar, dataset_id varchar, PRIMARY KEY (user_id, dataset_id))',
+    """CREATE TABLE "{schema}".platform_profiles (
+        id varchar PRIMARY KEY, user_id varchar, platform_type varchar, config_json json)""",
+    """CREATE TABLE "{schema}".users (
+        id varchar PRIMARY KEY, name varchar NOT NULL, email varchar NOT NULL, avatar_url text,
+        job_title varchar, company varchar, subsidiary varchar, tools json,
+        org_id varchar NOT NULL, role varchar NOT NULL, created_at varchar NOT NULL)""",
+    """INSERT INTO "{schema}".users (id, name, email, company, org_id, role, created_at) VALUES
+        ('u1', 'Ada', 'ada@example.com', 'Apex', 'org', 'consumer', '2025-01-02T03:04:05.000006Z'),
+        ('u2', 'Bo', 'bo@example.com', '', 'org', 'consumer', '')""",
+    """INSERT INTO "{schema}".datasets
+        (id, name, tags, owner_id, org_id, source_type, source_metadata_json, visibility, created_at, updated_at) VALUES
+        ('d1', 'orders', '["Sales", "sales ", "EU"]', 'u1', 'org', 'postgres', '{{}}', 'public',
+         '2025-01-03T00:00:00Z', '2025-02-01T12:00:00+00:00')""",
+    """INSERT INTO "{schema}".events (id, type, payload_json, actor_id, dataset_id, created_at) VALUES
+        ('e1', 'dataset.published', '{{"name": "orders"}}', 'u1', 'd1', '2025-01-03T00:00:00Z'),
+        ('e2', 'dataset.liked', '{{}}', 'u2', 'd1', '2025-01-04T08:00:00.5Z')""",
+    """INSERT INTO "{schema}".follows (user_id, dataset_id) VALUES ('u2', 'd1')""",
+)
+
+
+async def _upgrade() -> dict:
+    eng = create_async_engine(DatabaseURLProcessor.process_url(URL))
+    try:
+        async with eng.begin() as conn:
+            await conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{Config.SCHEMA}" CASCADE')
+            await conn.exec_driver_sql(f'CREATE SCHEMA "{Config.SCHEMA}"')
+            for stmt in BASELINE:
+                await conn.exec_driver_sql(stmt.replace("{schema}", Config.SCHEMA).replace("{{", "{").replace("}}", "}"))
+        applied = await init_db(eng)
+        async with eng.connect() as conn:
+            types = dict(((r[0], r[1]), r[2]) for r in await conn.execute(text(
+                "SELECT table_name, column_name, data_type FROM information_schema.columns WHERE table_schema = :s"
+            ), {"s": Config.SCHEMA}))
+            q = lambda sql: conn.execute(text(sql.replace("{schema}", Config.SCHEMA)))
+            out = {
+                "applied": applied,
+                "types": types,
+                "companies": {r[0]: (r[1], r[2], r[3]) for r in await q(
+                    'SELECT company, user_count, dataset_count, last_activity_at FROM "{schema}".company_stats')},
+                "feed": {r[0]: (r[1], r[2], r[3]) for r in await q(
+                    'SELECT id, human_text, actor_name, created_at FROM "{schema}".feed_items')},
+                "inbox": sorted(tuple(r) for r in await q('SELECT user_id, event_id FROM "{schema}".user_feed')),
+                "tags": sorted(tuple(r) for r in await q('SELECT tag_lower, count FROM "{schema}".tag_counts')),
+                "activity": sorted(tuple(r) for r in await q(
+                    'SELECT dataset_id, day::text, type, count FROM "{schema}".dataset_activity_daily')),
+            }
+            # A second start finds nothing left to apply
+            out["reapplied"] = await init_db(eng)
+        return out
+    finally:
+        async with eng.begin() as conn:
+            await conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{Config.SCHEMA}" CASCADE')
+        await eng.dispose()
+
+
+def test_upgrade_from_baseline_schema():
+    r = asyncio.run(_upgrade())
+    skipped = {m.version for m in MIGRATIONS if m.extension}  # may be unavailable on the test server
+    assert set(r["applied"]) | skipped == {m.version for m in MIGRATIONS}
+    assert not set(r["reapplied"]) - skipped
+
+    for column in (("users", "created_at"), ("datasets", "created_at"), ("datasets", "updated_at"),
+                   ("events", "created_at"), ("feed_items", "created_at"), ("company_stats", "last_activity_at")):
+        assert r["types"][column] == "timestamp with time zone", column
+    assert r["types"][("datasets", "tags")] == "jsonb"
+
+    apex_users, apex_datasets, apex_last = r["companies"]["Apex"]
+    assert (apex_users, apex_datasets) == (1, 1)
+    assert apex_last.isoformat() == "2025-02-01T12:00:00+00:00"
+    assert r["companies"]["Unknown"][:2] == (1, 0)
+    assert r["feed"]["e1"][:2] == ("orders was added", "Ada")
+    assert r["feed"]["e2"][0] == "New like"
+    assert r["feed"]["e2"][2].isoformat() == "2025-01-04T08:00:00.500000+00:00"
+    assert r["inbox"] == [("u2", "e1"), ("u2", "e2")]
+    assert r["tags"] == [("eu", 1), ("sales", 1)]
+    assert r["activity"] == [("d1", "2025-01-03", "dataset.published", 1), ("d1", "2025-01-04", "dataset.liked", 1)]
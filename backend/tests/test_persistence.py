@@ -0,0 +1,138 @@
+"""Snapshot + write-ahead log round trips for the in-memory store (persistence.py)."""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.app import persistence
+from backend.app.ids import new_id
+from backend.app.schemas import DatasetCreate, Event, User
+from backend.app.storage import InMemoryDB
+
+
+@pytest.fixture(autouse=True)
+def _fresh_process_state(monkeypatch):
+    # Each test stands in for a fresh process: no snapshot written yet, no directory held
+    monkeypatch.setattr(persistence, "_written_generation", -1)
+    yield
+    persistence.unlock_directory()
+
+
+def _populate(store: InMemoryDB, n: int) -> None:
+    ds = store.create_dataset(DatasetCreate(
+        name=f"orders-{n}", tags=["Sales"], owner_id=f"u{n}", org_id="org", source_type="postgres", visibility="public",
+    ))
+    store.upsert_user(User(
+        id=f"u{n}", name=f"User {n}", email=f"u{n}@example.com", org_id="org", role="consumer",
+        created_at=datetime.now(timezone.utc),
+    ))
+    store.add_event(Event(
+        id=new_id(), type="dataset.refreshed", payload_json={"delta_rows": n},
+        actor_id=f"u{n}", dataset_id=ds.id, created_at=datetime.now(timezone.utc),
+    ))
+    store.set_flag("follows", (f"u{n}", ds.id), True)
+    store.set_flag("tag_follows", (f"u{n}", "sales"), True)
+    store.set_columns(ds.id, [("order_id", "integer"), ("note", None)])
+
+
+def _reopen(path) -> InMemoryDB:
+    persistence.unlock_directory()
+    store = InMemoryDB()
+    persistence.open_store(str(path), store)
+    return store
+
+
+def _close(store: InMemoryDB) -> None:
+    store.journal.close()
+    store.journal = None
+
+
+def _assert_same(a: InMemoryDB, b: InMemoryDB) -> None:
+    assert {k: v.model_dump() for k, v in a.datasets.items()} == {k: v.model_dump() for k, v in b.datasets.items()}
+    assert {k: v.model_dump() for k, v in a.users.items()} == {k: v.model_dump() for k, v in b.users.items()}
+    assert [e.model_dump() for e in a.events] == [e.model_dump() for e in b.events]
+    assert (a.follows, a.likes, a.tag_follows) == (b.follows, b.likes, b.tag_follows)
+    assert a.dataset_columns == b.dataset_columns
+    assert a.activity_daily == b.activity_daily
+    assert a.tag_index == b.tag_index
+
+
+def test_log_only_round_trip(tmp_path):
+    store = InMemoryDB()
+    persistence.open_store(str(tmp_path), store)
+    _populate(store, 1)
+    store.set_flag("follows", ("u1", next(iter(store.datasets))), False)
+    _close(store)
+
+    restored = _reopen(tmp_path)
+    _assert_same(store, restored)
+    assert not restored.follows
+
+
+def test_snapshot_then_log_round_trip(tmp_path):
+    store = InMemoryDB()
+    persistence.open_store(str(tmp_path), store)
+    _populate(store, 1)
+    asyncio.run(persistence.snapshot(store, tmp_path))
+    _populate(store, 2)  # after the snapshot: only in the new log generation
+    _close(store)
+
+    assert [p.name for p in sorted(tmp_path.glob("wal-*.log"))] == ["wal-00000001.log"]
+    restored = _reopen(tmp_path)
+    _assert_same(store, restored)
+    assert len(restored.events) == 2
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    store = InMemoryDB()
+    persistence.open_store(str(tmp_path), store)
+    _populate(store, 1)
+    _close(store)
+    wal = tmp_path / "wal-00000000.log"
+    intact = wal.stat().st_size
+
+    # A crash in the middle of the next record: full header, half the body
+    body = b'{"id":"u9","name":"torn"'
+    with open(wal, "ab") as f:
+        f.write(persistence._RECORD.pack(len(body) + 40, 0, persistence.KINDS["user"]) + body)
+
+    restored = _reopen(tmp_path)
+    _assert_same(store, restored)
+    assert "u9" not in restored.users
+    assert wal.stat().st_size == intact
+
+    # Writes after recovery append cleanly behind the intact records
+    _populate(restored, 2)
+    _close(restored)
+    again = _reopen(tmp_path)
+    _assert_same(restored, again)
+
+
+def test_corrupt_record_stops_replay(tmp_path):
+    store = InMemoryDB()
+    persistence.open_store(str(tmp_path), store)
+    _populate(store, 1)
+    _close(store)
+    wal = tmp_path / "wal-00000000.log"
+    data = bytearray(wal.read_bytes())
+    data[-1] ^= 0xFF  # flip a bit in the last record's body
+    wal.write_bytes(bytes(data))
+
+    restored = _reopen(tmp_path)
+    assert len(restored.dataset_columns) == 0  # the columns record was written last
+    assert len(restored.events) == 1
+
+
+def test_directory_is_locked_against_other_processes(tmp_path):
+    persistence.open_store(str(tmp_path), InMemoryDB())
+    with open(tmp_path / persistence.LOCK_NAME, "a+b") as other:
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    persistence.unlock_directory()
+    with open(tmp_path / persistence.LOCK_NAME, "a+b") as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with pytest.raises(RuntimeError):
+            persistence.open_store(str(tmp_path), InMemoryDB())